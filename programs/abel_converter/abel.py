@@ -19,6 +19,7 @@ import json
 import uuid
 
 from abel_converter import value_mapping
+from table_reader.table_reader import read_table, LOADSHEET_DTYPES
 
 def safe_json_load(x):
     try:
@@ -115,7 +116,7 @@ class Abel():
             'BI': 'binary-input',
             'MSV': 'multi-state-value'
         }
-        loadsheet = pd.read_excel(path).sort_values(['assetName', 'standardFieldName'])
+        loadsheet = read_table(path, dtypes=LOADSHEET_DTYPES).sort_values(['assetName', 'standardFieldName'])
         loadsheet = loadsheet.loc[loadsheet['required']=='YES', :]
         loadsheet['fullAssetPath'] = loadsheet['building'] + ":" + loadsheet['generalType'] + ":" + loadsheet['assetName']
         loadsheet['deviceId'] = loadsheet.groupby('fullAssetPath')['deviceId'].ffill()
@@ -107,7 +107,9 @@ class Mapper(cmd.Cmd):
 
     def do_import(self,args):
         """			Facilitate the importing of data.
-            usage: import <bms|loadsheet|ontology> <file|folder> """
+            usage: import <bms|loadsheet|ontology> <file|folder>
+            bms also takes a folder or glob pattern of exports, imported together into one loadsheet
+            loadsheets can be .xlsx, .csv or binary (.parquet, .feather, .arrow) files """
 
         # Check that the right number of arguments are supplied.
         inputs = self._parse_args(args)
@@ -167,17 +169,38 @@ class Mapper(cmd.Cmd):
 
     def do_normalize(self,args):
         """			Run the rules file given a specific rules filepath
-            usage: normalize <rules filepath>"""
+            Pass a BMS csv and an output file (.csv or .parquet) to stream
+            a large export through the rules without importing it
+            usage: normalize <rules filepath> [<bms filepath> <output filepath>]"""
 
         inputs = self._parse_args(args)
 
+        if len(inputs) == 3:
+            print("[INFO]\tStreaming rules...")
+            self.handler.stream_rules(inputs[0], inputs[1], inputs[2])
+            return
+
         if len(inputs) != 1:
-            print("[ERROR]\tOnly one argument is accepted; {} were passed.".format(len(inputs)))
+            print("[ERROR]\tOne or three arguments are accepted; {} were passed.".format(len(inputs)))
             return
 
         print("[INFO]\tApplying rules...")
         self.handler.apply_rules(inputs[0])
 
+    def do_compile(self,args):
+        """			Validate a ruleset (rules JSON or Rule Generator workbook)
+            and write it as a rules JSON file for normalize
+            usage: compile <rules json|workbook filepath> <output json filepath>"""
+
+        inputs = self._parse_args(args)
+
+        if len(inputs) != 2:
+            print("[ERROR]\tNot the correct number of arguments. See help for details on compile function.")
+            return
+
+        print("[INFO]\tCompiling rules...")
+        self.handler.compile_rules(inputs[0], inputs[1])
+
     def do_ml_normalize(self,args):
         """			Run the rules file given a specific rules filepath
             usage: normalize <rules filepath>"""
@@ -185,8 +208,10 @@ class Mapper(cmd.Cmd):
         self.handler.apply_ml_normalization()
 
     def do_export(self,args):
-        """			Export the data as an excel file.
-            usage: export <excel> <export filepath>"""
+        """			Export the data as an excel file, or as a binary (.parquet, .feather, .arrow)
+            file for re-import without Excel, or the report of the last validation as a
+            .json file or an annotated .xlsx copy of the loadsheet.
+            usage: export <excel|binary|report> <export filepath>"""
 
         # Check that the right number of arguments are supplied.
         inputs = self._parse_args(args)
@@ -196,7 +221,7 @@ class Mapper(cmd.Cmd):
 
         export_type = inputs[0]
         export_path = inputs[1]
-        valid_first_arg = ['excel']
+        valid_first_arg = ['excel', 'binary', 'report']
 
         # Check that the first argument is a valid import argument.
         if inputs[0] not in valid_first_arg:
@@ -206,6 +231,34 @@ class Mapper(cmd.Cmd):
         if export_type == 'excel':
             self.handler.export_loadsheet(excel_path=export_path)
 
+        elif export_type == 'binary':
+            self.handler.export_binary(binary_path=export_path)
+
+        elif export_type == 'report':
+            self.handler.export_validation_report(report_path=export_path)
+
+    def do_save(self, args):
+        """			Save the current session (loadsheet, validation, types and matches) to a file.
+            usage: save session <session filepath>"""
+
+        inputs = self._parse_args(args)
+        if len(inputs) != 2 or inputs[0] != 'session':
+            print("[ERROR]\tIncorrect inputs. See 'help save' for more information on this function.")
+            return
+
+        self.handler.save_session(inputs[1])
+
+    def do_load(self, args):
+        """			Resume a session saved with 'save session'.
+            usage: load session <session filepath>"""
+
+        inputs = self._parse_args(args)
+        if len(inputs) != 2 or inputs[0] != 'session':
+            print("[ERROR]\tIncorrect inputs. See 'help load' for more information on this function.")
+            return
+
+        self.handler.load_session(inputs[1])
+
     def do_convert(self, args):
         inputs = self._parse_args(args)
         valid_first_arg = ['abel']
@@ -309,7 +362,8 @@ class Mapper(cmd.Cmd):
 
         print("[INFO]\tAll type matches applied. Use 'export' to export finished loadsheet.")
 
-        self.handler.ls._data = self.handler.reps.dump_to_data()
+        self.handler.ls._data = self.handler.reps.dump_to_table()
+        self.handler.changes = None
 
     #input validator. returns one of the inputs, whichever the user gives
     def _ask(self, qn, answers=["yes", "no"]):
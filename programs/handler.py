@@ -18,48 +18,25 @@ import representations.representations
 from ml_normalize.ml_handler import MLHandler
 import ontology.ontology
 import loadsheet.loadsheet as load
-from loadsheet_validation_checks.loadsheet_validation_checks import LoadsheetValidationChecks
+from table_reader.table_reader import BINARY_FILE_TYPES
+import rules.rules
+from loadsheet_validation_checks.loadsheet_validation_checks import run_checks
 from pretty import PrettyPrint
-import base64
+import pickle
+import copy
 from typing import Optional
 import pandas as pd
 
 
-def _convert_to_base64(data):
-    """
-    Convert a data object into a base64 message.
-    Used as a codeword to uniquely identify each asset type
-    """
-
-    if isinstance(data, set):
-        data = list(data)
-        data.sort()
-        data = tuple(data)
-        data = str(data)
-
-    if isinstance(data, list):
-        data.sort()
-        data = tuple(data)
-        data = str(data)
-
-    if isinstance(data, tuple):
-        data = str(data)
-
-    encoded_bytes = base64.b64encode(data.encode("utf-8"))
-    encoded_str = str(encoded_bytes, "utf-8")
-
-    return encoded_str
-
-
 def _print_type(type, type_dict):
     """
     prints out a type's assets and fields
     """
     print(f"ASSET GENERAL TYPE: {type}")
     print("--------------------------------------------------------------------------------")
-    for field_hash in type_dict.keys():
-        assets = type_dict[field_hash][0]
-        fields = type_dict[field_hash][1]
+    for fieldset_id in type_dict.keys():
+        assets = type_dict[fieldset_id][0]
+        fields = type_dict[fieldset_id][1]
         col_width = max(len(field) for field in fields) + 3
 
         print(f"ASSETS: {assets}\n")
@@ -69,6 +46,13 @@ def _print_type(type, type_dict):
         print("\n\n")
 
 
+# Session snapshot format version; bump when the handler state changes shape.
+_SESSION_VERSION = 1
+
+# Folder, next to a session file, holding built ontologies by content hash.
+_ONTOLOGY_STORE = 'ontologies'
+
+
 class Handler:
     """
     Handler object for handling onboarding workflow.
@@ -93,6 +77,15 @@ class Handler:
         self.last_rule_path = ''
         self.payload_path = None
         self.bc_path = None
+        self.ontology_path = None
+        # Content hash of the ontology source files the ontology was built from
+        self.ontology_hash = None
+
+        # Rows changed by the last loadsheet re-import, not yet applied to the representations
+        self.changes = None
+
+        # Report of the last loadsheet checks
+        self.validation_report = None
 
     def validate_path(self, path, valid_file_types: list):
         file_type = os.path.splitext(path)[1]
@@ -114,23 +107,108 @@ class Handler:
         try:
             # Adjust the resource directory in the ontology file to import from the desired location.
             # Build the ontology.
+            ontology_hash = ontology.ontology.content_hash(ontology_root)
             ont = ontology.ontology.Ontology(ontology_root)
             ont.validate_without_errors()
             self.ontology_built = True
             self.ontology = ont
+            self.ontology_path = ontology_root
+            self.ontology_hash = ontology_hash
             print(f"[INFO]\tOntology built from '{ontology_root}'.")
 
         except Exception as e:
             # Raise the exception to the user
             print(f"[WARNING]\tOntology could not build: {e}")
 
+    def save_session(self, session_path):
+        """
+        Saves the handler state (loadsheet, representations, types, matches,
+        flags and paths) to a session file that load_session can resume.
+        The ontology is not copied into the session: it is referenced by
+        the content hash of the source files it was built from, and the
+        built ontology is kept once per hash in an 'ontologies' folder next
+        to the session.
+
+        args:
+                - session_path: output filepath
+
+        returns: N/A
+        """
+        try:
+            folderpath = os.path.dirname(os.path.abspath(session_path))
+            assert os.path.exists(folderpath), "Specified path '{}' is not valid.".format(folderpath)
+
+            state = {k: v for k, v in self.__dict__.items() if k != 'ontology'}
+            ontology_ref = None
+            if self.ontology_built:
+                ontology_hash = self.ontology_hash
+                ontology_ref = {'path': os.path.abspath(self.ontology_path), 'hash': ontology_hash}
+                store = os.path.join(folderpath, _ONTOLOGY_STORE)
+                os.makedirs(store, exist_ok=True)
+                ontology_file = os.path.join(store, ontology_hash + '.pickle')
+                if not os.path.exists(ontology_file):
+                    with open(ontology_file, 'wb') as f:
+                        pickle.dump(self.ontology, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            with open(session_path, 'wb') as f:
+                pickle.dump({'version': _SESSION_VERSION, 'ontology': ontology_ref, 'state': state},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            print(f"[INFO]\tSession saved to '{session_path}'.")
+
+        except Exception as e:
+            print(f"[ERROR]\tSession not saved: {e}")
+
+    def load_session(self, session_path):
+        """
+        Restores the handler state saved by save_session. The ontology is
+        taken from the session's ontology store when its hash is there,
+        otherwise rebuilt from its source folder if that still has the
+        same content. Sessions and stored ontologies are unpickled, which
+        can run arbitrary code: only load session files you trust.
+
+        args:
+                - session_path: path of the session file
+
+        returns: N/A
+        """
+        try:
+            with open(session_path, 'rb') as f:
+                session = pickle.load(f)
+            if session.get('version') != _SESSION_VERSION:
+                raise ValueError("Session file version {} is not supported.".format(session.get('version')))
+
+            ont = None
+            ontology_ref = session['ontology']
+            if ontology_ref is not None:
+                ontology_file = os.path.join(os.path.dirname(os.path.abspath(session_path)),
+                                             _ONTOLOGY_STORE, ontology_ref['hash'] + '.pickle')
+                if os.path.exists(ontology_file):
+                    with open(ontology_file, 'rb') as f:
+                        ont = pickle.load(f)
+                else:
+                    if not os.path.isdir(ontology_ref['path']) or \
+                            ontology.ontology.content_hash(ontology_ref['path']) != ontology_ref['hash']:
+                        raise ValueError("Ontology '{}' is not in the session store and its source has changed."
+                                         .format(ontology_ref['path']))
+                    print("[INFO]\tRebuilding ontology from '{}'.".format(ontology_ref['path']))
+                    ont = ontology.ontology.Ontology(ontology_ref['path'])
+
+            self.__init__()
+            self.__dict__.update(session['state'])
+            if ont is not None:
+                self.ontology = ont
+            print(f"[INFO]\tSession loaded from '{session_path}'.")
+
+        except Exception as e:
+            print(f"[ERROR]\tSession not loaded: {e}")
+
     def import_loadsheet(self, loadsheet_path, has_normalized_fields):
         """
         Attempts to build loadsheet from given filepath
         If errors occur, prints them but doesn't close program
 
         args:
-                - loadsheet_path: path of loadsheet Excel or BMS file
+                - loadsheet_path: path of loadsheet Excel, CSV or binary (.parquet, .feather, .arrow) file
                 - has_normalized_fields: flag if passed path is to BMS type (no normalized fields)
                                          or loadsheet (normalized fields)
 
@@ -142,12 +220,18 @@ class Handler:
         # return
 
         try:
-            if self.validate_path(loadsheet_path, ['.xlsx', '.csv']):
+            if self.validate_path(loadsheet_path, ['.xlsx', '.csv', *BINARY_FILE_TYPES]):
                 try:
                     # Import the data into the loadsheet object.
+                    previous = self.ls if self.loadsheet_built else None
                     self.ls = load.Loadsheet.from_loadsheet(
                         loadsheet_path, has_normalized_fields)
                     print("[INFO]\tLoadsheet Imported")
+                    self._print_memory()
+                    self.changes = None
+                    if previous is not None and self.representations_built:
+                        self.changes = self.ls.diff(previous)
+                        print("[INFO]\tChanges since the previous loadsheet: {}".format(self.changes.summary()))
                     self.loadsheet_built = True
                     self.last_loadsheet_path = loadsheet_path
 
@@ -179,12 +263,18 @@ class Handler:
         # print('[ERROR]\tOntology not built. Build it first.')
         # return
 
+        if os.path.isdir(bms_path) or any(c in bms_path for c in '*?['):
+            self.import_bms_files(bms_path)
+            return
+
         try:
             if self.validate_path(bms_path, ['.xlsx', '.csv']):
                 try:
                     # Import the data into the loadsheet object.
                     self.ls = load.Loadsheet.from_bms(bms_path)
+                    self.changes = None
                     print("[INFO]\tBMS Imported")
+                    self._print_memory()
                     self.loadsheet_built = True
 
                 except Exception as e:
@@ -195,6 +285,36 @@ class Handler:
 
     # end by sypks
 
+    def _print_memory(self):
+        """ Prints the memory used by the loadsheet table, and what it would use without categorical columns. """
+        encoded, as_text = self.ls.memory_usage()
+        print("[INFO]\tLoadsheet memory: {:.1f} MB ({:.1f} MB with categorical columns stored as text)".format(
+            encoded / 1e6, as_text / 1e6))
+
+    def import_bms_files(self, pattern):
+        """
+        Builds one loadsheet from all BMS files in a directory or matching a
+        glob pattern; the files are read in parallel and each row records
+        its source file.
+
+        args:
+                - pattern: directory or glob pattern of BMS files
+
+        returns: N/A
+        """
+        try:
+            paths = load.Loadsheet.find_bms_files(pattern)
+            assert paths, "No .csv or .xlsx files found for '{}'.".format(pattern)
+            print("[INFO]\tImporting {} BMS files...".format(len(paths)))
+            self.ls = load.Loadsheet.from_bms_files(paths)
+            self.changes = None
+            print("[INFO]\tBMS Imported: {} rows from {} files".format(len(self.ls), len(paths)))
+            self._print_memory()
+            self.loadsheet_built = True
+
+        except Exception as e:
+            print("[ERROR]\tCould not load: {}".format(e))
+
     def validate_loadsheet(self):
         """ Try to build the loadsheet. If theres an error, print it out but don't blow up. """
 
@@ -209,11 +329,16 @@ class Handler:
             self.ls.validate()
 
             try:
-                # Convert the loadsheet to validation
-                print('\n[INFO]\tConverting loadsheet into asset representations.')
-                self.reps = representations.representations.Assets()
-                self.reps.load_from_data(self.ls._data)
-                print('[INFO]\tAsset representations built.')
+                if self.changes is not None:
+                    # Only rebuild the assets touched by the re-imported loadsheet
+                    self._update_representations(self.changes)
+                else:
+                    # Convert the loadsheet to validation
+                    print('\n[INFO]\tConverting loadsheet into asset representations.')
+                    self.reps = representations.representations.Assets()
+                    self.reps.load_from_table(self.ls._df)
+                    print('[INFO]\tAsset representations built.')
+                self.changes = None
 
                 # Validate the representations
                 print('[INFO]\tValidating assets.')
@@ -234,6 +359,37 @@ class Handler:
         except Exception as e:
             print(f"[ERROR]\tLoadsheet raised errors: {e}")
 
+    def _update_representations(self, changes):
+        """
+        Applies a loadsheet change set (see Loadsheet.diff) to the asset
+        representations: the assets with changed rows are rebuilt from the
+        loadsheet, and rematched if types were matched; all other assets
+        keep their fields and matches.
+
+        args:
+                - changes: LoadsheetDiff of the loadsheet against the one the
+                           representations were built from
+
+        returns: N/A
+        """
+        print('\n[INFO]\tUpdating asset representations: {}'.format(changes.summary()))
+        asset_rows = set()
+        for asset_name in changes.affected_assets:
+            asset_rows.update(self.ls.get_row_ids(assetname=asset_name))
+        data = [row for row in self.ls.get_data_row_generator(rows=sorted(asset_rows))
+                if row['required'] == 'YES']
+        data += [row for row in self.ls.get_data_row_generator(rows=changes.changed_key_rows)
+                 if row['required'] != 'YES']
+
+        rebuilt = self.reps.update_from_data(
+            data, changes.affected_assets,
+            drop_unused=changes.touches)
+        print(f'[INFO]\t{len(rebuilt)} asset representations rebuilt.')
+
+        if self.matched:
+            self._match_assets(rebuilt)
+            print(f'[INFO]\t{len(rebuilt)} assets rematched.')
+
     def apply_rules(self, rules_path):  # REWRITE ME
         """ Run a given rules file over the loadsheet data. """
 
@@ -242,8 +398,55 @@ class Handler:
             assert os.path.exists(
                 rules_path), f"Rule file path '{rules_path}' is not valid."
             print(f"[INFO]\tApplying rules from '{rules_path}'")
-            self.ls.apply_rules(rules_path)
-            print("[INFO]\tRules applied.")
+            rows_run = self.ls.apply_rules(rules_path)
+            self.changes = None
+            print(f"[INFO]\tRules applied ({rows_run} of {len(self.ls)} rows re-evaluated).")
+
+        except Exception as e:
+            print(f"[ERROR]\tRules could not be applied: {e}.")
+
+    def compile_rules(self, source_path, output_path):
+        """
+        Validate a ruleset source (rules JSON or the Rule Generator workbook)
+        and write it out as a runtime rules JSON file.
+
+        args:
+                - source_path: path to the rules JSON file or workbook
+                - output_path: path of the rules JSON file to write
+
+        returns: N/A
+        """
+
+        try:
+            self.validate_path(source_path, ['.json', '.xlsx'])
+            rule_count = rules.rules.WriteCompiledRules(source_path, output_path)
+            print(f"[INFO]\t{rule_count} rules compiled to '{output_path}'.")
+
+        except Exception as e:
+            print(f"[ERROR]\tRules could not be compiled: {e}")
+
+    def stream_rules(self, rules_path, bms_path, output_path):
+        """
+        Run a given rules file over a BMS export chunk by chunk, writing the
+        normalized rows straight to an output file. Used for point lists too
+        large to import as a whole.
+
+        args:
+                - rules_path: path to the rule file
+                - bms_path: path to the BMS csv export
+                - output_path: .csv or .parquet output file
+
+        returns: N/A
+        """
+
+        try:
+            assert os.path.exists(
+                rules_path), f"Rule file path '{rules_path}' is not valid."
+            self.validate_path(bms_path, ['.csv'])
+            print(f"[INFO]\tStreaming '{bms_path}' through rules from '{rules_path}'")
+            rows = load.Loadsheet.normalize_bms_stream(
+                bms_path, rules_path, output_path)
+            print(f"[INFO]\t{rows} normalized rows written to '{output_path}'.")
 
         except Exception as e:
             print(f"[ERROR]\tRules could not be applied: {e}.")
@@ -265,6 +468,7 @@ class Handler:
         try:
             print("[INFO]\tApplying rules for asset names...")
             self.ls.apply_rules(rules_path)
+            self.changes = None
             print("[INFO]\tRules applied.")
         except Exception as e:
             print(f"[ERROR]\tRules could not be applied: {e}.")
@@ -281,8 +485,7 @@ class Handler:
 
             std_input_cols = load.Loadsheet._to_std_headers(input_cols)
             
-            df = pd.DataFrame.from_records(self.ls._data)
-            df = ml_handler.get_predictions(df, std_input_cols)
+            df = ml_handler.get_predictions(self.ls._decoded_df(), std_input_cols)
 
             print("[INFO]\tML normalization applied.")
         except Exception as e:
@@ -301,6 +504,7 @@ class Handler:
 
         df.columns = self.ls._to_std_headers(df.columns)
         self.ls._update_data_from_dataframe(df)
+        self.changes = None
 
 
     def export_loadsheet(self, excel_path):
@@ -328,6 +532,30 @@ class Handler:
         except Exception as e:
             print('[ERROR]\tExcel file not exported: {}'.format(e))
 
+    def export_binary(self, binary_path):
+        """
+        exports loadsheet data to a binary (.parquet, .feather or .arrow) file
+        that can be imported again without going through Excel
+
+        args:
+                - binary_path: output filepath
+
+        returns: N/A
+        """
+
+        try:
+            # Check that the loadsheet object is built.
+            assert self.loadsheet_built, "Loadsheet is not initialized."
+
+            folderpath = os.path.dirname(os.path.abspath(binary_path))
+            assert os.path.exists(folderpath), "Specified path '{}' is not valid.".format(folderpath)
+            print("[INFO]\tExporting to binary file '{}'".format(binary_path))
+            self.ls.export_to_binary(binary_path)
+            print("[INFO]\tData exported to binary file!")
+
+        except Exception as e:
+            print('[ERROR]\tBinary file not exported: {}'.format(e))
+
     def export_abel_spreadsheet(self, excel_path, payload_path, building_config_path: Optional[str] = None, output_path: Optional[str] = None):
         """converts loadsheet to ABEL spreadsheet.
 
@@ -397,8 +625,8 @@ class Handler:
         types is a dictionary of dictionary of list pairs
         each instance is of form
         "general_type":{
-            "fields_hash":[[list_of asset paths],[list of type fields]],
-            "fields_hash":[[list_of asset paths],[list of type fields]]
+            fieldset_id:[[list_of asset paths],[list of type fields]],
+            fieldset_id:[[list_of asset paths],[list of type fields]]
         }
         '''
 
@@ -406,13 +634,13 @@ class Handler:
 
         for asset_path in self.reps.assets:
             asset = self.reps.assets[asset_path]
-            field_hash = _convert_to_base64(asset.get_fields())
+            fieldset_id = asset.fieldset_id
             gT = asset.general_type.lower()
             if gT not in types.keys():
                 types[gT] = {}
-            if field_hash not in types[gT].keys():
-                types[gT][field_hash] = [[], asset.get_fields()]
-            types[gT][field_hash][0].append(asset.full_asset_name)
+            if fieldset_id not in types[gT].keys():
+                types[gT][fieldset_id] = [[], asset.get_fields()]
+            types[gT][fieldset_id][0].append(asset.full_asset_name)
 
         # now we print
         if general_type is not None:
@@ -469,14 +697,25 @@ class Handler:
         # Get matches for all types if the general_type specified is None.
         print("[INFO]\tMatching types to ontology...")
 
-        for asset_path in self.reps.assets:
-            asset = self.reps.assets[asset_path]
-            match = self.ontology.find_best_fit_type(
-                asset.get_fields(), 'HVAC', asset.get_general_type())
-            asset.add_match(match)
+        self._match_assets(self.reps.assets)
 
         self.matched = True
 
+    def _match_assets(self, asset_names):
+        """
+        Matches the given assets to their nearest type in the ontology,
+        once per fieldset and general type: assets with the same fields
+        and general type get a copy of the same match.
+        """
+        matches = {}
+        for asset_path in asset_names:
+            asset = self.reps.assets[asset_path]
+            key = (asset.fieldset_id, asset.get_general_type())
+            if key not in matches:
+                matches[key] = self.ontology.find_best_fit_type(
+                    asset.get_fields(), 'HVAC', asset.get_general_type())
+            asset.add_match(copy.copy(matches[key]))
+
     def apply_matches(self):
         """
         returns each asset, one at a time
@@ -488,6 +727,12 @@ class Handler:
             yield self.reps.assets[asset_path]
 
     def loadsheet_checks(self):
+        """
+        Runs the loadsheet validation checks on the imported loadsheet, as
+        held in memory (so including normalization since the import).
+
+        returns: N/A, sets validated when all checks pass
+        """
         # Check that the ontology is built first.
         if not self.ontology_built:
             print('[ERROR]\tOntology not imported. Import it first.')
@@ -498,84 +743,51 @@ class Handler:
             print('[ERROR]\tLoadsheet not imported. Import it first.')
             return
         
-        try:
-            df = pd.read_excel(self.last_loadsheet_path)
-        except FileNotFoundError:
-            print(f"❌ File not found: {self.last_loadsheet_path}")
-            return
-        except PermissionError:
-            print(f"❌ Permission denied: The file '{self.last_loadsheet_path}' is likely open in another program. Please close it and try again.")
-            return
-        except Exception as e:
-            print(f"❌ Unexpected error while reading the file: {e}")
+        # Check the loadsheet as imported and since normalized, under its original headers
+        df = self.ls.with_original_headers()
+        self.validation_report = run_checks(df, self.ontology)
+
+        for result in self.validation_report.results:
+            if result.status == 'passed':
+                print("✅ " + result.message)
+            elif result.status == 'failed':
+                print(result.output, end='')
+                print("⛔ " + result.message)
+            else:
+                print("[INFO]\tCheck '{}' {}: {}".format(result.name, result.status, result.message))
+        print("[INFO]\tRan {} checks in {:.3f}s ({})".format(
+            len(self.validation_report.results), self.validation_report.seconds,
+            ', '.join('{} {:.3f}s'.format(result.name, result.seconds) for result in self.validation_report.results)))
+
+        if not self.validation_report.passed:
             return
 
-        if not LoadsheetValidationChecks.validate_required_columns(df):
-            print("⛔ Stopping validation due to missing columns.")
-            return
-        else:
-            print("✅ Loadsheet contains the correct columns.")
-        if not LoadsheetValidationChecks.validate_no_leading_trailing_spaces(df):
-            print("⛔ Stopping validation due to leading/trailing spaces.")
-            return
-        else:
-            print("✅ No leading or trailing spaces found in cells.")
-        df_cleaned = LoadsheetValidationChecks.validate_required_column(df)
-        if df_cleaned is None:
-            print("\n⛔ Stopping validation due to invalid required column entry(s)")
-            return
-        else:
-            print("✅ All rows in 'required' column contain 'YES' or 'NO'.")
-        if not LoadsheetValidationChecks.validate_required_fields_populated(df_cleaned):
-            print("⛔ Stopping validation due to missing required fields in required & not missing rows.")
-            return
-        else:
-            print("✅ All necessary columns populated where required='YES' and isMissing='NO'.")
-        if not LoadsheetValidationChecks.validate_missing_required_rows(df_cleaned):
-            print("⛔ Stopping validation due to invalid data on missing required rows.")
-            return
-        else:
-            print("✅ All necessary columns populated where required='YES' and isMissing='YES'.")
-        # if not LoadsheetValidationChecks.validate_all_standard_field_names(df_cleaned, self.ontology):
-        #     print("\n⛔ Stopping validation due to invalid standardFieldNames.")
-        #     return
-        # else:
-        #     print("✅ All standardFieldNames are valid.")
-        # if not LoadsheetValidationChecks.validate_units(df_cleaned, ontology):
-        #     print("\n⛔ Stopping validation due to undetectable units.")
-        #     return
-        # else:
-        #     print("✅ All units are valid and match with corresponding standardFieldNames.")
-        if not LoadsheetValidationChecks.validate_object_type_for_command_status(df_cleaned):
-            print("⛔ Stopping validation due to objectType mismatches for control/status points.")
-            return
-        else:
-            print("✅ All binary standardFieldNames have binary objectType values.")
-        if not LoadsheetValidationChecks.validate_object_type_for_measurement_points(df_cleaned):
-            print("⛔ Stopping validation due to objectType mismatches for measurement points.")
-            return
-        else:
-            print("✅ All analog standardFieldNames have analog objectType values.")
-        if not LoadsheetValidationChecks.validate_alarm_types(df_cleaned):
-            print("⛔ Stopping validation due to invalid alarm type entries.")
-            return
-        else:
-            print("✅ All alarms have the correct BALM type.")
-        if not LoadsheetValidationChecks.validate_unique_standard_fields_per_asset(df_cleaned):
-            print("⛔ Stopping validation due to duplicate standardFieldNames within assets.")
-            return
-        else:
-            print("✅ No duplicate standardFieldNames within a single asset.")
-        if not LoadsheetValidationChecks.validate_unique_typename_per_asset(df_cleaned):
-            print("⛔ Stopping validation due to inconsistent typeName assignments per asset.")
-            return
-        else:
-            print("✅ All assetNames have exactly one typeName.")
-        # if not LoadsheetValidationChecks.validate_typename_matches_standard_fields(df_cleaned, ontology):
-        #     print("⛔ Stopping validation due to standardFieldName/typeName mismatches.")
-        #     return
-        # else:
-        #     print("✅ All standardFieldName sets are a 100% ontology match with their corresponding typeName.")
-
         self.validated = True
-        print("\n🎉 All validations passed!")
\ No newline at end of file
+        print("\n🎉 All validations passed!")
+
+    def export_validation_report(self, report_path):
+        """
+        exports the report of the last loadsheet checks, as a .json file or
+        as an annotated .xlsx copy of the loadsheet
+
+        args:
+                - report_path: output filepath
+
+        returns: N/A
+        """
+
+        try:
+            assert self.validation_report is not None, "Loadsheet checks have not been run."
+            folderpath = os.path.dirname(os.path.abspath(report_path))
+            assert os.path.exists(folderpath), "Specified path '{}' is not valid.".format(folderpath)
+            extension = os.path.splitext(report_path)[1].lower()
+            assert extension in ['.json', '.xlsx'], "Report file must be .json or .xlsx."
+            print("[INFO]\tExporting validation report to '{}'".format(report_path))
+            if extension == '.json':
+                self.validation_report.export_json(report_path)
+            else:
+                self.validation_report.export_xlsx(report_path, self.ls.with_original_headers())
+            print("[INFO]\tValidation report exported!")
+
+        except Exception as e:
+            print('[ERROR]\tValidation report not exported: {}'.format(e))
\ No newline at end of file
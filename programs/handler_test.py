@@ -0,0 +1,212 @@
+#Copyright 2020 DB Engineering
+
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+import unittest
+import json
+import os
+import tempfile
+import io
+import shutil
+import pickle
+import contextlib
+from unittest import mock
+import pandas
+import handler
+import representations.representations
+import loadsheet.loadsheet as load
+import ontology.ontology
+
+
+_ONTOLOGY_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ontology', 'yaml', 'resources')
+
+
+_BMS_EXPORT = ('Location,Control Program,Name,Type,Object ID,Device ID,Object Name,Path\n'
+	'L,AHU-1,SAT,BAV,AV:3,DEV:1,sat_1,#p/sat\n'
+	'L,AHU-1,RAT,BAV,AV:4,DEV:1,rat_1,#p/rat\n'
+	'L,AHU-1,Dev,DEV,,DEV:1,,#p\n'
+	'L,VAV-2,ZAT,BAV,AI:1,DEV:2,zn_t_1,#p/zat\n'
+	'L,VAV-2,Fan,BBV,BV:2,DEV:2,sat_2,#p/fan\n')
+
+_RULES = {'rules':[
+	{'ruleName':'ahu', 'ruleField':'controlProgram', 'rulePattern':'(AHU-\\d)',
+	 'outputs':{'generalType':'AHU', 'assetName':1}},
+	{'ruleName':'vav', 'ruleField':'controlProgram', 'rulePattern':'(VAV-\\d)',
+	 'outputs':{'generalType':'VAV', 'assetName':1}},
+	{'ruleName':'sat', 'ruleField':'objectName', 'rulePattern':'^sat_',
+	 'outputs':{'required':'YES', 'standardFieldName':'supply_air_temperature_sensor'},
+	 'filters':{'generalType':['include','AHU']}}
+	]}
+
+
+class TestHandler(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.bms_path = os.path.join(self.tmpdir.name, 'export.csv')
+		with open(self.bms_path, 'w') as f:
+			f.write(_BMS_EXPORT)
+		self.rules_path = os.path.join(self.tmpdir.name, 'rules.json')
+		with open(self.rules_path, 'w') as f:
+			json.dump(_RULES, f)
+		self.out = io.StringIO()
+		stack = contextlib.ExitStack()
+		self.addCleanup(stack.close)
+		stack.enter_context(mock.patch.object(load.Loadsheet, '_parse_building_name', return_value='US-MTV-1'))
+		stack.enter_context(contextlib.redirect_stdout(self.out))
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def test_stream_rules(self):
+		#streamed output equals the imported export with the rules applied
+		def as_text(df):
+			df = df[sorted(df.columns)].astype(object)
+			return df.where(df.notna(), '').astype(str)
+
+		h = handler.Handler()
+		h.import_bms(self.bms_path, False)
+		h.apply_rules(self.rules_path)
+		expected = as_text(h.ls.with_original_headers())
+		for ext in ('.csv', '.parquet'):
+			output_path = os.path.join(self.tmpdir.name, 'normalized' + ext)
+			h.stream_rules(self.rules_path, self.bms_path, output_path)
+			if ext == '.csv':
+				streamed = pandas.read_csv(output_path, dtype=str, keep_default_na=False)
+			else:
+				streamed = pandas.read_parquet(output_path)
+			pandas.testing.assert_frame_equal(expected, as_text(streamed))
+		self.assertNotIn('[ERROR]', self.out.getvalue())
+
+	def _ontology_copy(self):
+		path = os.path.join(self.tmpdir.name, 'resources')
+		shutil.copytree(_ONTOLOGY_ROOT, path)
+		return path
+
+	def _add_unit(self, ontology_root):
+		with open(os.path.join(ontology_root, 'units', 'units.yaml'), 'a') as f:
+			f.write('\ntest_measurement:\n- test_units: STANDARD\n')
+
+	def test_session_round_trip(self):
+		#the loadsheet, flags and ontology are restored as they were saved
+		h = handler.Handler()
+		h.build_ontology(self._ontology_copy())
+		h.import_bms(self.bms_path, False)
+		h.apply_rules(self.rules_path)
+		session_path = os.path.join(self.tmpdir.name, 'session.pkl')
+		h.save_session(session_path)
+
+		loaded = handler.Handler()
+		loaded.load_session(session_path)
+		self.assertNotIn('[ERROR]', self.out.getvalue())
+		pandas.testing.assert_frame_equal(h.ls._df, loaded.ls._df)
+		self.assertEqual(h.ls._std_header_map, loaded.ls._std_header_map)
+		self.assertTrue(loaded.loadsheet_built and loaded.ontology_built)
+		self.assertEqual(h.ontology_hash, loaded.ontology_hash)
+		self.assertEqual(sorted(h.ontology.types.types['HVAC']), sorted(loaded.ontology.types.types['HVAC']))
+		#the rule state is rebuilt after loading
+		self.assertEqual(len(loaded.ls), loaded.ls.apply_rules(self.rules_path))
+
+	def test_session_version(self):
+		#sessions of another format version are not loaded
+		session_path = os.path.join(self.tmpdir.name, 'session.pkl')
+		with open(session_path, 'wb') as f:
+			pickle.dump({'version': handler._SESSION_VERSION + 1, 'ontology': None, 'state': {'loadsheet_built': True}}, f)
+		h = handler.Handler()
+		h.load_session(session_path)
+		self.assertIn('[ERROR]\tSession not loaded: Session file version {} is not supported.'.format(
+			handler._SESSION_VERSION + 1), self.out.getvalue())
+		self.assertFalse(h.loadsheet_built)
+
+	def test_session_ontology_source_changed(self):
+		#the ontology is stored under the hash of the files it was built from, not of the files at save time
+		ontology_root = self._ontology_copy()
+		built_hash = ontology.ontology.content_hash(ontology_root)
+		h = handler.Handler()
+		h.build_ontology(ontology_root)
+		self._add_unit(ontology_root)
+		session_path = os.path.join(self.tmpdir.name, 'session.pkl')
+		h.save_session(session_path)
+
+		rebuilt = handler.Handler()
+		rebuilt.build_ontology(ontology_root)
+		rebuilt_path = os.path.join(self.tmpdir.name, 'rebuilt.pkl')
+		rebuilt.save_session(rebuilt_path)
+		store = os.path.join(self.tmpdir.name, handler._ONTOLOGY_STORE)
+		self.assertEqual(sorted([built_hash + '.pickle', rebuilt.ontology_hash + '.pickle']), sorted(os.listdir(store)))
+
+		loaded = handler.Handler()
+		loaded.load_session(session_path)
+		self.assertEqual([], loaded.ontology.get_units_for_measurement('test_measurement'))
+		loaded.load_session(rebuilt_path)
+		self.assertEqual(['test_units'], loaded.ontology.get_units_for_measurement('test_measurement'))
+
+		#without its stored ontology, a session of a changed source is not loaded
+		os.remove(os.path.join(store, built_hash + '.pickle'))
+		self.assertNotIn('[ERROR]', self.out.getvalue())
+		fresh = handler.Handler()
+		fresh.load_session(session_path)
+		self.assertIn('[ERROR]\tSession not loaded', self.out.getvalue())
+		self.assertFalse(fresh.ontology_built)
+
+	def _assets(self):
+		rows = []
+		for asset_name, general_type, fields in [('AHU-1', 'AHU', ['fA', 'fB']), ('AHU-2', 'AHU', ['fB', 'fA']),
+				('AHU-3', 'AHU', ['fA']), ('FCU-1', 'FCU', ['fA', 'fB'])]:
+			for field_name in fields:
+				row = {key: 'x' for key in representations.representations._DUMP_KEYS}
+				row.update({'required': 'YES', 'generaltype': general_type, 'assetname': asset_name,
+							'standardfieldname': field_name})
+				rows.append(row)
+		assets = representations.representations.Assets()
+		assets.load_from_data(rows)
+		return assets
+
+	def test_match_assets(self):
+		#the ontology is searched once per fieldset and general type, and each asset gets its own match
+		def find_best_fit_type(fields, namespace, general_type):
+			match = ontology.ontology.Match()
+			match.set_ont_type_name('{}_{}'.format(general_type, len(fields)))
+			return match
+
+		h = handler.Handler()
+		h.reps = self._assets()
+		h.ontology = mock.Mock(find_best_fit_type=mock.Mock(side_effect=find_best_fit_type))
+		h._match_assets(h.reps.assets)
+
+		self.assertEqual(3, h.ontology.find_best_fit_type.call_count)
+		matches = {asset_name: asset.match for asset_name, asset in h.reps.assets.items()}
+		self.assertEqual({'AHU-1': 'AHU_2', 'AHU-2': 'AHU_2', 'AHU-3': 'AHU_1', 'FCU-1': 'FCU_2'},
+						 {asset_name: match.ont_type_name for asset_name, match in matches.items()})
+		self.assertIsNot(matches['AHU-1'], matches['AHU-2'])
+		matches['AHU-1'].set_ont_type_name('AHU_X')
+		self.assertEqual('AHU_2', matches['AHU-2'].ont_type_name)
+
+	def test_session_fieldsets(self):
+		#assets keep their fieldset ids across a session, and group as before
+		h = handler.Handler()
+		h.reps = self._assets()
+		h.types = h.reps.determine_types()
+		session_path = os.path.join(self.tmpdir.name, 'session.pkl')
+		h.save_session(session_path)
+
+		loaded = handler.Handler()
+		loaded.load_session(session_path)
+		self.assertNotIn('[ERROR]', self.out.getvalue())
+		self.assertEqual({asset_name: asset.fieldset_id for asset_name, asset in h.reps.assets.items()},
+						 {asset_name: asset.fieldset_id for asset_name, asset in loaded.reps.assets.items()})
+		self.assertEqual(h.types, loaded.reps.determine_types())
+		self.assertEqual(h.types, loaded.types)
+
+
+if __name__ == '__main__':
+    unittest.main()
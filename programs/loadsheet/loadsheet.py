@@ -19,24 +19,45 @@ __author__ = 'Trevor S., Shane S., Andrew K.'
 import os
 import sys
 import string
-import win32com.client as win32
-from datetime import datetime
+import glob
+import bisect
+import concurrent.futures
 
 from typing import Optional
 from typing import Union
 from typing import Dict
 from typing import List
 from typing import Any
+from typing import Tuple
+from typing import Iterator
 
 # Open-source Packages
 import openpyxl
+import xlsxwriter
 import re
 import pandas as pd
+import numpy as np
+
+try:
+    # optional: only needed for parquet output
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 sys.path.append('../')
 
 # Proprietary Packages
 from rules.rules import Rules
+from rules.rules import CompileRules
+from table_reader.table_reader import read_table
+from table_reader.table_reader import LOADSHEET_DTYPES
+from table_reader.table_reader import BMS_DTYPES
+from table_reader.table_reader import read_csv_chunks
+from table_reader.table_reader import BINARY_FILE_TYPES
+from table_reader.table_reader import read_binary
+from table_reader.table_reader import write_binary
 
 # Module GOBAL and CONTRAINTS
 
@@ -88,6 +109,30 @@ _ML_PREDICTION_HEADERS = ['required',
                         'generalType']
 
 
+# ALC export column names to loadsheet column names
+_BMS_COLUMN_RENAMES = {
+        'Location': 'location',
+        'Control Program': 'controlProgram',
+        'Name': 'name',
+        'Type': 'type',
+        'Device ID': 'deviceId',
+        'Object ID': 'objectId',
+        'Path': 'path',
+        'Object Name': 'objectName'
+}
+
+# only export rows with a BACnet object id ("AV:3") are points
+_BMS_ROW_FILTER = {'Object ID': ':'}
+
+# ALC object ids are "<BACnet object type>:<instance number>", e.g. "AV:3"
+_OBJECT_ID_PATTERN = r'^\s*([A-Za-z][A-Za-z0-9_-]*)\s*:\s*(\d+)\s*$'
+
+# how many unparseable object ids a BMS import lists by value
+_MAX_REPORTED_IDS = 10
+
+# rows per chunk when streaming a BMS export through the rules engine
+_STREAM_CHUNKSIZE = 50000
+
 _STD_ORDERED_HEADERS = [
         'location', 
         'controlprogram', 
@@ -110,8 +155,39 @@ _STD_ORDERED_HEADERS = [
         'requiredconf',
         'standardfieldnameconf',
         'standardfieldnamealt',
+        'sourcefile',
+]
+
+# Low-cardinality text columns, kept dictionary encoded (pandas categorical):
+# each distinct value is stored once and rows hold small integer codes, so
+# masks like required == 'YES' and groupbys compare codes, not strings.
+_CATEGORICAL_COLUMNS = [
+        'building',
+        'generaltype',
+        'typename',
+        'units',
+        'objecttype',
+        'type',
+        'required',
+        'ismissing',
+        'manuallymapped',
+        'location'
+]
+
+# Secondary row indexes (see Loadsheet.get_row_ids), each over these columns
+_ROW_INDEXES = [
+        ('assetname',),
+        ('deviceid',),
+        ('deviceid', 'objecttype', 'objectid'),
+        ('generaltype',)
 ]
 
+# rows converted to dicts at a time when streaming rows
+_ROW_STREAM_CHUNKSIZE = 1000
+
+# Stable identity of a point across versions of a loadsheet (see Loadsheet.diff)
+_POINT_KEY_COLUMNS = ['deviceid', 'objecttype', 'objectid', 'path']
+
 
 class Loadsheet:
     """
@@ -137,6 +213,10 @@ class Loadsheet:
             3) From BMS file*:
                ls = Loadsheet.from_bms(<bms_file_path>)
 
+            4) From a binary (.parquet/.feather/.arrow) loadsheet:
+               ls.export_to_binary(<binary_file_path>)
+               ls = Loadsheet.from_binary(<binary_file_path>)
+
             * - By default, expects header row at top
 
     Dependencies:
@@ -160,7 +240,7 @@ class Loadsheet:
 
     def __init__(
             self,
-            data: List[Dict[str,Any]],
+            data: Union[List[Dict[str,Any]], pd.DataFrame],
             std_header_map: Dict[str,str],
 
             #has_normalized_fields: bool= False,
@@ -175,12 +255,142 @@ class Loadsheet:
         # 			*[_REQ_INPUT_HEADERS+_REQ_OUTPUT_HEADERS if has_normalized_fields
         # 			else _REQ_INPUT_HEADERS]))
         # # end by sypks
-        new_data = []
-        # converts camel case keys to lowercase, all fields are referenced as lowercase further (added 2023-06-01)
-        for row in data:
-            new_data.append({k.lower(): v for k, v in row.items()})
-        self._data = new_data
+        self._version = 0
+        self._set_rows(data)
         self._std_header_map = std_header_map
+        self._rule_state = None
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    def __getstate__(self) -> Dict[str,Any]:
+        """
+        Pickled state (used for session snapshots): the table and header
+        map. The row view is folded into the table and the rule cache is
+        dropped; both are rebuilt on demand.
+        """
+        state = self.__dict__.copy()
+        state['_records'] = None
+        state['_rule_state'] = None
+        state['_edited_rows'] = set()
+        state['_indexes'] = {}
+        return state
+
+    def _set_rows(self, data: Union[List[Dict[str,Any]], pd.DataFrame]) -> None:
+        """
+        Replaces the rows of the loadsheet. The rows are kept in a single
+        table (self._df); a list of row dicts (self._data) is only built
+        when row-by-row code asks for it. Row dicts handed out before are
+        not rows of the loadsheet anymore.
+        args:
+            data - list of row dicts or dataframe
+        returns:
+            None
+        """
+        if isinstance(data, pd.DataFrame):
+            df = data.reset_index(drop=True)
+        else:
+            df = pd.DataFrame.from_records(data)
+        # converts camel case keys to lowercase, all fields are referenced as lowercase further (added 2023-06-01)
+        df.columns = [str(c).lower() for c in df.columns]
+        self._table = self._encode_categories(df)
+        self._records = None
+        self._indexes = {}
+        # rows edited (see update_row) since the last apply_rules
+        self._edited_rows = set()
+        self._version += 1
+
+    @property
+    def _df(self) -> pd.DataFrame:
+        """
+        The loadsheet table, one column per standardized header. Edits made
+        through the row view (self._data) are already in it.
+        """
+        return self._table
+
+    @staticmethod
+    def _encode_categories(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Dictionary encodes the low-cardinality text columns
+        (_CATEGORICAL_COLUMNS) of a table that are not encoded yet.
+        args:
+            df - loadsheet table, modified in place
+        returns:
+            the table
+        """
+        for column in _CATEGORICAL_COLUMNS:
+            if column in df.columns and df[column].dtype == object:
+                df[column] = df[column].astype('category')
+        return df
+
+    def _decoded_df(self) -> pd.DataFrame:
+        """
+        Copy of the loadsheet table with the categorical columns as plain
+        text, for code that writes new values into parts of a column.
+        """
+        df = self._df
+        return df.astype({c: object for c in df.columns
+                          if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+    def memory_usage(self) -> Tuple[int, int]:
+        """
+        Memory used by the loadsheet table
+        returns:
+            bytes used, and bytes the same table would use with every
+            categorical column stored as text
+        """
+        df = self._df
+        encoded = int(df.memory_usage(deep=True).sum())
+        as_text = encoded
+        for column in df.columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # as text, every row holds a pointer to its own string (NaN: a float)
+                codes = values.cat.codes.to_numpy()
+                counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+                sizes = np.array([sys.getsizeof(c) for c in values.cat.categories], dtype=np.int64)
+                as_text += int(8 * len(values) + counts @ sizes + (codes < 0).sum() * sys.getsizeof(np.nan)
+                               - values.memory_usage(deep=True, index=False))
+        return encoded, as_text
+
+    @property
+    def _data(self) -> List[Dict[str,Any]]:
+        """
+        Row view of the loadsheet for code that works row by row: a list of
+        dicts keyed by standardized header. Rows may be edited in place
+        (row[header] = value, row.update(...)); each edit is written
+        through to the table with update_row, so the dicts stay rows of the
+        loadsheet until its rows are replaced.
+        """
+        if self._records is None:
+            records = [_Row(record) for record in self._table.to_dict('records')]
+            for i, record in enumerate(records):
+                record._sheet = self
+                record._id = i
+            self._records = records
+        return self._records
+
+    def _refresh_row_view(self, columns: List[str], rows: Optional[List[int]] = None) -> None:
+        """
+        Copies table values into the row view's dicts, after columns were
+        written in the table directly instead of through update_row
+        args:
+            columns - standardized headers written
+            rows - row ids written, default None (all rows)
+        returns:
+            None
+        """
+        if self._records is None or not columns:
+            return
+        df = self._table[columns]
+        if rows is not None:
+            df = df.iloc[rows]
+        for i, values in zip(range(len(df)) if rows is None else rows, df.to_dict('records')):
+            dict.update(self._records[i], values)
+
+    @_data.setter
+    def _data(self, data: List[Dict[str,Any]]) -> None:
+        self._set_rows(data)
 
     def _update_header_map(self, orig_headers: List[str]):
         """
@@ -203,7 +413,7 @@ class Loadsheet:
         returns:
             None
         """
-        self._data = df.to_dict('records')
+        self._set_rows(df)
 
     @staticmethod
     def _parse_building_name(text: str) -> str:
@@ -245,93 +455,57 @@ class Loadsheet:
         ordered_data_headers = [h for h in _STD_ORDERED_HEADERS if h in df.columns]
         return df[ordered_data_headers]
 
-    def create_pivot_table(self, path: str) -> None:
-        # Create pivot table using win32com (native Excel)
-        excel = win32.gencache.EnsureDispatch('Excel.Application')
-        excel.Visible = False  # Set True for debugging
-        wb = excel.Workbooks.Open(path)
-        ws_data = wb.Sheets("Sheet1")
-        sheet_names = [sheet.Name for sheet in wb.Sheets]
-
-        # Get the used range dynamically
-        last_row = ws_data.UsedRange.Rows.Count
-        last_col = ws_data.UsedRange.Columns.Count
-        col_letter = chr(64 + last_col)  # assumes < 26 columns
-
-        # Build source range like "Sheet1!A1:D100"
-        source_range = f"Sheet1!A1:{col_letter}{last_row}"
-
-        # Create pivot cache
-        pivot_cache = wb.PivotCaches().Create(
-            SourceType=1,  # xlDatabase
-            SourceData=source_range
-        )
-
-        # Add Pivot sheet
-        if "Pivot" in sheet_names:
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-            sheet_name = f"Pivot_{timestamp}"
-        else: sheet_name = "Pivot"
-        try:
-            ws_pivot = wb.Sheets("Pivot")
-        except:
-            ws_pivot = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-            ws_pivot.Name = sheet_name
-
-        # Create pivot table at top left
-        pivot_table = pivot_cache.CreatePivotTable(
-            TableDestination=f"Pivot!R1C1",
-            TableName="AssetPivot"
-        )
-
-        # Set pivot fields
-        pf = pivot_table.PivotFields
-
-        # Set assetName as row field
-        pf("assetName").Orientation = 1  # xlRowField
-        pf("standardFieldName").Orientation = 2  # xlColumnField
-        pf("standardFieldName").Orientation = 4  # xlDataField
-
-        # Add filters
-        pf("required").Orientation = 3  # xlPageField
-        pf("generalType").Orientation = 3  # xlPageField
-
-        # Make column labels (standardFieldName) vertical
-        pivot_table.PivotFields("standardFieldName").DataRange.Cells.HorizontalAlignment = -4131  # xlCenter
-        pivot_table.PivotFields("standardFieldName").DataRange.Cells.VerticalAlignment = -4130  # xlCenter
-        pivot_table.PivotFields("standardFieldName").DataRange.Cells.Orientation = 90  # Rotate text 90 degrees (vertical)
-
-        # Save and close
-        wb.Save()
-        wb.Close()
-        excel.Quit()
+    def create_pivot_table(self, df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Asset x standardFieldName pivot of the required points: one row per
+        (generalType, assetName), one column per standardFieldName, cells
+        count the points mapped to that asset field (more than 1 is a
+        duplicate).
+        args:
+            df - loadsheet table to pivot, default the loadsheet's own
+        returns:
+            dataframe of counts indexed by (generaltype, assetname); empty if
+            the loadsheet has no normalized fields
+        """
+        if df is None:
+            df = self._df
+        if not {'required', 'generaltype', 'assetname', 'standardfieldname'}.issubset(df.columns):
+            return pd.DataFrame()
+        points = df[df['required'] == 'YES']
+        return pd.crosstab(
+            [points['generaltype'].astype(object).fillna(''), points['assetname'].astype(object).fillna('')],
+            points['standardfieldname'])
+
+    @staticmethod
+    def _sheet_rows(df: pd.DataFrame) -> List[List[Any]]:
+        """ Rows of a dataframe as python values, with None for empty cells. """
+        return df.astype(object).where(df.notna(), None).values.tolist()
 
     @classmethod
     def from_loadsheet(
             cls,
             filepath: str,
-            has_normalized_fields: bool= False
+            has_normalized_fields: bool= False,
+            columns: Optional[List[str]]= None
             ):
         """
         Initializes loadsheet object from existing loadsheet Excel file
         args:
             filepath - absolute filepath to loadsheet excel file
             has_normalized_fields - flag if has normalized fields
+            columns - only read these columns, default None (all columns)
         returns:
             loadsheet object
         """
+        if os.path.splitext(filepath)[1] in BINARY_FILE_TYPES:
+            return cls.from_binary(filepath, columns)
+
         # hardcode header rows as [0] for initial release
         valid_file_types = {
             '.xlsx':'excel',
             '.csv':'bms_file'
         }
-        file_type = os.path.splitext(filepath)[1]
-
-
-        if file_type == '.xlsx':
-            df = pd.read_excel(filepath, header= 0)
-        elif file_type == '.csv':
-            df = pd.read_csv(filepath, header= 0)
+        df = read_table(filepath, columns=columns, dtypes=LOADSHEET_DTYPES)
         std_header_map = Loadsheet._to_std_header_mapping(
                 df.columns)
         df.columns = std_header_map.keys()
@@ -349,47 +523,71 @@ class Loadsheet:
                  else _REQ_INPUT_HEADERS])))
 
         return cls(
-            df.to_dict('records'),
+            df,
             std_header_map
             )
         # end by sypks
 
+    @classmethod
+    def from_binary(
+            cls,
+            filepath: str,
+            columns: Optional[List[str]]= None
+            ):
+        """
+        Initializes loadsheet object from a binary loadsheet written by
+        export_to_binary. Column dtypes and the header map are restored as
+        they were saved.
+        args:
+            filepath - path to the .parquet, .feather or .arrow file
+            columns - only read these columns, default None (all columns)
+        returns:
+            loadsheet object
+        """
+        df, metadata = read_binary(filepath, columns)
+        saved_map = metadata.get('std_header_map', {})
+        # table column of each original header, as it was named when saved
+        saved_columns = metadata.get('columns', {})
+        std_by_orig = {orig: std for std, orig in saved_map.items()}
+        std_header_map = Loadsheet._to_std_header_mapping(df.columns)
+        std_header_map = {std_by_orig.get(orig, std): orig for std, orig in std_header_map.items()}
+        df.columns = [saved_columns.get(orig, std) for std, orig in std_header_map.items()]
+        # keep map entries for columns not in the file (e.g. when reading a subset)
+        for std, orig in saved_map.items():
+            std_header_map.setdefault(std, orig)
+        return cls(
+            df,
+            std_header_map
+            )
+
     @classmethod
     def from_bms(
             cls,
-            filepath: str
+            filepath: str,
+            building: Optional[str]= None
             ):
         """
         Initializes loadsheet object from existing BMS file
         args:
             filepath - absolute filepath to BMS file
+            building - building code of the rows, default None parses it
+                       from the file path
             ini_config_filepath - not currently enabled, do not use
         returns:
             loadsheet object
         """
 
-        file_type = os.path.splitext(filepath)[1]
-
-        if file_type == '.xlsx':
-            df = pd.read_excel(filepath, header= 0, engine="openpyxl")
-        elif file_type == '.csv':
-            df = pd.read_csv(filepath, header= 0, encoding="utf-8")
-
-        df.drop(['I/O Type'], axis='columns', inplace=True)
-        df = df.dropna(subset=['Object ID'], axis=0)
-        df = df[df['Object ID'].str.contains(":")]
-        df['objectType'] = ''
-        df.rename(columns={
-                        'Location': 'location',
-                        'Control Program': 'controlProgram',
-                        'Name': 'name',
-                        'Type': 'type',
-                        'Device ID': 'deviceId',
-                        'Object ID': 'objectId',
-                        'Path': 'path',
-                        'Object Name': 'objectName',
-                        'Path': 'path'}, inplace=True)
-        df['building'] = Loadsheet._parse_building_name(filepath)
+        is_csv = os.path.splitext(filepath)[1] == '.csv'
+        if is_csv:
+            # rows without a BACnet object id are dropped while reading
+            df = pd.concat(read_csv_chunks(filepath, dtypes=BMS_DTYPES, contains=_BMS_ROW_FILTER),
+                           ignore_index=True)
+        else:
+            df = read_table(filepath, dtypes=BMS_DTYPES)
+
+        if building is None:
+            building = Loadsheet._parse_building_name(filepath)
+        df = Loadsheet._prepare_bms_frame(df, building, rows_filtered=is_csv)
 
         std_header_map = Loadsheet._to_std_header_mapping(
                 df.columns)
@@ -411,11 +609,228 @@ class Loadsheet:
                  _REQ_INPUT_HEADERS_BMS)))
 
         return cls(
-            df.to_dict('records'),
+            df,
             std_header_map
             )
         # end by sypks
 
+    @staticmethod
+    def find_bms_files(pattern: str) -> List[str]:
+        """
+        Expands a BMS import argument into the files to import
+        args:
+            pattern - a BMS file, a directory (all .csv and .xlsx files in
+                      it) or a glob pattern
+        returns:
+            sorted list of file paths
+        """
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        return sorted(path for path in glob.glob(pattern)
+                      if os.path.splitext(path)[1] in ('.csv', '.xlsx') and os.path.isfile(path))
+
+    @classmethod
+    def from_bms_files(
+            cls,
+            filepaths: List[str],
+            max_workers: Optional[int]= None
+            ):
+        """
+        Initializes one loadsheet object from many BMS files (e.g. one ALC
+        export per controller network). The files are read concurrently in
+        a process pool, each row is tagged with its file name (sourceFile)
+        and the header maps are merged.
+        args:
+            filepaths - BMS files to import
+            max_workers - number of worker processes, default None (one per
+                          core); 1 reads the files in this process
+        returns:
+            loadsheet object
+        """
+        if not filepaths:
+            raise RuntimeError("[ERROR] No BMS files to import.")
+        # building codes are resolved up front: parsing may ask the user
+        buildings = [Loadsheet._parse_building_name(path) for path in filepaths]
+
+        if max_workers == 1 or len(filepaths) == 1:
+            results = list(map(_read_bms_file, filepaths, buildings))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(_read_bms_file, filepaths, buildings))
+
+        std_header_map = {}
+        frames = []
+        for path, (df, header_map) in zip(filepaths, results):
+            for std, orig in header_map.items():
+                std_header_map.setdefault(std, orig)
+            frames.append(df.assign(sourcefile=os.path.basename(path)))
+        std_header_map['sourcefile'] = 'sourceFile'
+
+        categorical = {c for df in frames for c in df.columns
+                       if isinstance(df[c].dtype, pd.CategoricalDtype)}
+        df = pd.concat(frames, ignore_index=True)
+        # concatenated categoricals with different categories come back as object
+        for column in categorical | {'sourcefile'}:
+            df[column] = df[column].astype('category')
+        return cls(
+            df,
+            std_header_map
+            )
+
+    @staticmethod
+    def _prepare_bms_frame(
+            df: pd.DataFrame,
+            building: str,
+            rows_filtered: bool = False
+            ) -> pd.DataFrame:
+        """
+        Applies the ALC export clean-up shared by the BMS importers: drops
+        rows without a BACnet object id and renames the export columns
+        args:
+            df - raw BMS export dataframe (or chunk of it)
+            building - building code to tag the rows with
+            rows_filtered - the reader already applied _BMS_ROW_FILTER
+        returns:
+            cleaned dataframe with loadsheet column names, the object
+            type and instance number split out of the object id
+        """
+        df = df.drop(columns=['I/O Type'], errors='ignore')
+        if not rows_filtered:
+            df = df.dropna(subset=['Object ID'], axis=0)
+            df = df[df['Object ID'].str.contains(":")]
+        df = Loadsheet._split_object_ids(df)
+        df.rename(columns=_BMS_COLUMN_RENAMES, inplace=True)
+        df['building'] = building
+        return df
+
+    @staticmethod
+    def _split_object_ids(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Splits the ALC 'Object ID' ("AV:3") into an 'objectType' column
+        (categorical) and the integer instance number (int32), in place of
+        the id. Rows whose id does not parse are kept with an empty (NaN)
+        type and instance, and reported once; the instances are then kept
+        as Python ints next to NaN (object dtype), so they still read and
+        export as integers.
+        args:
+            df - BMS export dataframe with an 'Object ID' column
+        returns:
+            dataframe with 'objectType' and a numeric 'Object ID'
+        """
+        # ids repeat across devices (AV:1 ... on every controller), so the
+        # pattern runs once per distinct id and the results are broadcast
+        codes, ids = pd.factorize(df['Object ID'])
+        parts = pd.Series(ids, dtype=object).str.extract(_OBJECT_ID_PATTERN)
+        # one more entry for rows without an id (code -1)
+        types = np.append(parts[0].to_numpy(dtype=object), np.nan)
+        numbers = pd.to_numeric(parts[1]).to_numpy(dtype=np.float64)
+        numbers = np.append(numbers, np.nan)[codes]
+        bad = np.isnan(numbers)
+        if bad.any():
+            bad_ids = df.loc[bad, 'Object ID'].unique().tolist()
+            print(f"[WARNING]\t{int(bad.sum())} BMS rows kept without object type and instance, "
+                  f"Object ID could not be parsed: "
+                  f"{', '.join(map(repr, bad_ids[:_MAX_REPORTED_IDS]))}"
+                  f"{' ...' if len(bad_ids) > _MAX_REPORTED_IDS else ''}")
+            instances = numbers.astype(object)
+            instances[~bad] = numbers[~bad].astype(np.int64)
+            numbers = instances
+        else:
+            numbers = numbers.astype(np.int32)
+        df = df.assign(**{'Object ID': numbers,
+                          'objectType': pd.Categorical(types[codes])})
+        return df
+
+    @staticmethod
+    def normalize_bms_stream(
+            filepath: str,
+            rule_file: str,
+            output_filepath: str,
+            chunksize: int = _STREAM_CHUNKSIZE,
+            early_exit: bool = False
+            ) -> int:
+        """
+        Streams a BMS CSV export through the rules engine without loading it
+        whole: the export is read in fixed-size chunks, each chunk is
+        normalized and appended to the output file, so memory stays bounded
+        by the chunk size.
+        args:
+            filepath - path to the BMS csv export
+            rule_file - path to the rule file (JSON or Rule Generator workbook)
+            output_filepath - .csv or .parquet output file
+            chunksize - number of BMS rows per chunk
+            early_exit - use the rules engine's early-exit evaluation
+        returns:
+            number of rows written
+        """
+        out_type = os.path.splitext(output_filepath)[1]
+        if out_type not in ('.csv', '.parquet'):
+            raise ValueError(f"Output file type '{out_type}' not supported. Use .csv or .parquet.")
+        if out_type == '.parquet' and pq is None:
+            raise RuntimeError("Parquet output requires the pyarrow package.")
+
+        r = CompileRules(rule_file)
+        building = Loadsheet._parse_building_name(filepath)
+
+        # all BMS columns are text; fixing the dtype keeps chunks consistent
+        reader = read_csv_chunks(filepath, dtypes=BMS_DTYPES, contains=_BMS_ROW_FILTER,
+                                 chunksize=chunksize)
+
+        columns = None
+        header_map = None
+        parquet_writer = None
+        rows_written = 0
+        try:
+            for chunk in reader:
+                df = Loadsheet._prepare_bms_frame(chunk, building, rows_filtered=True)
+                if columns is None:
+                    header_map = Loadsheet._to_std_header_mapping(df.columns)
+                    if not Loadsheet._is_valid_headers(
+                            header_map.keys(),
+                            _REQ_INPUT_HEADERS_BMS,
+                            has_normalized_fields=False
+                            ):
+                        raise RuntimeError("[ERROR] BMS headers:\n {} \nDoes not match "
+                            "configuration headers:\n {}".format(', '.join(df.columns.tolist()),', '.join(
+                             _REQ_INPUT_HEADERS_BMS)))
+                    for orig, std in zip(_REQ_OUTPUT_HEADERS_ORIG, _REQ_OUTPUT_HEADERS):
+                        header_map.setdefault(std, orig)
+                    for std in sorted(r.GetOutputFields()):
+                        header_map.setdefault(std, std)
+                    columns = Loadsheet._order_data(
+                        pd.DataFrame(columns=list(header_map.keys()))).columns.tolist()
+                    columns += [c for c in header_map if c not in columns]
+
+                df.columns = Loadsheet._to_std_headers(df.columns)
+                records = df.to_dict('records')
+                # input columns are prepared for the patterns once per chunk
+                buffers = r.PrepareColumns({c: df[c].tolist() for c in df.columns})
+                for i, row in enumerate(records):
+                    for std in _REQ_OUTPUT_HEADERS:
+                        row.setdefault(std, '')
+                    r.ApplyRules(row, earlyExit=early_exit,
+                                 prepared=r.PreparedRow(buffers, i))
+
+                out = pd.DataFrame.from_records(records, columns=columns)
+                out.columns = [header_map[c] for c in columns]
+
+                if out_type == '.csv':
+                    out.to_csv(output_filepath, mode='w' if rows_written == 0 else 'a',
+                               header=rows_written == 0, index=False)
+                else:
+                    table = pa.Table.from_pydict(
+                        {c: pa.array([None if v is None or v != v else str(v) for v in out[c]],
+                                     type=pa.string()) for c in out.columns})
+                    if parquet_writer is None:
+                        parquet_writer = pq.ParquetWriter(output_filepath, table.schema)
+                    parquet_writer.write_table(table)
+                rows_written += len(out)
+        finally:
+            if parquet_writer is not None:
+                parquet_writer.close()
+
+        return rows_written
+
     def _rename_to_std(self, df):
         df.columns = self._std_header_map.values()
 
@@ -474,29 +889,313 @@ class Loadsheet:
         """
         return self._std_header_map[header]
 
+    def _original_headers(self, columns: List[str]) -> List[str]:
+        """
+        Returns the original headers of table columns. Columns are named by
+        their standardized header, or by their lowercased original header
+        when the loadsheet was built from rows keyed by original headers.
+        """
+        std_headers = Loadsheet._to_std_headers([str(c) for c in columns])
+        return [self._std_header_map.get(c, self._std_header_map.get(std, c))
+                for c, std in zip(columns, std_headers)]
+
+    def _row_index(self, columns: Tuple[str, ...]) -> Dict[Any, List[int]]:
+        """
+        Secondary index over the given columns: key (a value, or a tuple of
+        values for several columns) -> sorted row ids. Rows with an empty
+        key column are not indexed. Built on first use and then kept up to
+        date by update_row.
+        """
+        df = self._df
+        index = self._indexes.get(columns)
+        if index is None:
+            if not set(columns).issubset(df.columns):
+                index = {}
+            else:
+                groups = df.groupby(list(columns) if len(columns) > 1 else columns[0],
+                                    sort=False, observed=True).indices
+                index = {key: rows.tolist() for key, rows in groups.items()}
+            self._indexes[columns] = index
+        return index
+
+    def get_row_ids(self, **where: Any) -> List[int]:
+        """
+        Row ids of the rows with the given column values, using the
+        secondary indexes (_ROW_INDEXES) where they cover the columns
+        args:
+            where - standardized column name to value, e.g.
+                    deviceid='DEV:1', objecttype='AV', objectid=3
+        returns:
+            sorted list of row ids
+        """
+        df = self._df
+        columns = tuple(sorted(where))
+        for index_columns in _ROW_INDEXES:
+            if tuple(sorted(index_columns)) == columns:
+                key = tuple(where[c] for c in index_columns)
+                return list(self._row_index(index_columns).get(key if len(key) > 1 else key[0], []))
+
+        # narrow down with the most selective single column index, check the rest
+        indexed = [c for c in columns if (c,) in _ROW_INDEXES]
+        if indexed:
+            rows = min((self._row_index((c,)).get(where[c], []) for c in indexed), key=len)
+        else:
+            rows = range(len(df))
+        rows = np.asarray(rows, dtype=np.int64)
+        for column in columns:
+            if column not in df.columns:
+                return []
+            rows = rows[(df[column].to_numpy()[rows] == where[column])]
+        return rows.tolist()
+
     def get_data_row(
             self,
             row: int
             ) -> Dict[str, Any]:
-        pass
+        """
+        Returns one row of the loadsheet
+        args:
+            row - row id (0 based position in the loadsheet)
+        returns:
+            dict of standardized header to value
+        """
+        return self._df.iloc[[row]].to_dict('records')[0]
 
-    def get_data_row_generator(self):
-        pass
+    def get_data_row_generator(
+            self,
+            rows: Optional[List[int]] = None,
+            columns: Optional[List[str]] = None,
+            **where: Any
+            ) -> Iterator[Dict[str, Any]]:
+        """
+        Streams loadsheet rows as dicts, converting a chunk of rows at a
+        time instead of the whole table
+        args:
+            rows - row ids to stream, default None (all rows)
+            columns - standardized headers to include, default None (all)
+            where - only rows with these column values (see get_row_ids)
+        returns:
+            generator of row dicts
+        """
+        if where:
+            matched = self.get_row_ids(**where)
+            rows = matched if rows is None else sorted(set(matched).intersection(rows))
+        df = self._df
+        if columns is not None:
+            df = df[columns]
+        if rows is None:
+            rows = range(len(df))
+        for start in range(0, len(rows), _ROW_STREAM_CHUNKSIZE):
+            chunk = df.iloc[rows[start:start + _ROW_STREAM_CHUNKSIZE]]
+            yield from chunk.to_dict('records')
+
+    def update_row(
+            self,
+            row: int,
+            values: Dict[str, Any]
+            ) -> None:
+        """
+        Edits cells of one row, keeping the secondary indexes up to date
+        args:
+            row - row id
+            values - standardized header to new value; new headers are
+                     added as columns
+        returns:
+            None
+        """
+        df = self._df
+        touched = [cols for cols in self._indexes if set(cols).intersection(values)]
+        old_keys = {cols: self._index_key(df, row, cols) for cols in touched}
+
+        for column, value in values.items():
+            if column not in df.columns:
+                df[column] = pd.Series(np.nan, index=df.index, dtype=object)
+                self._refresh_row_view([column])
+            elif isinstance(df[column].dtype, pd.CategoricalDtype) and not pd.isna(value) \
+                    and value not in df[column].cat.categories:
+                df[column] = df[column].cat.add_categories([value])
+            df.iat[row, df.columns.get_loc(column)] = value
+        self._refresh_row_view(list(values), [row])
+        self._edited_rows.add(row)
+
+        for cols in touched:
+            index = self._indexes[cols]
+            old_key, new_key = old_keys[cols], self._index_key(df, row, cols)
+            if old_key is not None:
+                index[old_key].remove(row)
+                if not index[old_key]:
+                    del index[old_key]
+            if new_key is not None:
+                bisect.insort(index.setdefault(new_key, []), row)
+
+    @staticmethod
+    def _index_key(df: pd.DataFrame, row: int, columns: Tuple[str, ...]) -> Any:
+        """ Index key of a row (see _row_index), None if a key column is empty. """
+        if not set(columns).issubset(df.columns):
+            return None
+        key = tuple(df.at[row, c] for c in columns)
+        if any(pd.isna(v) for v in key):
+            return None
+        return key if len(key) > 1 else key[0]
+
+    @staticmethod
+    def point_key(row: Dict[str,Any]) -> Tuple[str, ...]:
+        """
+        Identity of a point across versions of a loadsheet: its BACnet
+        device and object and its BMS path, as text
+        args:
+            row - row dict with standardized headers
+        returns:
+            tuple of strings, '' for empty values
+        """
+        return tuple(_key_text(row.get(column)) for column in _POINT_KEY_COLUMNS)
+
+    @staticmethod
+    def _point_key_codes(new: pd.DataFrame, old: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, np.ndarray]]:
+        """
+        point_key of the rows of two frames as integer codes, shared by both
+        frames, plus 'occurrence' to tell repeated keys apart
+        returns:
+            code frames of new and old, and per key column the text of each code
+        """
+        new_keys, old_keys, texts = pd.DataFrame(index=new.index), pd.DataFrame(index=old.index), {}
+        for column in _POINT_KEY_COLUMNS:
+            values = [df[column].to_numpy(dtype=object) if column in df.columns else np.full(len(df), None)
+                      for df in (new, old)]
+            codes, uniques = pd.factorize(np.concatenate(values), use_na_sentinel=False)
+            # values with the same text (e.g. 3 and 3.0) are the same key
+            codes_of_text, texts[column] = pd.factorize(
+                    np.array([v if isinstance(v, str) else _key_text(v) for v in uniques], dtype=object))
+            codes = codes_of_text[codes]
+            new_keys[column], old_keys[column] = codes[:len(new)], codes[len(new):]
+        for keys in (new_keys, old_keys):
+            keys['occurrence'] = keys.groupby(_POINT_KEY_COLUMNS, sort=False).cumcount()
+        return new_keys, old_keys, texts
+
+    def diff(self, previous: 'Loadsheet') -> 'LoadsheetDiff':
+        """
+        Compares the loadsheet with a previous version of it, matching rows
+        by point_key (in order of appearance where a key repeats) and then
+        comparing the matched rows column by column.
+        args:
+            previous - the earlier version of the loadsheet
+        returns:
+            LoadsheetDiff with row ids into this (added, modified) and the
+            previous (removed, modified) loadsheet
+        """
+        new, old = self._df, previous._df
+        new_keys, old_keys, texts = self._point_key_codes(new, old)
+        pairs = pd.merge(
+                new_keys.reset_index(names='new'),
+                old_keys.reset_index(names='old'),
+                on=_POINT_KEY_COLUMNS + ['occurrence'], how='outer', indicator=True)
+        added = np.sort(pairs.loc[pairs['_merge'] == 'left_only', 'new'].to_numpy(dtype=np.int64))
+        removed = np.sort(pairs.loc[pairs['_merge'] == 'right_only', 'old'].to_numpy(dtype=np.int64))
+        both = pairs[pairs['_merge'] == 'both'].sort_values('new')
+        new_ids = both['new'].to_numpy(dtype=np.int64)
+        old_ids = both['old'].to_numpy(dtype=np.int64)
+
+        # a column only in one version reads as empty in the other; matched
+        # rows have the same point key, whatever the type of its values
+        columns = [c for c in list(new.columns) + [c for c in old.columns if c not in new.columns]
+                   if c not in _POINT_KEY_COLUMNS]
+        changed = np.zeros((len(new_ids), len(columns)), dtype=bool)
+        for i, column in enumerate(columns):
+            a = new[column].to_numpy(dtype=object)[new_ids] if column in new.columns else np.full(len(new_ids), None)
+            b = old[column].to_numpy(dtype=object)[old_ids] if column in old.columns else np.full(len(old_ids), None)
+            differs = np.flatnonzero(a != b)
+            changed[differs, i] = ~(pd.isna(a[differs]) & pd.isna(b[differs]))
+        is_modified = changed.any(axis=1)
+        new_ids, old_ids, changed = new_ids[is_modified], old_ids[is_modified], changed[is_modified]
+
+        changed_columns = {column: int(n) for column, n in zip(columns, changed.sum(axis=0)) if n}
+        assets, keys, key_codes = set(), set(), set()
+        for df, codes, rows in [(new, new_keys, np.concatenate([added, new_ids])),
+                                (old, old_keys, np.concatenate([removed, old_ids]))]:
+            if 'assetname' in df.columns:
+                assets.update(df['assetname'].iloc[rows].dropna().tolist())
+            keys.update(zip(*(texts[c][codes[c].to_numpy()[rows]] for c in _POINT_KEY_COLUMNS)))
+            key_codes.update(codes[_POINT_KEY_COLUMNS].iloc[rows].itertuples(index=False, name=None))
+        key_rows = np.flatnonzero(pd.MultiIndex.from_frame(new_keys[_POINT_KEY_COLUMNS]).isin(list(key_codes)))
+        return LoadsheetDiff(
+                added=added.tolist(),
+                removed=removed.tolist(),
+                modified=dict(zip(new_ids.tolist(), old_ids.tolist())),
+                changed_columns=changed_columns,
+                affected_assets=assets,
+                changed_keys=keys,
+                changed_key_rows=key_rows.tolist())
+
+    def export_to_binary(self, output_filepath: str) -> None:
+        """
+        exports data in Loadsheet object to a .parquet or .feather/.arrow
+        (Arrow IPC) file for hand-off between workflow steps. Columns keep
+        their dtypes and original headers; the header map is saved with
+        the file so from_binary restores the loadsheet as it was.
+        args:
+            output_filepath - location and name of the output file
+        """
+        df = self.with_original_headers()
+        write_binary(
+            df,
+            output_filepath,
+            {'std_header_map': self._std_header_map,
+             'columns': dict(zip(df.columns, self._df.columns))})
+
+    def with_original_headers(self) -> pd.DataFrame:
+        """
+        The loadsheet table under the headers it was imported with (see
+        _std_header_map), e.g. to check it like the source file. The
+        columns are shared with the loadsheet, not copied.
+        returns:
+            pandas dataframe
+        """
+        df = self._df
+        return df.set_axis(self._original_headers(df.columns), axis=1, copy=False)
 
     def export_to_loadsheet(self, output_filepath):
         """
-        exports data in Loadsheet object to excel file
+        exports data in Loadsheet object to excel file, with the asset
+        pivot (see create_pivot_table) on a second sheet. The workbook is
+        written in a single pass, row by row (xlsxwriter constant_memory).
         args:
             output_filepath - location and name of excel file output
         """
-        df = pd.DataFrame.from_records(self._data)
-        df = self._order_data(df)
-        df.columns = [self._std_header_map[c] for c in df.columns]
-        df.to_excel(output_filepath, index=False)
+        df = self._order_data(self._df)
         try:
-            self.create_pivot_table(output_filepath)
+            pivot = self.create_pivot_table(df)
         except Exception as e:
             print(f"Couldn't create a pivot table: {e}")
+            pivot = pd.DataFrame()
+
+        workbook = xlsxwriter.Workbook(output_filepath, {
+            'constant_memory': True,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+            'strings_to_numbers': False
+            })
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+        try:
+            sheet = workbook.add_worksheet('Sheet1')
+            sheet.write_row(0, 0, [self._std_header_map[c] for c in df.columns], header_format)
+            for i, row in enumerate(self._sheet_rows(df)):
+                sheet.write_row(i + 1, 0, row)
+
+            if not pivot.empty:
+                field_format = workbook.add_format({'bold': True, 'rotation': 90, 'align': 'center'})
+                sheet = workbook.add_worksheet('Pivot')
+                index_headers = [self._std_header_map.get(c, c) for c in pivot.index.names]
+                sheet.write_row(0, 0, index_headers, header_format)
+                sheet.write_row(0, len(index_headers), pivot.columns.tolist(), field_format)
+                for i, (index, counts) in enumerate(zip(pivot.index, pivot.values.tolist())):
+                    sheet.write_row(i + 1, 0, list(index))
+                    for j, count in enumerate(counts):
+                        if count:
+                            sheet.write_number(i + 1, len(index_headers) + j, count)
+                sheet.freeze_panes(1, len(index_headers))
+                sheet.autofilter(0, 0, len(pivot), len(index_headers) + len(pivot.columns) - 1)
+        finally:
+            workbook.close()
 
 
     def validate(
@@ -545,9 +1244,7 @@ class Loadsheet:
                     'ismissing'
                     ]
 
-        # convert self._data to pd.DataFrame (we will transistion to
-        # using only dataframes internally in a future update)
-        df = pd.DataFrame.from_records(self._data)
+        df = self._df
 
         #required is always in [YES, NO]
         assert self._ensure_required_correct(df), "Unacceptable values in required column"
@@ -590,9 +1287,7 @@ class Loadsheet:
                         'ismissing'
                         ]
 
-            # convert self._data to pd.DataFrame (we will transistion to
-            # using only dataframes internally in a future update)
-            df = pd.DataFrame.from_records(self._data)
+            df = self._df
 
             #required is always in [YES, NO]
             if not self._ensure_required_correct(df):
@@ -643,50 +1338,414 @@ class Loadsheet:
         '''
         finds and returns a list of duplicate assetName-StandardFieldName pairs
         '''
-        data['uid'] = data['assetname'] + ' ' + data['standardfieldname']
-        df = data[data['required'] == 'YES']
-        counts = df['uid'].value_counts()
+        uid = data['assetname'] + ' ' + data['standardfieldname']
+        counts = uid[data['required'] == 'YES'].value_counts()
         df_counts = pd.DataFrame({'uid':counts.index, 'amt':counts.values})
         repeat_uid = df_counts[df_counts['amt'] > 1]['uid'].tolist()
         return repeat_uid
 
     def apply_rules(
                 self,
-                rule_file: Dict
-                ) -> None:
+                rule_file: Dict,
+                early_exit: bool = False
+                ) -> int:
             """
             Apply rules to the dataset. Will ignore any field where
             manuallyMapped is set to YES.
 
+            Rule application is incremental: the loadsheet remembers, per
+            row, the values of the output fields before any rule ran, which
+            rules fired and a fingerprint of the rule-relevant inputs. On a
+            repeated call only the rows touched by added, removed or
+            modified rules, and rows whose inputs changed, are re-run; every
+            re-run row starts again from its pre-rule values, so the result
+            always equals a full pass of the current ruleset. Output fields
+            edited by hand between runs count as pre-rule values: a re-run
+            applies the rules on top of the edit instead of reverting it.
+
             args:
-                - rule_file: path to the rule file
+                - rule_file: path to the rule file (JSON or Rule Generator
+                  workbook); compiled rulesets are cached per file hash
+                - early_exit: evaluate each row with the rules engine's
+                  early-exit mode (same outputs, fewer rules evaluated). It
+                  does not record every rule that fired, so all rows are
+                  re-run and the next call starts from a full pass.
 
-            returns: N/A
+            returns: number of rows the rules were (re-)applied to
 
             Note - See rules/rules.py for further information
             """
-            r = Rules(rule_file)
-            for row in self._data:
-                #add output headers
-                for orig, std in zip(_REQ_OUTPUT_HEADERS_ORIG, _REQ_OUTPUT_HEADERS):
-                    if std not in row.keys():
-                        row[std] = ""
-                    if std not in self._std_header_map.keys():
-                        self._std_header_map[std] = orig
-
-                #add manuallyMapped
-                if 'manuallymapped'not in row.keys():
-                    row['manuallymapped'] = ''				
-                if 'manuallymapped'not in  self._std_header_map.keys():
-                    self._std_header_map['manuallymapped'] = "manuallyMapped"
-
-
+            r = CompileRules(rule_file)
+            df = self._df
+            added_columns = []
+            #add output headers
+            for orig, std in zip(_REQ_OUTPUT_HEADERS_ORIG, _REQ_OUTPUT_HEADERS):
+                if std not in df.columns:
+                    df[std] = ""
+                    added_columns.append(std)
+                if std not in self._std_header_map.keys():
+                    self._std_header_map[std] = orig
+
+            #add manuallyMapped
+            if 'manuallymapped' not in df.columns:
+                df['manuallymapped'] = ''
+                added_columns.append('manuallymapped')
+            if 'manuallymapped'not in  self._std_header_map.keys():
+                self._std_header_map['manuallymapped'] = "manuallyMapped"
+
+            # the rules run row by row on just the columns they read or write
+            output_fields = r.GetOutputFields()
+            columns = [c for c in df.columns
+                       if c in r.GetReadFields() or c in output_fields or c == 'manuallymapped']
+
+            # start over if the rows were replaced since the last run
+            state = self._rule_state
+            if state is None or not state.is_valid_for(self._version, len(df)):
+                state = _RuleState(self._version)
+            if state.columns == columns and len(state.data) == len(df):
+                # the rows of the last run, with the ones edited since read again
+                edited = sorted(self._edited_rows)
+                rows_data = list(state.data)
+                for i, row in zip(edited, df[columns].iloc[edited].to_dict('records')):
+                    rows_data[i] = row
+            else:
+                edited = None
+                rows_data = df[columns].to_dict('records')
+            state.columns = columns
+            self._edited_rows = set()
+            state.snapshot(rows_data, output_fields, edited)
+
+            if early_exit:
+                rows = list(range(len(rows_data)))
+            else:
+                rows = state.get_affected_rows(r, edited)
+            # rule inputs are prepared for the patterns once per run; rule
+            # outputs are prepared as the rules write them
+            buffers = r.PrepareColumns({
+                field: df[field].iloc[rows].tolist()
+                for field in r.GetInputFields() if field in df.columns})
+            for k, i in enumerate(rows):
+                row = rows_data[i]
                 #skip manuallyMapped rows
                 if row['manuallymapped'] == 'YES':
+                    state.fired[i] = ()
                     continue
                 #apply rules
-                else:
-                    r.ApplyRules(row)
+                state.restore(i)
+                state.fired[i] = tuple(
+                    r.signatures[j] for j in r.ApplyRules(
+                        row, earlyExit=early_exit, prepared=r.PreparedRow(buffers, k)))
+
+            state.commit(r, edited)
+            if early_exit:
+                state.signatures = []
+            self._rule_state = state
+
+            # write the rule outputs of the re-run rows back to the table
+            for field in sorted(state.output_fields):
+                if field not in df.columns:
+                    df[field] = pd.Series([row.get(field, np.nan) for row in rows_data])
+                    added_columns.append(field)
+                elif rows:
+                    values = df[field].astype(object).to_numpy(copy=True)
+                    values[rows] = [rows_data[i].get(field, np.nan) for i in rows]
+                    df[field] = _keep_dtype(pd.Series(values).infer_objects(), df[field].dtype)
+            self._encode_categories(df)
+            self._refresh_row_view(added_columns)
+            self._refresh_row_view(sorted(state.output_fields - set(added_columns)), rows)
+            return len(rows)
+
+
+def _read_bms_file(filepath: str, building: str):
+    """ Process pool task of Loadsheet.from_bms_files: one file's table and header map. """
+    ls = Loadsheet.from_bms(filepath, building)
+    return ls._df, ls._std_header_map
+
+
+def _same_value(a: Any, b: Any) -> bool:
+    """ Whether two cell values are the same, with all empty values (None, NaN) alike. """
+    if pd.isna(a) or pd.isna(b):
+        return pd.isna(a) and pd.isna(b)
+    return bool(a == b)
+
+
+def _keep_dtype(values: pd.Series, dtype: Any) -> pd.Series:
+    """
+    A column rewritten by the rules, kept in its compact dtype when the new
+    values allow it: categorical columns stay categorical, integer columns
+    stay integer as long as the rules only left integers in them.
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        return values.astype('category')
+    if pd.api.types.is_integer_dtype(dtype) and pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype(dtype)
+    return values
+
+
+def _key_text(value: Any) -> str:
+    """ A point key value as text; integral floats (ids read next to blanks) print as integers. """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _Row(dict):
+    """
+    A row of a loadsheet's row view (Loadsheet._data): dict of standardized
+    header to value. Edits are written through to the loadsheet table with
+    Loadsheet.update_row. Cells cannot be removed from a row, so deleting
+    keys is not supported.
+    """
+    __slots__ = ('_sheet', '_id')
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._sheet.update_row(self._id, {key: value})
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self._sheet.update_row(self._id, dict(*args, **kwargs))
+
+    def __ior__(self, other: Dict[str,Any]) -> '_Row':
+        self.update(other)
+        return self
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def _fixed_columns(self, *args: Any) -> None:
+        raise TypeError("Loadsheet rows have a value for every column; set a value instead.")
+
+    __delitem__ = pop = popitem = clear = _fixed_columns
+
+
+class LoadsheetDiff:
+    """
+    Change set between two versions of a loadsheet, see Loadsheet.diff.
+
+    Attributes:
+        - added: row ids, in the new loadsheet, of points not in the previous one
+        - removed: row ids, in the previous loadsheet, of points no longer present
+        - modified: new row id -> previous row id of points with changed values
+        - changed_columns: standardized header -> number of modified rows
+          with a new value in it
+        - affected_assets: asset names, old and new, of all changed rows
+        - changed_keys: point keys (Loadsheet.point_key) of all changed rows
+        - changed_key_rows: row ids, in the new loadsheet, of all rows with
+          one of the changed_keys (repeated keys included)
+    """
+
+    def __init__(
+            self,
+            added: List[int],
+            removed: List[int],
+            modified: Dict[int, int],
+            changed_columns: Dict[str, int],
+            affected_assets: set,
+            changed_keys: set,
+            changed_key_rows: List[int]
+            ):
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+        self.changed_columns = changed_columns
+        self.affected_assets = affected_assets
+        self.changed_keys = changed_keys
+        self.changed_key_rows = changed_key_rows
+        # last key column (path) alone rules out most rows
+        self._changed_paths = {key[-1] for key in changed_keys}
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.modified)
+
+    def touches(self, row: Dict[str,Any]) -> bool:
+        """ True if a row dict (of either version) has one of the changed point keys. """
+        path = row.get(_POINT_KEY_COLUMNS[-1])
+        if isinstance(path, str) and path not in self._changed_paths:
+            return False
+        return Loadsheet.point_key(row) in self.changed_keys
+
+    def summary(self) -> str:
+        """ One line description of the change set. """
+        text = '{} added, {} removed, {} modified rows'.format(
+                len(self.added), len(self.removed), len(self.modified))
+        if self.changed_columns:
+            text += ' (changed: {})'.format(', '.join(sorted(self.changed_columns)))
+        return text
+
+
+class _RuleState:
+    """
+    Memory of the last rule application on a loadsheet's rows, used by
+    Loadsheet.apply_rules to only re-run rows that a ruleset or row edit
+    can affect. data holds the row dicts of the current run.
+
+    Per row it keeps:
+        - base: values of the rule output fields before any rule ran, or
+          as last edited outside rule application
+        - fired: signatures of the rules that fired, in firing order
+        - fingerprint: hash of the rule-relevant (non-output) inputs
+    """
+
+    def __init__(self, version: int):
+        self.version = version
+        self.data = []
+        self.columns = []
+        self.signatures = []
+        self.input_fields = []
+        self.output_fields = set()
+        self.base = []
+        self.fired = []
+        self.fingerprints = []
+
+    def is_valid_for(self, version: int, n_rows: int) -> bool:
+        """ The state only applies to the rows it was built on (see Loadsheet._set_rows). """
+        return version == self.version and len(self.base) <= n_rows
+
+    def fingerprint(self, row: Dict[str,Any]) -> int:
+        """ Hash of the rule inputs of a row; NaN and None read as '' like in the rules engine. """
+        values = []
+        for field in self.input_fields:
+            if field not in row:
+                values.append(None)
+                continue
+            value = row[field]
+            if value is None or value != value:
+                value = ''
+            values.append(str(value))
+        return hash(tuple(values))
+
+    def snapshot(
+            self,
+            data: List[Dict[str,Any]],
+            output_fields: set,
+            rows: Optional[List[int]] = None
+            ) -> None:
+        """
+        Takes the rows of a new run and records the pre-rule values of any
+        newly seen output fields and rows. Fields no previous rule wrote
+        still hold their pre-rule value, so they can be captured from the
+        current rows. Output values that differ from what the last run left
+        in a row were edited since, and become its new pre-rule values.
+        rows - the rows that may have been edited since the last run,
+               default None (all rows)
+        """
+        new_fields = set(output_fields) - self.output_fields
+        last_data = self.data
+        self.data = data
+        if rows is None or new_fields or len(self.base) < len(data):
+            rows = range(len(data))
+        for i in rows:
+            row = data[i]
+            if i < len(self.base):
+                last = last_data[i] if i < len(last_data) else {}
+                fields = new_fields | {field for field in self.output_fields
+                                       if not _same_value(row.get(field, np.nan), last.get(field, np.nan))}
+            else:
+                fields = self.output_fields | new_fields
+                self.base.append({})
+                self.fired.append(())
+            base = self.base[i]
+            for field in fields:
+                if field in row:
+                    base[field] = row[field]
+        self.output_fields |= new_fields
+
+    def restore(self, i: int, row: Optional[Dict[str,Any]] = None) -> Dict[str,Any]:
+        """ Resets the output fields of a row (or a copy of it) to their pre-rule values. """
+        if row is None:
+            row = self.data[i]
+        base = self.base[i]
+        for field in self.output_fields:
+            if field in base:
+                row[field] = base[field]
+            else:
+                row.pop(field, None)
+        return row
+
+    def get_affected_rows(self, rules: Rules, rows: Optional[List[int]] = None) -> List[int]:
+        """
+        Returns the indices of rows whose outputs may differ under the given
+        ruleset from the last run: new rows, rows with changed inputs, rows a
+        removed rule fired on, and rows an added rule fires on.
+        rows - the rows whose inputs may have changed since the last run,
+               default None (all rows)
+        """
+        all_rows = list(range(len(self.data)))
+        old, new = self.signatures, rules.signatures
+        if not old or len(set(old)) != len(old) or len(set(new)) != len(new):
+            return all_rows
+
+        removed = set(old) - set(new)
+        added = set(new) - set(old)
+        # rules kept from the last run must keep their relative order
+        if [s for s in old if s not in removed] != [s for s in new if s not in added]:
+            return all_rows
+
+        if rows is None or len(self.fingerprints) < len(self.data):
+            rows = all_rows
+        changed = [i for i in rows
+                   if i >= len(self.fingerprints) or self.fingerprint(self.data[i]) != self.fingerprints[i]]
+        if not removed and not added:
+            return sorted(changed)
+        changed = set(changed)
+
+        position = {sig: i for i, sig in enumerate(new)}
+        added_positions = sorted(position[sig] for sig in added)
+
+        affected = []
+        for i, row in enumerate(self.data):
+            if i in changed:
+                affected.append(i)
+            elif row['manuallymapped'] == 'YES':
+                continue
+            elif removed.intersection(self.fired[i]):
+                affected.append(i)
+            elif added_positions and self._added_rule_fires(i, rules, position, added_positions):
+                affected.append(i)
+        return affected
+
+    def _added_rule_fires(
+            self,
+            i: int,
+            rules: Rules,
+            position: Dict[str,int],
+            added_positions: List[int]
+            ) -> bool:
+        """
+        Replays the row on a copy, in ruleset order, applying the rules that
+        fired last time; reports whether any added rule fires along the way.
+        Until an added rule fires the row goes through the same states as in
+        the last run, so this is exact even for rules reading earlier outputs.
+        """
+        sim = self.restore(i, dict(self.data[i]))
+        fired_positions = [position[sig] for sig in self.fired[i]]
+        k = 0
+        for pos in added_positions:
+            while k < len(fired_positions) and fired_positions[k] < pos:
+                rules.ruleSet[fired_positions[k]].Apply(sim)
+                k += 1
+            if rules.ruleSet[pos].Apply(sim):
+                return True
+        return False
+
+    def commit(self, rules: Rules, rows: Optional[List[int]] = None) -> None:
+        """
+        Stores the ruleset and input fingerprints the rows were run with.
+        rows - the rows whose inputs may have changed since the last run,
+               default None (all rows); rules only write output fields
+        """
+        self.signatures = list(rules.signatures)
+        input_fields = sorted(
+                (rules.GetReadFields() - rules.GetOutputFields()) | {'manuallymapped'})
+        if rows is None or input_fields != self.input_fields or len(self.fingerprints) != len(self.data):
+            self.input_fields = input_fields
+            self.fingerprints = [self.fingerprint(row) for row in self.data]
+        else:
+            for i in rows:
+                self.fingerprints[i] = self.fingerprint(self.data[i])
 
 if __name__ == '__main__':
     k = Loadsheet.from_bms(r'C:\Users\ShaneSpencer\Downloads\OnboardingTool-master\OnboardingTool-master\resources\bms_exports\alc\US-MTV-1395.csv')
\ No newline at end of file
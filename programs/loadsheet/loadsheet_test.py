@@ -13,6 +13,12 @@
 #limitations under the License.
 
 import unittest
+import json
+import os
+import tempfile
+import io
+import contextlib
+from unittest import mock
 import loadsheet as ls
 import pandas
 
@@ -98,6 +104,362 @@ class TestLoadsheetMethods(unittest.TestCase):
 
 		self.assertEqual(["fAP sFN"], ls.Loadsheet._get_duplicate_asset_fields(self.df))
 
+class TestIncrementalRules(unittest.TestCase):
+	def setUp(self):
+		self.rows = [
+			{'controlProgram':'AHU-1', 'objectName':'sat_1', 'manuallyMapped':''},
+			{'controlProgram':'AHU-1', 'objectName':'rat_1', 'manuallyMapped':''},
+			{'controlProgram':'VAV-2', 'objectName':'zn_t_1', 'manuallyMapped':''},
+			{'controlProgram':'VAV-3', 'objectName':'sat_1', 'manuallyMapped':'YES'}
+			]
+		self.rules = {'rules':[
+			{'ruleName':'ahu', 'ruleField':'controlProgram', 'rulePattern':'(AHU-\\d)',
+			 'outputs':{'generalType':'AHU', 'assetName':1}},
+			{'ruleName':'vav', 'ruleField':'controlProgram', 'rulePattern':'(VAV-\\d)',
+			 'outputs':{'generalType':'VAV', 'assetName':1}},
+			{'ruleName':'sat', 'ruleField':'objectName', 'rulePattern':'^sat_',
+			 'outputs':{'required':'YES', 'standardFieldName':'supply_air_temperature_sensor'},
+			 'filters':{'generalType':['include','AHU']}}
+			]}
+		self.tmpdir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def _rule_file(self, rules):
+		path = os.path.join(self.tmpdir.name, f'rules_{len(os.listdir(self.tmpdir.name))}.json')
+		with open(path, 'w') as f:
+			json.dump(rules, f)
+		return path
+
+	def _fresh(self):
+		return ls.Loadsheet([dict(row) for row in self.rows], {})
+
+	def test_rerun_matches_full_pass(self):
+		#edits the ruleset between runs and compares with a fresh full pass
+		sheet = self._fresh()
+		self.assertEqual(4, sheet.apply_rules(self._rule_file(self.rules)))
+		self.assertEqual(0, sheet.apply_rules(self._rule_file(self.rules)))
+
+		self.rules['rules'][2]['rulePattern'] = '^rat_'
+		edited = self._rule_file(self.rules)
+		self.assertEqual(2, sheet.apply_rules(edited))
+
+		reference = self._fresh()
+		reference.apply_rules(edited)
+		self.assertEqual(reference._data, sheet._data)
+		self.assertEqual('', sheet._data[0]['standardfieldname'])
+		self.assertEqual('supply_air_temperature_sensor', sheet._data[1]['standardfieldname'])
+		self.assertEqual('', sheet._data[3]['assetname'])
+
+	def test_rerun_changed_rows(self):
+		#edits a row between runs
+		sheet = self._fresh()
+		rule_file = self._rule_file(self.rules)
+		sheet.apply_rules(rule_file)
+		sheet._data[2]['controlprogram'] = 'AHU-2'
+		self.assertEqual(1, sheet.apply_rules(rule_file))
+		self.assertEqual('AHU-2', sheet._data[2]['assetname'])
+
+	def test_rerun_reads_edited_rows(self):
+		#a re-run reads only the rows edited since the last run from the table
+		sheet = self._fresh()
+		rule_file = self._rule_file(self.rules)
+		sheet.apply_rules(rule_file)
+		sheet.update_row(2, {'controlprogram':'AHU-2'})
+		to_dict = pandas.DataFrame.to_dict
+		converted = []
+		def count_rows(df, *args, **kwargs):
+			converted.append(len(df))
+			return to_dict(df, *args, **kwargs)
+		with mock.patch.object(pandas.DataFrame, 'to_dict', count_rows):
+			self.assertEqual(1, sheet.apply_rules(rule_file))
+			self.assertEqual(0, sheet.apply_rules(rule_file))
+		self.assertEqual([1, 0], converted)
+		self.assertEqual('AHU-2', sheet._df['assetname'][2])
+
+	def test_rerun_keeps_edited_outputs(self):
+		#an output edited by hand between runs is not reverted when a rule change re-runs its row
+		sheet = self._fresh()
+		sheet.apply_rules(self._rule_file(self.rules))
+		sheet._data[2]['standardfieldname'] = 'zone_air_temperature_sensor'
+		self.rules['rules'][1]['outputs']['typeName'] = 'VAV_1'
+		edited = self._rule_file(self.rules)
+		self.assertEqual(1, sheet.apply_rules(edited))
+		self.assertEqual('zone_air_temperature_sensor', sheet._data[2]['standardfieldname'])
+		self.assertEqual('VAV_1', sheet._data[2]['typename'])
+
+		self.rules['rules'][1]['outputs'].pop('typeName')
+		self.assertEqual(1, sheet.apply_rules(self._rule_file(self.rules)))
+		self.assertEqual('zone_air_temperature_sensor', sheet._data[2]['standardfieldname'])
+		self.assertEqual('', sheet._data[2]['typename'])
+
+
+class TestColumnarStorage(unittest.TestCase):
+	def test_row_view(self):
+		#rows live in one table; row dict edits reach the table, replacing rows resets rule state
+		sheet = ls.Loadsheet(pandas.DataFrame({'assetName':['AHU-1','VAV-2'], 'Units':['degF','']}), {})
+		self.assertEqual(['assetname', 'units'], sheet._df.columns.tolist())
+		self.assertEqual(2, len(sheet))
+
+		sheet._data[1]['units'] = 'percent'
+		self.assertEqual(['degF','percent'], sheet._df['units'].tolist())
+
+		version = sheet._version
+		sheet._data = [{'assetName':'FCU-1', 'units':''}]
+		self.assertEqual(['FCU-1'], [row['assetname'] for row in sheet._data])
+		self.assertNotEqual(version, sheet._version)
+
+	def test_row_view_stays_valid(self):
+		#row dicts handed out stay rows of the loadsheet while the table is read and written
+		sheet = ls.Loadsheet(pandas.DataFrame({'assetName':['AHU-1','VAV-2'], 'units':['degF','']}), {})
+		rows = sheet._data
+		self.assertEqual(2, len(sheet))
+		sheet.with_original_headers()
+		rows[0]['units'] = 'EDITED'
+		self.assertEqual(['EDITED', ''], sheet._df['units'].tolist())
+		self.assertIs(rows, sheet._data)
+
+		rows[1].update({'units':'percent', 'generaltype':'VAV'})
+		sheet.update_row(0, {'assetname':'AHU-2'})
+		self.assertEqual(['AHU-2', 'EDITED'], [rows[0]['assetname'], rows[0]['units']])
+		self.assertTrue(pandas.isna(rows[0]['generaltype']))
+		self.assertEqual({'assetname':'VAV-2', 'units':'percent', 'generaltype':'VAV'}, rows[1])
+		self.assertEqual(['AHU-2', 'VAV-2'], sheet._df['assetname'].tolist())
+		self.assertEqual(['VAV'], sheet._df['generaltype'].dropna().tolist())
+		self.assertRaises(TypeError, rows[0].pop, 'units')
+
+	def test_categorical_columns(self):
+		#low-cardinality columns are dictionary encoded, also after row edits and rules
+		sheet = ls.Loadsheet(pandas.DataFrame({'controlProgram':['AHU-1']*3, 'objectName':['sat','rat','x'],
+			'required':['NO']*3, 'generalType':['']*3}), {})
+		self.assertEqual('category', str(sheet._df['required'].dtype))
+		self.assertEqual('object', str(sheet._df['controlprogram'].dtype))
+
+		sheet._data[2]['required'] = 'YES'
+		self.assertEqual(['NO','NO','YES'], sheet._df['required'].tolist())
+		self.assertEqual('category', str(sheet._df['required'].dtype))
+
+		with tempfile.TemporaryDirectory() as tmpdir:
+			path = os.path.join(tmpdir, 'rules.json')
+			with open(path, 'w') as f:
+				json.dump({'rules':[{'ruleName':'ahu', 'ruleField':'controlProgram', 'rulePattern':'AHU',
+					'outputs':{'generalType':'AHU', 'units':'no-units'}}]}, f)
+			sheet.apply_rules(path)
+		self.assertEqual(['AHU']*3, sheet._df['generaltype'].tolist())
+		self.assertEqual('category', str(sheet._df['units'].dtype))
+		encoded, as_text = sheet.memory_usage()
+		self.assertEqual(as_text, int(sheet._decoded_df().memory_usage(deep=True).sum()))
+
+	def test_original_headers(self):
+		#the table is shown under its imported headers, edits included
+		sheet = ls.Loadsheet(pandas.DataFrame({'assetName':['AHU-1'], 'Units':['degF']}),
+			{'assetname':'assetName', 'units':'Units'})
+		sheet._data[0]['units'] = 'percent'
+		view = sheet.with_original_headers()
+		self.assertEqual(['assetName', 'Units'], view.columns.tolist())
+		self.assertEqual(['percent'], view['Units'].tolist())
+
+
+class TestRowIndexes(unittest.TestCase):
+	def setUp(self):
+		self.sheet = ls.Loadsheet(pandas.DataFrame({
+			'assetName':['AHU-1','AHU-1','VAV-1',None], 'deviceId':['DEV:1','DEV:1','DEV:2','DEV:2'],
+			'objectType':['AV','BV','AV','AV'], 'objectId':[1,1,1,2], 'generalType':['AHU','AHU','VAV',None]}), {})
+
+	def test_lookup(self):
+		#exact index lookups, narrowed lookups and streamed subsets agree with a scan
+		self.assertEqual([0, 1], self.sheet.get_row_ids(assetname='AHU-1'))
+		self.assertEqual([2], self.sheet.get_row_ids(deviceid='DEV:2', objecttype='AV', objectid=1))
+		self.assertEqual([3], self.sheet.get_row_ids(deviceid='DEV:2', objectid=2))
+		self.assertEqual([], self.sheet.get_row_ids(generaltype='FCU'))
+		self.assertEqual('BV', self.sheet.get_data_row(1)['objecttype'])
+		self.assertEqual([{'objectid':1}, {'objectid':1}],
+			list(self.sheet.get_data_row_generator(columns=['objectid'], generaltype='AHU')))
+		self.assertEqual(4, len(list(self.sheet.get_data_row_generator())))
+
+	def test_update_row(self):
+		#edits move the row between index buckets without a rebuild
+		self.assertEqual([2], self.sheet.get_row_ids(assetname='VAV-1'))
+		index = self.sheet._indexes[('assetname',)]
+		self.sheet.update_row(3, {'assetname':'VAV-1', 'generaltype':'VAV'})
+		self.assertIs(index, self.sheet._indexes[('assetname',)])
+		self.assertEqual([2, 3], self.sheet.get_row_ids(assetname='VAV-1'))
+		self.assertEqual([2, 3], self.sheet.get_row_ids(generaltype='VAV'))
+		self.sheet.update_row(0, {'assetname':'AHU-2'})
+		self.assertEqual([1], self.sheet.get_row_ids(assetname='AHU-1'))
+		self.assertEqual('category', str(self.sheet._df['generaltype'].dtype))
+
+
+class TestDiff(unittest.TestCase):
+	def test_diff(self):
+		#rows are matched by point key; ids read as text or numbers are the same point
+		rows = pandas.DataFrame({'deviceId':['DEV:1','DEV:1','DEV:2','DEV:2'], 'objectType':['AV','BV','AV','AV'],
+			'objectId':[1,1,1,2], 'path':['#a','#b','#c','#d'], 'assetName':['AHU-1','AHU-1','VAV-1','VAV-1'],
+			'required':['YES','YES','YES','NO']})
+		previous = ls.Loadsheet(rows, {})
+		edited = rows.drop(index=0).astype({'objectId':str})
+		edited.loc[2, 'assetName'] = 'VAV-2'
+		edited.loc[4] = ['DEV:3', 'AV', '7', '#e', 'FCU-1', 'YES']
+		sheet = ls.Loadsheet(edited.reset_index(drop=True), {})
+
+		changes = sheet.diff(previous)
+		self.assertEqual([3], changes.added)
+		self.assertEqual([0], changes.removed)
+		self.assertEqual({1: 2}, changes.modified)
+		self.assertEqual({'assetname': 1}, changes.changed_columns)
+		self.assertEqual({'AHU-1', 'VAV-1', 'VAV-2', 'FCU-1'}, changes.affected_assets)
+		self.assertTrue(changes.touches({'deviceid':'DEV:1', 'objecttype':'AV', 'objectid':1.0, 'path':'#a'}))
+		self.assertFalse(changes.touches(sheet.get_data_row(2)))
+		self.assertEqual(0, len(sheet.diff(sheet)))
+
+
+class TestExport(unittest.TestCase):
+	def test_export_with_pivot(self):
+		#data and asset pivot are written as two sheets of one workbook
+		rows = [
+			{'location':'L', 'controlProgram':'AHU-1', 'required':'YES', 'generalType':'AHU',
+			 'assetName':'AHU-1', 'standardFieldName':'supply_air_temperature_sensor'},
+			{'location':'L', 'controlProgram':'AHU-1', 'required':'YES', 'generalType':'AHU',
+			 'assetName':'AHU-1', 'standardFieldName':'supply_air_temperature_sensor'},
+			{'location':'L', 'controlProgram':'VAV-1', 'required':'YES', 'generalType':'VAV',
+			 'assetName':'VAV-1', 'standardFieldName':'zone_air_temperature_sensor'},
+			{'location':'L', 'controlProgram':'VAV-1', 'required':'NO', 'generalType':None,
+			 'assetName':None, 'standardFieldName':None}
+			]
+		sheet = ls.Loadsheet(rows, {k.lower(): k for k in rows[0]})
+		with tempfile.TemporaryDirectory() as tmpdir:
+			path = os.path.join(tmpdir, 'out.xlsx')
+			sheet.export_to_loadsheet(path)
+			sheets = pandas.read_excel(path, sheet_name=None)
+
+		self.assertEqual(['Sheet1', 'Pivot'], list(sheets))
+		self.assertEqual(['location', 'controlProgram', 'required', 'generalType', 'assetName',
+						  'standardFieldName'], sheets['Sheet1'].columns.tolist())
+		self.assertTrue(pandas.isna(sheets['Sheet1'].loc[3, 'assetName']))
+		pivot = sheets['Pivot'].set_index(['generalType', 'assetName'])
+		self.assertEqual(2, pivot.loc[('AHU', 'AHU-1'), 'supply_air_temperature_sensor'])
+		self.assertTrue(pandas.isna(pivot.loc[('AHU', 'AHU-1'), 'zone_air_temperature_sensor']))
+
+
+class TestBmsImport(unittest.TestCase):
+	def test_object_id_split(self):
+		#object ids are split into a categorical type and an int32 instance; bad ids are kept and reported
+		header = 'Location,Control Program,Name,Type,Object ID,Device ID,Object Name,Path\n'
+		rows = ('L,AHU-1,SAT,BAV,AV:3,DEV:1,sat_1,#p/sat\n'
+				'L,AHU-1,Loop,LOOP,LOOP:12,DEV:1,loop_1,#p/loop\n'
+				'L,AHU-1,Dev,DEV,,DEV:1,,#p\n')
+		with tempfile.TemporaryDirectory() as tmpdir:
+			path = os.path.join(tmpdir, 'export.csv')
+			with open(path, 'w') as f:
+				f.write(header + rows)
+			with contextlib.redirect_stdout(io.StringIO()) as out, \
+					mock.patch.object(ls.Loadsheet, '_parse_building_name', return_value='US-MTV-1'):
+				sheet = ls.Loadsheet.from_bms(path)
+				with open(path, 'a') as f:
+					f.write('L,AHU-1,Bad,BAV,AV:x,DEV:1,bad_1,#p/bad\n')
+				kept = ls.Loadsheet.from_bms(path)
+		self.assertEqual([3, 12], sheet._df['objectid'].tolist())
+		self.assertEqual('int32', str(sheet._df['objectid'].dtype))
+		self.assertEqual(['AV', 'LOOP'], sheet._df['objecttype'].tolist())
+		self.assertEqual('category', str(sheet._df['objecttype'].dtype))
+
+		self.assertIn("1 BMS rows kept without object type and instance", out.getvalue())
+		self.assertIn("'AV:x'", out.getvalue())
+		self.assertEqual(['sat_1', 'loop_1', 'bad_1'], kept._df['objectname'].tolist())
+		self.assertEqual([3, 12], kept._df['objectid'][:2].tolist())
+		self.assertEqual([int, int], [type(v) for v in kept._df['objectid'][:2]])
+		self.assertTrue(pandas.isna(kept._df['objectid'][2]))
+		self.assertTrue(pandas.isna(kept._df['objecttype'][2]))
+		self.assertEqual('category', str(kept._df['objecttype'].dtype))
+
+	def test_multiple_files(self):
+		#files are read in worker processes and combined, each row tagged with its file
+		header = 'Location,Control Program,Name,Type,Object ID,Device ID,Object Name,Path\n'
+		with tempfile.TemporaryDirectory() as tmpdir:
+			for name, rows in [('US-MTV-A1.csv', 'L,AHU-1,SAT,BAV,AV:3,DEV:1,sat_1,#p/sat\n'),
+							   ('US-MTV-B2.csv', 'L,VAV-1,ZAT,BAV,AI:1,DEV:2,zat_1,#p/zat\nL,VAV-1,Fan,BBV,BV:2,DEV:2,fan,#p/fan\n')]:
+				with open(os.path.join(tmpdir, name), 'w') as f:
+					f.write(header + rows)
+			paths = ls.Loadsheet.find_bms_files(tmpdir)
+			serial = ls.Loadsheet.from_bms_files(paths, max_workers=1)
+			pooled = ls.Loadsheet.from_bms_files(paths, max_workers=2)
+
+		pandas.testing.assert_frame_equal(serial._df, pooled._df)
+		self.assertEqual(['US-MTV-A1.csv', 'US-MTV-B2.csv', 'US-MTV-B2.csv'], serial._df['sourcefile'].tolist())
+		self.assertEqual(['US-MTV-A1', 'US-MTV-B2', 'US-MTV-B2'], serial._df['building'].tolist())
+		self.assertEqual(['AV', 'AI', 'BV'], serial._df['objecttype'].tolist())
+		self.assertEqual('sourceFile', serial._std_header_map['sourcefile'])
+
+	def test_stream_rules(self):
+		#a BMS export streamed through a ruleset in chunks equals an import plus apply_rules
+		rules = {'rules':[
+			{'ruleName':'ahu', 'ruleField':'controlProgram', 'rulePattern':'(AHU-\\d)',
+			 'outputs':{'generalType':'AHU', 'assetName':1}},
+			{'ruleName':'vav', 'ruleField':'controlProgram', 'rulePattern':'(VAV-\\d)',
+			 'outputs':{'generalType':'VAV', 'assetName':1}},
+			{'ruleName':'sat', 'ruleField':'objectName', 'rulePattern':'^sat_',
+			 'outputs':{'required':'YES', 'standardFieldName':'supply_air_temperature_sensor'},
+			 'filters':{'generalType':['include','AHU']}}
+			]}
+		def as_text(df):
+			df = df[sorted(df.columns)].astype(object)
+			return df.where(df.notna(), '').astype(str)
+
+		with tempfile.TemporaryDirectory() as tmpdir, \
+				mock.patch.object(ls.Loadsheet, '_parse_building_name', return_value='US-MTV-1'):
+			path = os.path.join(tmpdir, 'export.csv')
+			with open(path, 'w') as f:
+				f.write('Location,Control Program,Name,Type,Object ID,Device ID,Object Name,Path\n'
+						'L,AHU-1,SAT,BAV,AV:3,DEV:1,sat_1,#p/sat\n'
+						'L,AHU-1,RAT,BAV,AV:4,DEV:1,rat_1,#p/rat\n'
+						'L,AHU-1,Dev,DEV,,DEV:1,,#p\n'
+						'L,VAV-2,ZAT,BAV,AI:1,DEV:2,zn_t_1,#p/zat\n'
+						'L,VAV-2,Fan,BBV,BV:2,DEV:2,sat_2,#p/fan\n'
+						'L,AHU-3,SAT,BAV,AV:9,DEV:3,sat_3,#p/sat3\n')
+			rule_file = os.path.join(tmpdir, 'rules.json')
+			with open(rule_file, 'w') as f:
+				json.dump(rules, f)
+
+			sheet = ls.Loadsheet.from_bms(path)
+			sheet.apply_rules(rule_file)
+			expected = as_text(sheet.with_original_headers())
+			for ext in ('.csv', '.parquet'):
+				output = os.path.join(tmpdir, 'normalized' + ext)
+				self.assertEqual(5, ls.Loadsheet.normalize_bms_stream(path, rule_file, output, chunksize=2))
+				if ext == '.csv':
+					streamed = pandas.read_csv(output, dtype=str, keep_default_na=False)
+				else:
+					streamed = pandas.read_parquet(output)
+				pandas.testing.assert_frame_equal(expected, as_text(streamed))
+
+
+class TestBinaryExport(unittest.TestCase):
+	def test_round_trip(self):
+		#dtypes, ML confidence columns and the header map survive a save and load
+		rows = [
+			{'location':'L', 'controlProgram':'AHU-1', 'objectId':3, 'required':'YES',
+			 'standardFieldName':'supply_air_temperature_sensor', 'standardFieldName_conf':0.97},
+			{'location':'L', 'controlProgram':'AHU-1', 'objectId':4, 'required':None,
+			 'standardFieldName':None, 'standardFieldName_conf':float('nan')}
+			]
+		header_map = ls.Loadsheet._to_std_header_mapping(list(rows[0]))
+		#built from rows under their original headers, and from a table under standardized headers
+		sheets = [ls.Loadsheet(rows, header_map),
+			ls.Loadsheet(pandas.DataFrame(rows).set_axis(list(header_map), axis=1), header_map)]
+		for sheet, conf in zip(sheets, ['standardfieldname_conf', 'standardfieldnameconf']):
+			for ext in ('.parquet', '.feather'):
+				with tempfile.TemporaryDirectory() as tmpdir:
+					path = os.path.join(tmpdir, 'session' + ext)
+					sheet.export_to_binary(path)
+					self.assertEqual(list(rows[0]), pandas.read_parquet(path).columns.tolist()
+						if ext == '.parquet' else pandas.read_feather(path).columns.tolist())
+					loaded = ls.Loadsheet.from_loadsheet(path)
+				self.assertEqual(header_map, loaded._std_header_map)
+				pandas.testing.assert_frame_equal(sheet._df, loaded._df)
+				self.assertEqual('float64', str(loaded._df[conf].dtype))
+				self.assertEqual('int64', str(loaded._df['objectid'].dtype))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,30 +1,215 @@
 import re
+import io
+import sys
+import json
+import time
+import weakref
+import threading
+import contextvars
+import concurrent.futures
 from typing import List, Optional
 
+import numpy as np
+import pandas as pd
+
+# standardFieldName keywords of command/status points, which must be binary objects
+_COMMAND_STATUS_KEYWORDS = re.compile('|'.join([
+    'run_command', 'run_status',
+    'damper_command', 'damper_status',
+    'valve_command', 'valve_status'
+]))
+_BINARY_OBJECT_TYPES = ['BV', 'BI', 'BO', 'MSV']
+
+# standardFieldName parts of measurement points, which must be analog objects
+_MEASUREMENT_KEYWORDS = re.compile('|'.join(['_sensor', '_setpoint', '_count', '_percentage']))
+_ANALOG_OBJECT_TYPES = ['AV', 'AI', 'AO']
+
+# standardFieldName parts of points that take no units
+_NO_UNIT_KEYWORDS = re.compile('|'.join(['alarm', 'count', 'mode']))
+
+
+# Shared column buffers and output of the check run_checks is running, if any
+_BUFFERS = contextvars.ContextVar('buffers', default=None)
+_OUTPUT = contextvars.ContextVar('output', default=None)
+
+
+class _ColumnBuffers:
+    """
+    Normalized text columns (see _text) of the loadsheet checked by a
+    run_checks call, computed on first use and then shared read-only by
+    all its checks, whichever thread they run on. Each column is computed
+    under a lock of its own, so checks only wait for the columns they read.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._columns = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, col, case):
+        key = (col, case)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._columns:
+                self._columns[key] = _normalize(self.df, col, case)
+            return self._columns[key]
+
+
+def _print(*args, **kwargs):
+    """ print to the output of the running check (see run_checks), or stdout. """
+    print(*args, file=_OUTPUT.get() or sys.stdout, **kwargs)
+
+
+def _text(df, col, case=None):
+    """
+    Column values as stripped text, with '' for blanks (NaN, None, 'nan' and
+    missing columns), optionally converted to 'upper' or 'lower' case.
+    Computed once per distinct value, and once per run_checks call for the
+    loadsheet it checks.
+    """
+    buffers = _BUFFERS.get()
+    if buffers is not None and buffers.df is df:
+        return buffers.get(col, case)
+    return _normalize(df, col, case)
+
+
+def _normalize(df, col, case=None):
+    """ See _text. """
+    if col not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    codes, uniques = pd.factorize(df[col])
+    text = pd.Index(np.asarray(uniques, dtype=object).astype(str), dtype=object).str.strip()
+    text = text.where(text.str.lower() != 'nan', '')
+    if case is not None:
+        text = getattr(text.str, case)()
+    # code -1 (NaN) picks the trailing ''
+    return pd.Series(np.append(text.to_numpy(dtype=object), '')[codes], index=df.index)
+
+
+def _flag(df, col, value):
+    """ Rows whose (stripped, case-insensitive) flag column equals value, e.g. required == 'YES'. """
+    return (_text(df, col, 'upper') == value).to_numpy()
+
+
+def _rows(df, mask):
+    """ Index labels of the rows in a boolean mask. """
+    return df.index[mask].to_numpy()
+
+
+# Types are looked up in these namespaces when a typeName has none (e.g. 'HVAC/AHU_DFSS' vs 'AHU_DFSS')
+_TYPE_NAMESPACES = ['HVAC', 'GLOBAL']
+
+# Per ontology lookups built by the checks, dropped with the ontology
+_ONTOLOGY_CACHES = weakref.WeakKeyDictionary()
+_ONTOLOGY_LOCK = threading.Lock()
+
+
+def _ontology_cache(ontology, name):
+    """ A dict the checks can fill with lookups on ontology, kept for as long as the ontology. """
+    with _ONTOLOGY_LOCK:
+        return _ONTOLOGY_CACHES.setdefault(ontology, {}).setdefault(name, {})
+
+
+def _type_fieldsets(ontology, type_name):
+    """
+    The (required, all) field names of a type as frozensets, or None when
+    the ontology does not define the type. Resolved once per ontology.
+    """
+    cache = _ontology_cache(ontology, 'type_fieldsets')
+    if type_name not in cache:
+        namespace, separator, name = type_name.rpartition('/')
+        namespaces = [namespace or 'GLOBAL'] if separator else _TYPE_NAMESPACES
+        fieldsets = None
+        for namespace in namespaces:
+            if name in ontology.types.types.get(namespace, {}):
+                type_fields = ontology.get_type_fields(namespace, name)
+                fieldsets = (frozenset(field for field, required in type_fields if required),
+                             frozenset(field for field, required in type_fields))
+                break
+        cache[type_name] = fieldsets
+    return cache[type_name]
+
+
+def _allowed_units(ontology, field_names):
+    """
+    The units (lower case, with underscores) allowed for each of the
+    standardFieldNames: those of the measurement types among the words of
+    the field, or only 'no_units' when it has none. Kept per ontology.
+    """
+    cache = _ontology_cache(ontology, 'field_units')
+    for field_name in field_names:
+        if field_name not in cache:
+            units = set()
+            for word in field_name.split('_'):
+                units.update(unit.lower() for unit in _measurement_units(ontology, word))
+            cache[field_name] = frozenset(units or ['no_units'])
+    return {field_name: cache[field_name] for field_name in field_names}
+
+
+def _defined_fields(ontology, field_names):
+    """
+    The standardFieldNames that the ontology defines, once their increment
+    is removed (e.g. 'zone_air_temperature_sensor_1'). Kept per ontology.
+    """
+    cache = _ontology_cache(ontology, 'defined_fields')
+    for field_name in field_names:
+        if field_name not in cache:
+            match = FQ_FIELD_NAME.match(field_name)
+            try:
+                cache[field_name] = match is not None and ontology.fields.get_field(match.group(1)) is not None
+            except KeyError:
+                cache[field_name] = False
+    return [field_name for field_name in field_names if cache[field_name]]
+
+
+def _measurement_units(ontology, measurement):
+    """ The units of a measurement type of the ontology, kept per ontology. """
+    cache = _ontology_cache(ontology, 'measurement_units')
+    if measurement not in cache:
+        cache[measurement] = tuple(ontology.get_units_for_measurement(measurement))
+    return cache[measurement]
+
+
+def _compare_to_type(ontology, type_name, fields):
+    """ Why a fieldset does not exactly match a type of the ontology, or None when it does. """
+    fieldsets = _type_fieldsets(ontology, type_name)
+    if fieldsets is None:
+        return "typeName not defined in the ontology"
+    required, defined = fieldsets
+    problems = []
+    if required - fields:
+        problems.append(f"missing required fields {sorted(required - fields)}")
+    if fields - defined:
+        problems.append(f"fields not in type {sorted(fields - defined)}")
+    return ', '.join(problems) or None
+
+
 class LoadsheetValidationChecks:
+    """
+    Checks of a loadsheet as read from its file (original headers). Each
+    check works on whole columns, prints the failing rows and returns
+    their index labels as an array: empty when the check passes. See
+    CHECKS and run_checks to run them together.
+    """
+
     def __init__(self):
         pass
 
     def validate_required_columns(df):
         """
         Ensures that all the required columns are present in the loadsheet.
+        A missing column fails every row.
         """
 
-        required_columns = [
-            "location", "controlProgram", "name", "type", "path", "deviceId", 
-            "objectType", "objectId", "objectName", "units", "required", 
-            "isMissing", "manuallyMapped", "building", "generalType", 
-            "typeName", "assetName", "standardFieldName"
-        ]
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
 
         if missing_columns:
-            print("❌ The following required columns are missing from the loadsheet:")
+            _print("❌ The following required columns are missing from the loadsheet:")
             for col in missing_columns:
-                print(f" - {col}")
-            return False
-        else:
-            return True
+                _print(f" - {col}")
+        return _rows(df, np.full(len(df), bool(missing_columns)))
 
     def validate_no_leading_trailing_spaces(df):
         """
@@ -36,6 +221,7 @@ class LoadsheetValidationChecks:
             "isMissing", "manuallyMapped", "building", "generalType",
             "typeName", "assetName", "standardFieldName"
         ]
+        failed = np.zeros(len(df), dtype=bool)
         failed_rows = []
 
         for col in columns_to_check:
@@ -43,20 +229,21 @@ class LoadsheetValidationChecks:
                 # Skip missing columns — or optionally report them elsewhere
                 continue
 
-            # Only check rows where the value is a string
-            for idx, val in df[col].items():
-                if isinstance(val, str):
-                    if val != val.strip():
-                        excel_row = idx + 2  # Excel row numbering
-                        failed_rows.append((excel_row, col, val))
+            # Only check string values, once per distinct value
+            codes, uniques = pd.factorize(df[col])
+            padded = [i for i, val in enumerate(uniques) if isinstance(val, str) and val != val.strip()]
+            if not padded:
+                continue
+            mask = np.isin(codes, padded)
+            failed |= mask
+            for idx, val in df.loc[mask, col].items():
+                failed_rows.append((idx + 2, col, val))  # Excel row numbering
 
         if failed_rows:
-            print("❌ Leading or trailing spaces found in columns:")
+            _print("❌ Leading or trailing spaces found in columns:")
             for row_num, col, val in failed_rows:
-                print(f"Row {row_num}, column '{col}': '{val}'")
-            return False
-        else:
-            return True
+                _print(f"Row {row_num}, column '{col}': '{val}'")
+        return _rows(df, failed)
 
     def validate_required_column(df):
         """
@@ -64,19 +251,16 @@ class LoadsheetValidationChecks:
         """
 
         if 'required' not in df.columns:
-            print("❌ Error: 'required' column not found.")
-            return None
+            _print("❌ Error: 'required' column not found.")
+            return _rows(df, np.ones(len(df), dtype=bool))
 
-        df['required_cleaned'] = df['required'].astype(str).str.strip().str.upper()
-        invalid_required = df[~df['required_cleaned'].isin(['YES', 'NO'])]
+        failed = ~_text(df, 'required', 'upper').isin(['YES', 'NO']).to_numpy()
 
-        if not invalid_required.empty:
-            print("❌ Invalid entries in 'required' column:")
-            for idx, _ in invalid_required.iterrows():
-                print(f"Row {idx + 2}")
-            return None  # Fail
-        
-        return df  # Pass
+        if failed.any():
+            _print("❌ Invalid entries in 'required' column:")
+            for idx in _rows(df, failed):
+                _print(f"Row {idx + 2}")
+        return _rows(df, failed)
 
     def validate_required_fields_populated(df):
         """
@@ -88,32 +272,17 @@ class LoadsheetValidationChecks:
             "assetName", "standardFieldName"
         ]
 
-        failed_rows = []
-
         # Normalize case and strip for filtering columns
-        required_mask = df['required'].astype(str).str.strip().str.upper() == 'YES'
-        not_missing_mask = df['isMissing'].astype(str).str.strip().str.upper() == 'NO'
-
-        filtered_df = df[required_mask & not_missing_mask]
+        rows = df[_flag(df, 'required', 'YES') & _flag(df, 'isMissing', 'NO')]
+        blank = np.column_stack([(_text(rows, col) == '').to_numpy() for col in columns_to_check])
+        failed = blank.any(axis=1)
 
-        for idx, row in filtered_df.iterrows():
-            missing_cols = []
-            for col in columns_to_check:
-                val = str(row.get(col, '')).strip()
-                if val == '' or val.lower() == 'nan':
-                    missing_cols.append(col)
-
-            if missing_cols:
-                excel_row = idx + 2  # Excel row numbering
-                failed_rows.append((excel_row, missing_cols))
-
-        if failed_rows:
-            print("❌ Rows with required='YES' and isMissing='NO' must have these fields populated:")
-            for row_num, cols in failed_rows:
-                print(f"Row {row_num}: Missing or blank columns: {cols}")
-            return False
-        else:
-            return True
+        if failed.any():
+            _print("❌ Rows with required='YES' and isMissing='NO' must have these fields populated:")
+            for idx, cols in zip(_rows(rows, failed), blank[failed]):
+                missing_cols = [col for col, is_blank in zip(columns_to_check, cols) if is_blank]
+                _print(f"Row {idx + 2}: Missing or blank columns: {missing_cols}")
+        return _rows(rows, failed)
 
     def validate_missing_required_rows(df):
         """
@@ -130,138 +299,74 @@ class LoadsheetValidationChecks:
             "assetName", "standardFieldName"
         ]
 
-        failed_rows = []
-
         # Filter relevant rows
-        required_yes = df['required'].astype(str).str.strip().str.upper() == 'YES'
-        is_missing_yes = df['isMissing'].astype(str).str.strip().str.upper() == 'YES'
-        filtered_df = df[required_yes & is_missing_yes]
-
-        for idx, row in filtered_df.iterrows():
-            excel_row = idx + 2
-            issues = []
-
-            # Check must-be-blank fields
-            for col in must_be_blank:
-                val = str(row.get(col, '')).strip()
-                if val and val.lower() != 'nan':
-                    issues.append(f"{col} should be blank (found '{val}')")
-
-            # Check must-not-be-blank fields
-            for col in must_not_be_blank:
-                val = str(row.get(col, '')).strip()
-                if not val or val.lower() == 'nan':
-                    issues.append(f"{col} must not be blank")
-
-            if issues:
-                failed_rows.append((excel_row, issues))
-
-        if failed_rows:
-            print("❌ Validation failed for rows where required='YES' and isMissing='YES':")
-            for row_num, issues in failed_rows:
-                print(f"Row {row_num}:")
-                for issue in issues:
-                    print(f"  - {issue}")
-            return False
-        else:
-            return True
+        rows = df[_flag(df, 'required', 'YES') & _flag(df, 'isMissing', 'YES')]
+        texts = {col: _text(rows, col).to_numpy() for col in must_be_blank + must_not_be_blank}
+        issues = np.column_stack([texts[col] != '' for col in must_be_blank] +
+                                 [texts[col] == '' for col in must_not_be_blank])
+        failed = issues.any(axis=1)
+
+        if failed.any():
+            _print("❌ Validation failed for rows where required='YES' and isMissing='YES':")
+            columns = must_be_blank + must_not_be_blank
+            for i in np.flatnonzero(failed):
+                _print(f"Row {rows.index[i] + 2}:")
+                for col, has_issue in zip(columns, issues[i]):
+                    if not has_issue:
+                        continue
+                    if col in must_be_blank:
+                        _print(f"  - {col} should be blank (found '{texts[col][i]}')")
+                    else:
+                        _print(f"  - {col} must not be blank")
+        return _rows(rows, failed)
 
     def validate_all_standard_field_names(df, ontology):
         """
-        Ensures all standardFieldNames are valid telemetry fields within the DBO. 
+        Ensures all standardFieldNames of required rows are valid telemetry fields
+        within the DBO (without their increment, e.g. '_1'). Blank names fail.
         """
-        required_yes = df[df['required_cleaned'] == 'YES']
-        invalid_rows = []
-
-        for idx, row in required_yes.iterrows():
-            field_name = str(row.get('standardFieldName', '')).strip()
-            excel_row = idx + 2  # Adjust for header + zero indexing
-
-            if field_name == "":
-                invalid_rows.append((excel_row, field_name))
-
-            if not field_name:
-                invalid_rows.append((excel_row, "<BLANK>"))
-                continue
+        rows = df[_flag(df, 'required', 'YES')]
+        field = _text(rows, 'standardFieldName')
+        valid = _defined_fields(ontology, field.unique())
+        failed = ~field.isin(valid).to_numpy()
 
-            global_namespace_string = 'GLOBAL'
-            namespace_list = ['', 'HVAC', 'LIGHTING']
-            valid_namespaces = []
-            for namespace in namespace_list:
-                standard_field = StandardField(namespace, field_name)
-                print(dir(ontology))
-                if ontology.IsFieldValid(standard_field):
-                    if not namespace:
-                        valid_namespaces.append(global_namespace_string)
-                    else:
-                        valid_namespaces.append(namespace)
-
-            if not valid_namespaces:
-                invalid_rows.append((excel_row, field_name))
-
-        if invalid_rows:
-            print("❌ Invalid or missing 'standardFieldName' entries:")
-            for excel_row, field in invalid_rows:
-                print(f"Row {excel_row}: '{field}'")
-            return False
-        else:
-            return True
+        if failed.any():
+            _print("❌ Invalid or missing 'standardFieldName' entries:")
+            for idx, name in zip(_rows(rows, failed), field[failed]):
+                _print(f"Row {idx + 2}: '{name or '<BLANK>'}'")
+        return _rows(rows, failed)
 
     def validate_units(df, ontology):
         """
         Ensures that all units match the expected DBO units based on standardFieldName.
+        Fields without a measurement must have 'no-units'; rows of missing points
+        (isMissing='YES') and fields that take no units (alarms, counts, modes) are not checked.
 
         Example: 
             - standardFieldName = 'discharge_air_temperature_setpoint'
-            - Expected DBO units = kelvin, degrees-celsius, or degrees-fahrenheit
+            - Expected DBO units = kelvins, degrees-celsius, or degrees-fahrenheit
             - Actual units = degrees-fahrenheit
             - Check is successful ✅
         """
-        required_yes = df[df['required_cleaned'] == 'YES']
-        invalid_unit_rows = []
-        no_unit_keywords = ['alarm', 'count', 'mode']
-
-        for idx, row in required_yes.iterrows():
-            field = str(row.get('standardFieldName', '')).strip()
-            excel_row = idx + 2
-            # Normalize units by replacing dashes with underscores
-            unit_in_sheet = str(row.get('units', '')).strip().lower().replace('-', '_')
-
-            if any(keyword in field for keyword in no_unit_keywords):
-                continue
-
-            words = field.split('_')
-            found_units = False
-            valid_units_set = set()
-
-            for word in words:
-                try:
-                    unit_keys = ontology.universe.unit_universe.GetUnitsForMeasurement(word).keys()
-                    if unit_keys:
-                        found_units = True
-                        valid_units_set.update([u.lower() for u in unit_keys])
-                except Exception:
-                    continue
-
-            if not found_units:
-                units = row.get('units', '')
-                if units == 'no-units':
-                    continue  # treat as val
-                invalid_unit_rows.append((excel_row, field, row.get('units', '')))
-                continue
-
-            if unit_in_sheet not in valid_units_set:
-                invalid_unit_rows.append((excel_row, field, row.get('units', '')))
-
-        if invalid_unit_rows:
-            print("\n❌ Rows with units that do not match ontology units:")
-            for excel_row, field, unit_val in invalid_unit_rows:
-                print(f"Row {excel_row}: standardFieldName='{field}', units='{unit_val}'")
-
-        if invalid_unit_rows:
-            return False
-        else:
-            return True
+        rows = df[_flag(df, 'required', 'YES') & ~_flag(df, 'isMissing', 'YES')]
+        field = _text(rows, 'standardFieldName')
+        checked = ((field != '') & ~field.str.contains(_NO_UNIT_KEYWORDS)).to_numpy()
+        rows, field = rows[checked], field[checked]
+
+        # Normalize units by replacing dashes with underscores, once per distinct value
+        codes, units = pd.factorize(_text(rows, 'units', 'lower'))
+        units = np.append(pd.Index(units, dtype=object).str.replace('-', '_').to_numpy(dtype=object), '')[codes]
+
+        # Join the (standardFieldName, unit) pairs against those the ontology allows
+        allowed = _allowed_units(ontology, field.unique())
+        allowed = pd.MultiIndex.from_tuples([(name, unit) for name in allowed for unit in allowed[name]])
+        failed = ~pd.MultiIndex.from_arrays([field.to_numpy(), units]).isin(allowed)
+
+        if failed.any():
+            _print("\n❌ Rows with units that do not match ontology units:")
+            for idx, name, unit_val in zip(_rows(rows, failed), field[failed], rows['units'][failed]):
+                _print(f"Row {idx + 2}: standardFieldName='{name}', units='{unit_val}'")
+        return _rows(rows, failed)
 
     def validate_object_type_for_command_status(df):
         """
@@ -269,35 +374,17 @@ class LoadsheetValidationChecks:
         'valve_command', or 'valve_status' have an objectType of 'BV', 'BI', 'BO', or 'MSV'. Only enforced when required='YES' and isMissing='NO'.
         """
 
-        target_keywords = {
-            'run_command', 'run_status',
-            'damper_command', 'damper_status',
-            'valve_command', 'valve_status'
-        }
-        valid_object_types = {'BV', 'BI', 'BO', 'MSV'}
-        failed_rows = []
-
         # Filter to required == YES and isMissing == NO
-        required_yes = df['required'].astype(str).str.strip().str.upper() == 'YES'
-        is_missing_no = df['isMissing'].astype(str).str.strip().str.upper() == 'NO'
-        filtered_df = df[required_yes & is_missing_no]
-
-        for idx, row in filtered_df.iterrows():
-            standard_field = str(row.get('standardFieldName', '')).strip().lower()
-            object_type = str(row.get('objectType', '')).strip().upper()
-            excel_row = idx + 2
+        rows = df[_flag(df, 'required', 'YES') & _flag(df, 'isMissing', 'NO')]
+        standard_field = _text(rows, 'standardFieldName', 'lower')
+        object_type = _text(rows, 'objectType', 'upper')
+        failed = (standard_field.str.contains(_COMMAND_STATUS_KEYWORDS) & ~object_type.isin(_BINARY_OBJECT_TYPES)).to_numpy()
 
-            if any(keyword in standard_field for keyword in target_keywords):
-                if object_type not in valid_object_types:
-                    failed_rows.append((excel_row, standard_field, object_type or "<BLANK>"))
-
-        if failed_rows:
-            print("❌ Invalid objectType for control/status-related standardFieldNames (required='YES' and isMissing='NO'):")
-            for row_num, field, obj_type in failed_rows:
-                print(f"Row {row_num}: standardFieldName='{field}', objectType='{obj_type}' (must be one of {sorted(valid_object_types)})")
-            return False
-        else:
-            return True
+        if failed.any():
+            _print("❌ Invalid objectType for control/status-related standardFieldNames (required='YES' and isMissing='NO'):")
+            for idx, field, obj_type in zip(_rows(rows, failed), standard_field[failed], object_type[failed]):
+                _print(f"Row {idx + 2}: standardFieldName='{field}', objectType='{obj_type or '<BLANK>'}' (must be one of {sorted(_BINARY_OBJECT_TYPES)})")
+        return _rows(rows, failed)
 
     def validate_object_type_for_measurement_points(df):
         """
@@ -305,146 +392,100 @@ class LoadsheetValidationChecks:
         have an objectType of 'AV', 'AI', or 'AO'. Only enforced when required='YES' and isMissing='NO'.
         """
 
-        target_suffixes = ['_sensor', '_setpoint', '_count', '_percentage']
-        valid_object_types = {'AV', 'AI', 'AO'}
-        failed_rows = []
-
         # Filter to required == YES and isMissing == NO
-        required_yes = df['required'].astype(str).str.strip().str.upper() == 'YES'
-        is_missing_no = df['isMissing'].astype(str).str.strip().str.upper() == 'NO'
-        filtered_df = df[required_yes & is_missing_no]
-
-        for idx, row in filtered_df.iterrows():
-            standard_field = str(row.get('standardFieldName', '')).strip().lower()
-            object_type = str(row.get('objectType', '')).strip().upper()
-            excel_row = idx + 2
-
-            if any(suffix in standard_field for suffix in target_suffixes):
-                if object_type not in valid_object_types:
-                    failed_rows.append((excel_row, standard_field, object_type or "<BLANK>"))
+        rows = df[_flag(df, 'required', 'YES') & _flag(df, 'isMissing', 'NO')]
+        standard_field = _text(rows, 'standardFieldName', 'lower')
+        object_type = _text(rows, 'objectType', 'upper')
+        failed = (standard_field.str.contains(_MEASUREMENT_KEYWORDS) & ~object_type.isin(_ANALOG_OBJECT_TYPES)).to_numpy()
 
-        if failed_rows:
-            print("❌ Invalid objectType for sensor/setpoint/count/percentage standardFieldNames (required='YES' and isMissing='NO'):")
-            for row_num, field, obj_type in failed_rows:
-                print(f"Row {row_num}: standardFieldName='{field}', objectType='{obj_type}' (must be one of {sorted(valid_object_types)})")
-            return False
-        else:
-            return True
+        if failed.any():
+            _print("❌ Invalid objectType for sensor/setpoint/count/percentage standardFieldNames (required='YES' and isMissing='NO'):")
+            for idx, field, obj_type in zip(_rows(rows, failed), standard_field[failed], object_type[failed]):
+                _print(f"Row {idx + 2}: standardFieldName='{field}', objectType='{obj_type or '<BLANK>'}' (must be one of {sorted(_ANALOG_OBJECT_TYPES)})")
+        return _rows(rows, failed)
 
     def validate_alarm_types(df):
         """
         Ensures that standardFieldNames containing 'alarm' have a type value of 'BALM'.
         """
-        
-        required_yes = df[df['required_cleaned'] == 'YES']
-        invalid_rows = []
-
-        for idx, row in required_yes.iterrows():
-            field_name = str(row.get('standardFieldName', '')).lower()
-            field_type = str(row.get('type', '')).strip()
-            excel_row = idx + 2
 
-            if 'alarm' in field_name and field_type != 'BALM':
-                invalid_rows.append((excel_row, field_name, field_type))
+        rows = df[_flag(df, 'required', 'YES')]
+        standard_field = _text(rows, 'standardFieldName', 'lower')
+        field_type = _text(rows, 'type')
+        failed = (standard_field.str.contains('alarm', regex=False) & (field_type != 'BALM')).to_numpy()
 
-        if invalid_rows:
-            print("❌ Rows where standardFieldName contains 'alarm' but type is not 'BALM':")
-            for row_num, sf_name, t_val in invalid_rows:
-                print(f"Row {row_num}: standardFieldName='{sf_name}', type='{t_val}'")
-            return False
-        return True
+        if failed.any():
+            _print("❌ Rows where standardFieldName contains 'alarm' but type is not 'BALM':")
+            for idx, sf_name, t_val in zip(_rows(rows, failed), standard_field[failed], field_type[failed]):
+                _print(f"Row {idx + 2}: standardFieldName='{sf_name}', type='{t_val}'")
+        return _rows(rows, failed)
 
     def validate_unique_standard_fields_per_asset(df):
         """
         Confirms that each standardFieldName is unique within a given assetName.
         """
-        
-        required_yes = df[df['required_cleaned'] == 'YES']
-        duplicates = []
 
-        # Group by assetName and look for duplicated standardFieldNames
-        grouped = required_yes.groupby('assetName')
+        # Required rows of the same assetName (blank names are not grouped) with the same standardFieldName
+        rows = df[_flag(df, 'required', 'YES')]
+        rows = rows.loc[rows['assetName'].notna(), ['assetName', 'standardFieldName']]
+        failed = rows.duplicated(keep=False).to_numpy()
 
-        for asset, group in grouped:
-            # Get standardFieldNames and count duplicates
-            duplicates_in_group = group[group.duplicated('standardFieldName', keep=False)]
-            if not duplicates_in_group.empty:
-                for idx, row in duplicates_in_group.iterrows():
-                    excel_row = idx + 2
-                    duplicates.append((excel_row, asset, row['standardFieldName']))
-
-        if duplicates:
-            print("❌ Duplicate standardFieldNames found for the same assetName:")
-            for row_num, asset, field in duplicates:
-                print(f"Row {row_num}: assetName='{asset}', standardFieldName='{field}'")
-            return False
-        return True
+        if failed.any():
+            _print("❌ Duplicate standardFieldNames found for the same assetName:")
+            for idx, asset, field in zip(_rows(rows, failed), rows['assetName'][failed], rows['standardFieldName'][failed]):
+                _print(f"Row {idx + 2}: assetName='{asset}', standardFieldName='{field}'")
+        return _rows(rows, failed)
 
     def validate_typename_matches_standard_fields(df, ontology):
         """
         Verifies that the set of standardFieldNames assigned to each assetName exactly matches 
-        the expected set defined in the ontology for the given typeName.
-        """
-        
-        required_yes = df[df['required_cleaned'] == 'YES']
-        grouped = required_yes.groupby('assetName')
-
-        failed_assets = []
-
-        for asset_name, group in grouped:
-            standard_fields = group['standardFieldName'].astype(str).str.strip().tolist()
-            type_name = group['typeName'].iloc[0]
-
-            if not CompareFieldsToSpecifiedType(ontology, True, type_name, standard_fields):
-                for idx in group.index:
-                    excel_row = idx + 2
-                    failed_assets.append((excel_row, asset_name, type_name))
-
-        if failed_assets:
-            print("❌ standardFieldNames do not 100% match typeName definitions:")
-            seen = set()
-            for row_num, asset, type_name in failed_assets:
-                seen_length = len(seen)
-                seen.add(asset)
-                if len(seen) > seen_length:
-                    print(f"assetName='{asset}', typeName='{type_name}'")
-            return False
-        else:
-            return True
+        the expected set defined in the ontology for the given typeName: every field is defined
+        for the type and every required field of the type is present. Assets without a typeName
+        are not checked yet.
+        """
+
+        rows = df[_flag(df, 'required', 'YES')]
+        asset = _text(rows, 'assetName')
+        type_name = _text(rows, 'typeName')
+        typed = ((asset != '') & (type_name != '')).to_numpy()
+
+        # One (typeName, fieldset) pair per asset, each distinct pair compared to the ontology once
+        fields = _text(rows, 'standardFieldName')[typed]
+        assets = pd.DataFrame({
+            'typeName': type_name[typed].groupby(asset[typed], sort=False).first(),
+            'fields': fields[fields != ''].groupby(asset[typed], sort=False).agg(frozenset)
+        })
+        assets['fields'] = assets['fields'].map(lambda fieldset: fieldset if isinstance(fieldset, frozenset) else frozenset())
+        verdicts = {pair: _compare_to_type(ontology, *pair) for pair in set(zip(assets['typeName'], assets['fields']))}
+        problems = pd.Series([verdicts[pair] for pair in zip(assets['typeName'], assets['fields'])],
+                             index=assets.index, dtype=object).dropna()
+        failed = (asset != '').to_numpy() & asset.isin(problems.index).to_numpy()
+
+        if failed.any():
+            _print("❌ standardFieldNames do not 100% match typeName definitions:")
+            for asset_name, problem in problems.items():
+                _print(f"assetName='{asset_name}', typeName='{assets['typeName'][asset_name]}': {problem}")
+        return _rows(rows, failed)
 
     def validate_unique_typename_per_asset(df):
         """
         Ensures that each assetName maps to a single unique typeName. In other words, 
         there are not multiple typeNames within a single assetName. Blank typeNames are ignored.
         """
-        grouped = df.groupby('assetName')
-
-        failed_assets = []
 
-        for asset_name, group in grouped:
-            type_names = (
-                group['typeName']
-                .dropna()
-                .astype(str)
-                .str.strip()
-            )
-            type_names = type_names[type_names != 'nan'].unique()
+        asset = _text(df, 'assetName')
+        type_name = _text(df, 'typeName')
+        named = (asset != '').to_numpy()
+        typed = named & (type_name != '').to_numpy()
+        type_names = type_name[typed].groupby(asset[typed], sort=False).unique()
+        conflicting = type_names[type_names.map(len) > 1]
+        failed = named & asset.isin(conflicting.index).to_numpy()
 
-            if len(type_names) > 1:
-                for idx in group.index:
-                    excel_row = idx + 2  # Excel rows are 1-indexed, + header row
-                    failed_assets.append((excel_row, asset_name, type_names.tolist()))
-
-        if failed_assets:
-            print("❌ Each assetName must have only one unique typeName (excluding blanks):")
-            seen = set()
-            for row_num, asset, type_names in failed_assets:
-                if asset not in seen:
-                    print(f"assetName='{asset}' has multiple typeNames: {type_names}")
-                    seen.add(asset)
-            return False
-        else:
-            return True
+        if failed.any():
+            _print("❌ Each assetName must have only one unique typeName (excluding blanks):")
+            for asset_name, names in conflicting.items():
+                _print(f"assetName='{asset_name}' has multiple typeNames: {names.tolist()}")
+        return _rows(df, failed)
 
 
     def validate_required_flag_on_populated_rows(df):
@@ -452,33 +493,23 @@ class LoadsheetValidationChecks:
         Ensures that if any of the core identifying fields ('generalType', 'typeName', 'assetName',
         or 'standardFieldName') are populated, then the 'required' column must be set to 'YES'.
         """
-        
-        check_fields = ['generalType', 'typeName', 'standardFieldName']
-        failed_rows = []
-
-        for idx, row in df.iterrows():
-            required = str(row.get('required_cleaned', '')).strip().upper()
-
-            # Identify all fields that are non-empty and not 'nan'
-            non_blank_fields = {
-                field: str(row.get(field, '')).strip()
-                for field in check_fields
-                if str(row.get(field, '')).strip() and str(row.get(field, '')).strip().lower() != 'nan'
-            }
-
-            if non_blank_fields and required != 'YES':
-                # Use the first non-blank field for the error message
-                failing_field, value = next(iter(non_blank_fields.items()))
-                excel_row = idx + 2  # Excel-style row number
-                failed_rows.append((excel_row, failing_field, value, required))
 
-        if failed_rows:
-            print("❌ Rows with populated fields must have required='YES':")
-            for row_num, field, value, required in failed_rows:
-                print(f"Row {row_num}: {field}='{value}', required='{required}'")
-            return False
-        else:
-            return True
+        check_fields = ['generalType', 'typeName', 'standardFieldName']
+        required = _text(df, 'required', 'upper')
+        rows = df[(required != 'YES').to_numpy()]
+        texts = {field: _text(rows, field).to_numpy() for field in check_fields}
+        populated = np.column_stack([texts[field] != '' for field in check_fields])
+        failed = populated.any(axis=1)
+
+        if failed.any():
+            _print("❌ Rows with populated fields must have required='YES':")
+            required = required[rows.index].to_numpy()
+            # Use the first non-blank field for the error message
+            first = populated.argmax(axis=1)
+            for i, idx in zip(np.flatnonzero(failed), rows.index[failed]):
+                field = check_fields[first[i]]
+                _print(f"Row {idx + 2}: {field}='{texts[field][i]}', required='{required[i]}'")
+        return _rows(rows, failed)
 
 FQ_FIELD_NAME = re.compile(
     r'(^[a-z]+[a-z0-9]*(?:_[a-z]+[a-z0-9]*)*)((?:_[0-9]+)+)?$'
@@ -547,4 +578,305 @@ class StandardField(object):
 
   def GetIncrement(self) -> str:
     """Returns the EntityType Field's increment as a string."""
-    return self._increment
\ No newline at end of file
+    return self._increment
+
+class ValidationCheck:
+    """
+    A loadsheet check as registered in CHECKS.
+
+    args:
+            - name: name of the check in reports
+            - function: the LoadsheetValidationChecks check, called with the
+                loadsheet (and the ontology when needs_ontology)
+            - columns: loadsheet columns the check reads
+            - passed: message when the check passes
+            - failed: message when the check fails
+            - depends_on: names of the checks that must pass first
+            - needs_ontology: whether the check is called with the ontology
+            - enabled: whether run_checks runs the check by default
+    """
+
+    def __init__(self, name, function, columns, passed, failed, depends_on=(),
+                 needs_ontology=False, enabled=True):
+        self.name = name
+        self.function = function
+        self.columns = list(columns)
+        self.passed = passed
+        self.failed = failed
+        self.depends_on = list(depends_on)
+        self.needs_ontology = needs_ontology
+        self.enabled = enabled
+
+
+REQUIRED_COLUMNS = [
+    "location", "controlProgram", "name", "type", "path", "deviceId",
+    "objectType", "objectId", "objectName", "units", "required",
+    "isMissing", "manuallyMapped", "building", "generalType",
+    "typeName", "assetName", "standardFieldName"
+]
+
+# The loadsheet checks, in report order. Checks run once the checks they depend on have passed.
+CHECKS = [
+    ValidationCheck('required_columns', LoadsheetValidationChecks.validate_required_columns, [],
+        "Loadsheet contains the correct columns.",
+        "Loadsheet is missing required columns."),
+    ValidationCheck('no_leading_trailing_spaces', LoadsheetValidationChecks.validate_no_leading_trailing_spaces,
+        ['deviceId', 'objectType', 'objectId', 'objectName', 'units', 'required', 'isMissing', 'manuallyMapped',
+         'building', 'generalType', 'typeName', 'assetName', 'standardFieldName'],
+        "No leading or trailing spaces found in cells.",
+        "Cells have leading or trailing spaces.",
+        depends_on=['required_columns']),
+    ValidationCheck('required_column', LoadsheetValidationChecks.validate_required_column, ['required'],
+        "All rows in 'required' column contain 'YES' or 'NO'.",
+        "Rows in 'required' column are not 'YES' or 'NO'.",
+        depends_on=['required_columns']),
+    ValidationCheck('required_fields_populated', LoadsheetValidationChecks.validate_required_fields_populated,
+        ['required', 'isMissing', 'deviceId', 'objectType', 'objectId', 'building', 'generalType', 'units',
+         'assetName', 'standardFieldName'],
+        "All necessary columns populated where required='YES' and isMissing='NO'.",
+        "Necessary columns are blank where required='YES' and isMissing='NO'.",
+        depends_on=['required_columns']),
+    ValidationCheck('missing_required_rows', LoadsheetValidationChecks.validate_missing_required_rows,
+        ['required', 'isMissing', 'name', 'type', 'path', 'deviceId', 'objectType', 'objectId', 'objectName',
+         'building', 'generalType', 'assetName', 'standardFieldName'],
+        "All necessary columns populated where required='YES' and isMissing='YES'.",
+        "Invalid data where required='YES' and isMissing='YES'.",
+        depends_on=['required_columns']),
+    ValidationCheck('standard_field_names', LoadsheetValidationChecks.validate_all_standard_field_names,
+        ['required', 'standardFieldName'],
+        "All standardFieldNames are defined in the ontology.",
+        "StandardFieldNames are not defined in the ontology.",
+        depends_on=['required_columns'], needs_ontology=True),
+    ValidationCheck('units', LoadsheetValidationChecks.validate_units,
+        ['required', 'isMissing', 'standardFieldName', 'units'],
+        "All units are valid and match with corresponding standardFieldNames.",
+        "Units are invalid or do not match their standardFieldNames.",
+        depends_on=['required_columns'], needs_ontology=True),
+    ValidationCheck('object_type_for_command_status', LoadsheetValidationChecks.validate_object_type_for_command_status,
+        ['required', 'isMissing', 'standardFieldName', 'objectType'],
+        "All binary standardFieldNames have binary objectType values.",
+        "Binary standardFieldNames have non-binary objectType values.",
+        depends_on=['required_columns']),
+    ValidationCheck('object_type_for_measurement_points', LoadsheetValidationChecks.validate_object_type_for_measurement_points,
+        ['required', 'isMissing', 'standardFieldName', 'objectType'],
+        "All analog standardFieldNames have analog objectType values.",
+        "Analog standardFieldNames have non-analog objectType values.",
+        depends_on=['required_columns']),
+    ValidationCheck('alarm_types', LoadsheetValidationChecks.validate_alarm_types,
+        ['required', 'standardFieldName', 'type'],
+        "All alarms have the correct BALM type.",
+        "Invalid alarm type entries.",
+        depends_on=['required_columns']),
+    ValidationCheck('unique_standard_fields_per_asset', LoadsheetValidationChecks.validate_unique_standard_fields_per_asset,
+        ['required', 'assetName', 'standardFieldName'],
+        "No duplicate standardFieldNames within a single asset.",
+        "Duplicate standardFieldNames within assets.",
+        depends_on=['required_columns']),
+    ValidationCheck('unique_typename_per_asset', LoadsheetValidationChecks.validate_unique_typename_per_asset,
+        ['assetName', 'typeName'],
+        "All assetNames have exactly one typeName.",
+        "AssetNames have more than one typeName.",
+        depends_on=['required_columns']),
+    ValidationCheck('typename_matches_standard_fields', LoadsheetValidationChecks.validate_typename_matches_standard_fields,
+        ['required', 'assetName', 'typeName', 'standardFieldName'],
+        "All standardFieldName sets are a 100% ontology match with their corresponding typeName.",
+        "StandardFieldName sets do not match their typeName in the ontology.",
+        depends_on=['required_columns', 'unique_typename_per_asset'], needs_ontology=True),
+    ValidationCheck('required_flag_on_populated_rows', LoadsheetValidationChecks.validate_required_flag_on_populated_rows,
+        ['required', 'generalType', 'typeName', 'standardFieldName'],
+        "All rows with populated fields have required='YES'.",
+        "Rows with populated fields are not marked required='YES'.",
+        depends_on=['required_columns'], enabled=False),
+]
+
+
+class CheckResult:
+    """
+    Outcome of one check of a run_checks call.
+
+    args:
+            - check: the ValidationCheck
+            - status: 'passed', 'failed', 'skipped' or 'error'
+            - rows: index labels of the failing rows
+            - output: what the check printed
+            - seconds: time the check took
+            - reason: why the check was skipped or errored
+    """
+
+    def __init__(self, check, status, rows=(), output='', seconds=0.0, reason=None):
+        self.check = check
+        self.status = status
+        self.rows = np.asarray(rows)
+        self.output = output
+        self.seconds = seconds
+        self.reason = reason
+
+    @property
+    def name(self):
+        return self.check.name
+
+    @property
+    def message(self):
+        if self.status == 'passed':
+            return self.check.passed
+        if self.status == 'failed':
+            return self.check.failed
+        return self.reason
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'status': self.status,
+            'message': self.message,
+            'rows': [int(row) + 2 for row in self.rows],  # Excel row numbering
+            'output': self.output,
+            'seconds': round(self.seconds, 6)
+        }
+
+
+class ValidationReport:
+    """
+    Results of a run_checks call, in check order, with the time it took.
+    """
+
+    def __init__(self, results, seconds):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def passed(self):
+        """ Whether every check that ran passed, and none was skipped. """
+        return all(result.status == 'passed' for result in self.results)
+
+    def failures(self):
+        """ Failing row index labels per failed check name. """
+        return {result.name: result.rows for result in self.results if result.status == 'failed'}
+
+    def to_dict(self):
+        return {
+            'passed': self.passed,
+            'seconds': round(self.seconds, 6),
+            'checks': [result.to_dict() for result in self.results]
+        }
+
+    def export_json(self, path):
+        """
+        Writes the report to a .json file.
+
+        args:
+                - path: output filepath
+
+        returns: N/A
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def export_xlsx(self, path, df):
+        """
+        Writes the checked loadsheet to an excel file, with its failing rows
+        highlighted and the checks they fail in a 'validationErrors' column,
+        and the report in a 'Checks' sheet.
+
+        args:
+                - path: output filepath
+                - df: the loadsheet the report is for
+
+        returns: N/A
+        """
+        errors = pd.Series('', index=df.index, dtype=object)
+        for result in self.results:
+            if result.status == 'failed' and len(result.rows):
+                rows = pd.Index(result.rows)
+                errors[rows] = np.where(errors[rows] == '', result.name, errors[rows] + ', ' + result.name)
+        sheet = df.assign(validationErrors=errors.to_numpy())
+        checks = pd.DataFrame([result.to_dict() for result in self.results])
+        checks['rows'] = checks['rows'].map(lambda rows: ', '.join(map(str, rows)))
+
+        with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+            sheet.to_excel(writer, sheet_name='Loadsheet', index=False)
+            checks.to_excel(writer, sheet_name='Checks', index=False)
+            worksheet = writer.sheets['Loadsheet']
+            failed = writer.book.add_format({'bg_color': '#FFC7CE'})
+            # Excel rows are 1-based, below the header
+            for row in np.flatnonzero((errors != '').to_numpy()):
+                worksheet.set_row(int(row) + 1, None, failed)
+
+
+def run_checks(df, ontology=None, names=None, max_workers=None):
+    """
+    Runs the loadsheet checks on a loadsheet with its original headers.
+    Checks whose dependencies have passed run concurrently, sharing the
+    loadsheet's normalized columns; a check is skipped when a dependency
+    did not pass, a column it reads is missing or it needs an ontology
+    and none is given.
+
+    args:
+            - df: loadsheet dataframe, not modified
+            - ontology: ontology for the checks that need one
+            - names: names of the checks to run, default all enabled CHECKS
+                (plus the checks they depend on)
+            - max_workers: number of threads, default as ThreadPoolExecutor
+
+    returns: a ValidationReport
+    """
+    checks = {check.name: check for check in CHECKS}
+    wanted = [check.name for check in CHECKS if check.enabled] if names is None else list(names)
+    for name in wanted:
+        if name not in checks:
+            raise ValueError("Unknown check '{}'".format(name))
+        wanted.extend(dep for dep in checks[name].depends_on if dep not in wanted)
+    order = [check for check in CHECKS if check.name in wanted]
+
+    start = time.perf_counter()
+    buffers = _ColumnBuffers(df)
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = list(order)
+        while pending:
+            # Each wave runs the checks whose dependencies all have results
+            wave = [check for check in pending if all(dep in results for dep in check.depends_on)]
+            pending = [check for check in pending if check not in wave]
+            futures = {}
+            for check in wave:
+                skipped = _skip_reason(check, df, ontology, results)
+                if skipped:
+                    results[check.name] = CheckResult(check, 'skipped', reason=skipped)
+                else:
+                    context = contextvars.copy_context()
+                    futures[check.name] = executor.submit(context.run, _run_check, check, df, ontology, buffers)
+            for name, future in futures.items():
+                results[name] = future.result()
+
+    return ValidationReport([results[check.name] for check in order], time.perf_counter() - start)
+
+
+def _skip_reason(check, df, ontology, results):
+    """ Why check cannot run, or None. """
+    failed = [dep for dep in check.depends_on if results[dep].status != 'passed']
+    if failed:
+        return "Depends on {}, which did not pass.".format(', '.join(failed))
+    missing = [col for col in check.columns if col not in df.columns]
+    if missing:
+        return "Missing columns {}.".format(missing)
+    if check.needs_ontology and ontology is None:
+        return "Needs an ontology."
+    return None
+
+
+def _run_check(check, df, ontology, buffers):
+    """ Runs check in the current context, capturing its output, as a CheckResult. """
+    output = io.StringIO()
+    _BUFFERS.set(buffers)
+    _OUTPUT.set(output)
+    start = time.perf_counter()
+    try:
+        args = (df, ontology) if check.needs_ontology else (df,)
+        outcome = check.function(*args)
+    except Exception as e:
+        return CheckResult(check, 'error', output=output.getvalue(),
+                           seconds=time.perf_counter() - start, reason=str(e))
+    seconds = time.perf_counter() - start
+
+    # Checks return their failing rows
+    rows = np.asarray(outcome)
+    return CheckResult(check, 'failed' if len(rows) else 'passed', rows, output.getvalue(), seconds)
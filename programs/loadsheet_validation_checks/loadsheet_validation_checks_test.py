@@ -0,0 +1,187 @@
+#Copyright 2020 DB Engineering
+
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+import unittest
+import unittest.mock
+import io
+import os
+import json
+import tempfile
+import contextlib
+import threading
+import concurrent.futures
+import pandas
+import loadsheet_validation_checks
+from loadsheet_validation_checks import LoadsheetValidationChecks as checks
+from loadsheet_validation_checks import run_checks
+
+
+def _sheet():
+	row = {'location':'L', 'controlProgram':'AHU-1', 'name':'SAT', 'type':'BAV', 'path':'#p/sat',
+		'deviceId':'DEV:1', 'objectType':'AV', 'objectId':3, 'objectName':'sat', 'units':'degrees-fahrenheit',
+		'required':'YES', 'isMissing':'NO', 'manuallyMapped':None, 'building':'US-MTV-1', 'generalType':'AHU',
+		'typeName':'AHU_1', 'assetName':'AHU-1', 'standardFieldName':'supply_air_temperature_sensor'}
+	rows = [dict(row) for _ in range(6)]
+	rows[1].update({'standardFieldName':'supply_fan_run_command', 'objectType':'BV', 'type':'BBV'})
+	rows[2].update({'standardFieldName':'supply_fan_run_status', 'objectType':'AV'})
+	rows[3].update({'units':' degrees-fahrenheit', 'standardFieldName':'return_air_temperature_sensor'})
+	rows[4].update({'required':'no', 'standardFieldName':None, 'typeName':None, 'generalType':'AHU'})
+	rows[5].update({'isMissing':'YES', 'deviceId':None, 'objectType':None, 'objectId':None, 'objectName':None,
+		'name':None, 'type':None, 'path':'x', 'standardFieldName':'zone_air_temperature_sensor'})
+	return pandas.DataFrame(rows)
+
+
+class _Ontology:
+	#the part of ontology.Ontology the checks use
+	def __init__(self):
+		self.types = unittest.mock.Mock(types={'HVAC':{'AHU_1':None}, 'GLOBAL':{}})
+		fields = {field:object() for field, _ in self.get_type_fields('HVAC', 'AHU_1')}
+		self.fields = unittest.mock.Mock(get_field=fields.__getitem__)
+
+	def get_type_fields(self, namespace, type_name):
+		return [('supply_air_temperature_sensor', True), ('supply_fan_run_command', True),
+			('supply_fan_run_status', False), ('return_air_temperature_sensor', False),
+			('zone_air_temperature_sensor', False)]
+
+	def get_units_for_measurement(self, measurement):
+		return {'temperature':['kelvins', 'degrees_celsius', 'degrees_fahrenheit']}.get(measurement, [])
+
+
+class TestChecks(unittest.TestCase):
+	def test_failing_rows(self):
+		#each check returns the index labels of its failing rows
+		df = _sheet()
+		with contextlib.redirect_stdout(io.StringIO()) as out:
+			self.assertEqual([3], checks.validate_no_leading_trailing_spaces(df).tolist())
+			self.assertEqual([], checks.validate_required_column(df).tolist())
+			self.assertEqual([2], checks.validate_object_type_for_command_status(df).tolist())
+			self.assertEqual([], checks.validate_object_type_for_measurement_points(df).tolist())
+			self.assertEqual([5], checks.validate_missing_required_rows(df).tolist())
+			self.assertEqual([4], checks.validate_required_flag_on_populated_rows(df).tolist())
+			self.assertEqual([], checks.validate_required_fields_populated(df).tolist())
+			self.assertEqual([], checks.validate_required_columns(df).tolist())
+			self.assertEqual(list(range(6)), checks.validate_required_columns(df.drop(columns=['units'])).tolist())
+		self.assertIn("Row 7:\n  - path should be blank (found 'x')", out.getvalue())
+
+	def test_asset_checks(self):
+		#duplicates and typeName conflicts are found per assetName
+		df = _sheet()
+		df.loc[1, 'standardFieldName'] = 'supply_air_temperature_sensor'
+		df.loc[2, 'typeName'] = 'AHU_2'
+		with contextlib.redirect_stdout(io.StringIO()) as out:
+			self.assertEqual([0, 1], checks.validate_unique_standard_fields_per_asset(df).tolist())
+			self.assertEqual(list(range(6)), checks.validate_unique_typename_per_asset(df).tolist())
+		self.assertIn("assetName='AHU-1' has multiple typeNames: ['AHU_1', 'AHU_2']", out.getvalue())
+
+	def test_typename_matches_standard_fields(self):
+		#fieldsets are compared to the ontology definition of their asset's typeName
+		df = _sheet()
+		ontology = _Ontology()
+		with contextlib.redirect_stdout(io.StringIO()) as out:
+			self.assertEqual([], checks.validate_typename_matches_standard_fields(df, ontology).tolist())
+			df.loc[1, 'standardFieldName'] = 'supply_fan_speed_command'
+			self.assertEqual([0, 1, 2, 3, 5], checks.validate_typename_matches_standard_fields(df, ontology).tolist())
+			df['typeName'] = 'HVAC/AHU_2'
+			self.assertEqual([0, 1, 2, 3, 5], checks.validate_typename_matches_standard_fields(df, ontology).tolist())
+		self.assertIn("missing required fields ['supply_fan_run_command'], fields not in type ['supply_fan_speed_command']",
+			out.getvalue())
+		self.assertIn("typeName='HVAC/AHU_2': typeName not defined in the ontology", out.getvalue())
+
+	def test_units(self):
+		#units must be those of the field's measurement, or no-units without one
+		df = _sheet()
+		df.loc[2, 'units'] = 'No-Units'
+		with contextlib.redirect_stdout(io.StringIO()) as out:
+			self.assertEqual([1], checks.validate_units(df, _Ontology()).tolist())
+		self.assertIn("Row 3: standardFieldName='supply_fan_run_command', units='degrees-fahrenheit'", out.getvalue())
+
+	def test_standard_field_names(self):
+		#required rows must have a standardFieldName the ontology defines, with or without increment
+		df = _sheet()
+		df.loc[0, 'standardFieldName'] = 'supply_air_temperature_sensor_2'
+		df.loc[1, 'standardFieldName'] = 'supply_air_temperature_sensorr'
+		df.loc[2, 'standardFieldName'] = ' '
+		df.loc[4, 'standardFieldName'] = 'not_required_sensor'
+		with contextlib.redirect_stdout(io.StringIO()) as out:
+			self.assertEqual([1, 2], checks.validate_all_standard_field_names(df, _Ontology()).tolist())
+		self.assertEqual("❌ Invalid or missing 'standardFieldName' entries:\n"
+			"Row 3: 'supply_air_temperature_sensorr'\nRow 4: '<BLANK>'\n", out.getvalue())
+
+		report = run_checks(df, _Ontology(), names=['standard_field_names'])
+		self.assertEqual(['required_columns', 'standard_field_names'], [r.name for r in report.results])
+		self.assertEqual([1, 2], report.failures()['standard_field_names'].tolist())
+
+
+class TestRunChecks(unittest.TestCase):
+	def test_report(self):
+		#all checks run into one report, with the same failing rows as when run alone
+		df = _sheet()
+		with contextlib.redirect_stdout(io.StringIO()) as out:
+			report = run_checks(df, max_workers=4)
+		self.assertEqual('', out.getvalue())
+		self.assertFalse(report.passed)
+		failures = report.failures()
+		self.assertEqual({'no_leading_trailing_spaces', 'object_type_for_command_status', 'missing_required_rows'},
+			set(failures))
+		self.assertEqual([2], failures['object_type_for_command_status'].tolist())
+		result = {r.name: r for r in report.results}['missing_required_rows']
+		self.assertIn("Row 7:\n  - path should be blank (found 'x')", result.output)
+		self.assertNotIn('required_flag_on_populated_rows', [r.name for r in report.results])
+
+	def test_skipped(self):
+		#checks depending on a failed check are skipped
+		df = _sheet().drop(columns=['location'])
+		report = run_checks(df, names=['alarm_types'])
+		self.assertEqual(['failed', 'skipped'], [r.status for r in report.results])
+		self.assertEqual(list(range(6)), report.failures()['required_columns'].tolist())
+		self.assertRaises(ValueError, run_checks, df, names=['no_such_check'])
+
+	def test_buffers(self):
+		#columns are normalized once, and a column being normalized does not hold up the others
+		df = _sheet()
+		buffers = loadsheet_validation_checks._ColumnBuffers(df)
+		normalize = loadsheet_validation_checks._normalize
+		started, other_done = threading.Event(), threading.Event()
+		def slow_normalize(df, col, case=None):
+			if col == 'units':
+				started.set()
+				self.assertTrue(other_done.wait(5))
+			return normalize(df, col, case)
+
+		with unittest.mock.patch.object(loadsheet_validation_checks, '_normalize',
+				side_effect=slow_normalize) as mocked, concurrent.futures.ThreadPoolExecutor(2) as executor:
+			units = executor.submit(buffers.get, 'units', None)
+			self.assertTrue(started.wait(5))
+			self.assertEqual('YES', buffers.get('required', 'upper')[0])
+			other_done.set()
+			self.assertEqual('degrees-fahrenheit', units.result()[3])
+			self.assertIs(units.result(), buffers.get('units', None))
+		self.assertEqual(2, mocked.call_count)
+
+	def test_export(self):
+		#reports export as json and as an annotated copy of the loadsheet
+		df = _sheet()
+		report = run_checks(df)
+		with tempfile.TemporaryDirectory() as folder:
+			report.export_json(os.path.join(folder, 'report.json'))
+			with open(os.path.join(folder, 'report.json')) as f:
+				exported = json.load(f)
+			report.export_xlsx(os.path.join(folder, 'report.xlsx'), df)
+			sheet = pandas.read_excel(os.path.join(folder, 'report.xlsx'))
+		self.assertEqual([4], [c['rows'] for c in exported['checks'] if c['name'] == 'object_type_for_command_status'][0])
+		self.assertEqual('object_type_for_command_status', sheet['validationErrors'][2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,6 +18,7 @@ import re
 import json
 import yaml
 import sys
+import hashlib
 
 sys.path.append('../')
 
@@ -39,6 +40,21 @@ def load_yaml(file_path):
 	#print('Ontology: Imported doc {}'.format(file_path))
 	return data
 
+def content_hash(resource_dir):
+	""" Hash of the ontology source files under resource_dir (relative paths and contents).
+	Two folders with the same files hash the same, so a built ontology can be stored by it. """
+	digest = hashlib.sha256()
+	for root, dirs, files in os.walk(resource_dir):
+		dirs.sort()
+		for file in sorted(files):
+			if not file.endswith('.yaml'):
+				continue
+			path = os.path.join(root, file)
+			digest.update(os.path.relpath(path, resource_dir).replace('\\','/').encode('utf-8'))
+			with open(path,'rb') as f:
+				digest.update(hashlib.sha256(f.read()).digest())
+	return digest.hexdigest()
+
 class Subfield:
 	""" Class for defining and validating a subfield. """
 
@@ -221,6 +237,46 @@ class Fields:
 		""" Perform a series of validations. """
 		pass
 
+class Units:
+	""" Helper class to hold the units of each measurement type. """
+
+	def __init__(self,resource_dir):
+		self.mapping_key = {
+			'units':resource_dir+'/units',
+			'subfields':resource_dir+'/subfields',
+			'fields':resource_dir+'/fields',
+			'states':resource_dir+'/states'
+		}
+		self.units = self._import_units()
+
+	def get_units(self,measurement):
+		""" Return the units of a measurement type (e.g. 'temperature'), empty if it is not one. """
+		return self.units.get(measurement,[])
+
+	def _get_unit_files(self):
+		""" Return a list of fully qualified file paths for any unit files. """
+
+		target = 'units'
+		if not os.path.exists(self.mapping_key[target]):
+			return []
+		files = os.listdir(self.mapping_key[target])
+		files = [self.mapping_key[target] + '/' + file for file in files]
+		return files
+
+	def _import_units(self):
+		""" Import the units from the relevant YAML files, as measurement: [unit names]. """
+
+		units = {}
+		for file in self._get_unit_files():
+			data = load_yaml(file)
+			for measurement in data:
+				for unit in data[measurement]:
+					# Units are listed as a name, or as {name: STANDARD} for the standard unit
+					names = unit.keys() if isinstance(unit,dict) else [unit]
+					units.setdefault(measurement,[]).extend(names)
+
+		return units
+
 class Types:
 	""" Helper class to hold all entity types. """
 
@@ -372,6 +428,7 @@ class Ontology:
 		self.subfields = Subfields(resource_dir)
 		self.fields = Fields(resource_dir)
 		self.types = Types(resource_dir)
+		self.units = Units(resource_dir)
 		self.validate()
 
 	def validate(self):
@@ -572,6 +629,10 @@ class Ontology:
 		invalid_fields = [field for field in fields_list if self.check_field(field)==False]
 		return invalid_fields
 
+	def get_units_for_measurement(self,measurement):
+		""" Get the units of a measurement type (e.g. 'temperature'), empty if it is not one. """
+		return self.units.get_units(measurement)
+
 	def get_type_fields(self,namespace,type_name):
 		""" Get the fields of a type by name. """
 		return self.types.get_all_fields(namespace,type_name)
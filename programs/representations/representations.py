@@ -13,7 +13,10 @@
 #limitations under the License.
 
 import json
-import base64
+from array import array
+
+import numpy as np
+import pandas as pd
 
 import sys
 sys.path.append('..\\')
@@ -21,37 +24,196 @@ sys.path.append('..\\')
 import ontology.ontology
 from pretty import PrettyPrint
 
-def _convert_to_base64(data):
-	"""
-	Convert a data object into a base64 message.
-	Used as a codeword to uniquely identify each asset
-	"""
+class Fieldsets:
+	""" Interns fieldsets: gives each distinct set of field names a small integer id, which stays the same
+	for as long as the object lives. Used as the key to group assets with the same fields. """
+
+	def __init__(self):
+		""" Initialize an empty interner. """
+		self._ids = {}
+		self._fieldsets = []
+
+	def __len__(self):
+		return len(self._fieldsets)
+
+	def intern(self,fields):
+		"""
+		Get the id of a set of fields, adding it if it is new.
 
-	if isinstance(data,set):
-		data = list(data)
-		data.sort()
-		data = tuple(data)
-		data = str(data)
+		args:
+			- fields: iterable of field names
+
+		returns: integer fieldset id
+		"""
+		fieldset = frozenset(fields)
+		fieldset_id = self._ids.get(fieldset)
+		if fieldset_id is None:
+			fieldset_id = self._ids[fieldset] = len(self._fieldsets)
+			self._fieldsets.append(fieldset)
+		return fieldset_id
+
+	def get(self,fieldset_id):
+		"""
+		Get the fields of a fieldset id.
+
+		returns: frozenset of field names
+		"""
+		return self._fieldsets[fieldset_id]
 
-	if isinstance(data,list):
-		data.sort()
-		data = tuple(data)
-		data = str(data)
+class _Points:
+	""" Struct-of-arrays store of the fields (points) of assets. Holds one column per point attribute
+	(_POINT_COLUMNS) and one row per field added, so the points do not hold a dict or object each.
+	Columns are dictionary encoded, as an array of codes into their distinct values, except for
+	the ones unique per point (_PLAIN_POINT_COLUMNS). Rows are only appended: the rows of removed
+	fields are left unused. """
 
-	if isinstance(data,tuple):
-		data = str(data)
+	def __init__(self):
+		""" Initialize an empty store. """
+		self._codes = {column:array('i') for column in _POINT_COLUMNS if column not in _PLAIN_POINT_COLUMNS}
+		self._values = {column:[] for column in _POINT_COLUMNS}
+		self._lookup = {column:{} for column in self._codes}
+		self._rows = 0
 
-	encoded_bytes = base64.b64encode(data.encode("utf-8"))
-	encoded_str = str(encoded_bytes, "utf-8")
+	def __len__(self):
+		return self._rows
 
-	return encoded_str
+	def __getstate__(self):
+		""" Pickled state: the codes and values. The value lookups are rebuilt on load. """
+		return {'_codes':self._codes,'_values':self._values,'_rows':self._rows}
+
+	def __setstate__(self,state):
+		self.__dict__.update(state)
+		self._lookup = {column:{_value_key(value):code for code, value in enumerate(self._values[column])}
+			for column in self._codes}
+
+	def append(self,values):
+		"""
+		Add a point.
+
+		args:
+			- values: dictionary of point values by _POINT_COLUMNS name
+
+		returns: row of the point
+		"""
+		return self.extend({column:[values[column]] for column in _POINT_COLUMNS})[0]
+
+	def extend(self,columns):
+		"""
+		Add points.
+
+		args:
+			- columns: dictionary of equally long lists of point values by _POINT_COLUMNS name
+
+		returns: range of the rows of the points
+		"""
+		rows = range(self._rows,self._rows + len(columns['field_name']))
+		for column in _POINT_COLUMNS:
+			values = self._values[column]
+			if column in _PLAIN_POINT_COLUMNS:
+				values.extend(columns[column])
+				continue
+			lookup = self._lookup[column]
+			# Code each distinct value once. Values of different types can be equal (e.g. 1 and 1.0), so
+			# are only told apart by _value_key when there is more than one type besides text
+			new = columns[column]
+			keys = new
+			if len(set(map(type,new)).difference([str,type(None)])) > 1:
+				keys = [_value_key(value) for value in new]
+			distinct = dict(zip(keys,new))
+			for key, value in distinct.items():
+				value_key = _value_key(value)
+				code = lookup.get(value_key)
+				if code is None:
+					code = lookup[value_key] = len(values)
+					values.append(value)
+				distinct[key] = code
+			self._codes[column].extend(map(distinct.__getitem__,keys))
+		self._rows = rows.stop
+		return rows
+
+	def get(self,row,column):
+		""" Get a value of a point. """
+		codes = self._codes.get(column)
+		if codes is None:
+			return self._values[column][row]
+		return self._values[column][codes[row]]
+
+	def column(self,column,rows):
+		""" Get the values of some points. """
+		values = self._values[column]
+		codes = self._codes.get(column)
+		if codes is None:
+			return [values[row] for row in rows]
+		return [values[codes[row]] for row in rows]
+
+	def take(self,column,rows):
+		"""
+		Get the values of some points, as an array.
+
+		args:
+			- column: _POINT_COLUMNS name
+			- rows: integer array of rows
+
+		returns: object array of values
+		"""
+		values = np.empty(len(self._values[column]),dtype=object)
+		values[:] = self._values[column]
+		codes = self._codes.get(column)
+		if codes is None:
+			return values[rows]
+		return values[np.frombuffer(codes,dtype=np.intc)[rows]]
+
+	def find(self,rows,column,value):
+		"""
+		Find the first of the given rows with a value, in a dictionary encoded column.
+
+		returns: the row, or None if none has the value
+		"""
+		code = self._lookup[column].get(_value_key(value))
+		if code is not None:
+			codes = self._codes[column]
+			for row in rows:
+				if codes[row] == code:
+					return row
+		return None
+
+# Point attributes kept for each field, in the order of the bms_info and bacnet_address dictionaries
+_BMS_INFO_KEYS = ('bms_type','location','controlprogram','name','path','type')
+_BACNET_ADDRESS_KEYS = ('deviceid','objectid','objectname','objecttype','units')
+_POINT_COLUMNS = ('field_name',) + _BMS_INFO_KEYS + _BACNET_ADDRESS_KEYS + ('manually_mapped','is_missing')
+_PLAIN_POINT_COLUMNS = ('path',)
+
+# Keys of the rows dumped by Assets.dump_to_data, in order
+_DUMP_KEYS = ('location','controlprogram','name','type','path','deviceid','objecttype','objectid','objectname','units',
+	'required','manuallymapped','ismissing','building','generaltype','typename','assetname','standardfieldname')
+
+# Loadsheet data key of each point column (besides bms_type)
+_POINT_DATA_KEYS = {'field_name':'standardfieldname','location':'location','controlprogram':'controlprogram',
+	'name':'name','path':'path','type':'type','deviceid':'deviceid','objecttype':'objecttype','objectid':'objectid',
+	'objectname':'objectname','units':'units','manually_mapped':'manuallymapped','is_missing':'ismissing'}
+
+# Required bms_info keys per BMS type
+_BMS_INFO_REQUIREMENTS = {'ALC':{'location','controlprogram','name','type','path'}}
+
+def _value_key(value):
+	""" Lookup key of a point value. Values of other types than text are told apart by type
+	(e.g. 1 from 1.0), and NaN (which is not equal to itself) gets a key of its own. """
+	if type(value) is str:
+		return value
+	if isinstance(value,float) and value != value:
+		return ('NaN',)
+	return (type(value),value)
 
 class Asset:
 	""" An asset model for the loadsheet data. Holds all the relevant loadsheet asset-related data
 	and serves as a wrapper for the Field class, allowing user to add/update fields directly on the
-	asset object. """
+	asset object. The field data is kept in a point store (shared by all assets of an Assets object);
+	the asset only holds the rows of its fields. """
+
+	__slots__ = ('building','general_type','type_name','asset_name','full_asset_name',
+		'matched','match','placeholderid','_points','_rows','_fieldsets','_fieldset_id')
 
-	def __init__(self,building,general_type,type_name,asset_name):
+	def __init__(self,building,general_type,type_name,asset_name,points=None,fieldsets=None):
 		"""
 		Initialize the model
 
@@ -60,6 +222,8 @@ class Asset:
 			- general_type: string asset type e.g. VAV
 			- type_name: Unique name for type definitions
 			- asset_name: string physical name
+			- points: point store to keep the fields in, default a new one
+			- fieldsets: fieldset interner for fieldset_id, default a new one
 
 		returns: new asset objects
 		"""
@@ -69,9 +233,28 @@ class Asset:
 		self.type_name = type_name
 		self.asset_name = asset_name
 		self.full_asset_name = '{}:{}:{}'.format(self.building,self.general_type,self.asset_name)
-		self.fields = {}
 		self.matched = False
 		self.placeholderid = 10000
+		self._points = points if points is not None else _Points()
+		self._rows = array('i')
+		self._fieldsets = fieldsets if fieldsets is not None else Fieldsets()
+		self._fieldset_id = None
+
+	@property
+	def fields(self):
+		""" Dictionary of the fields of the asset, by field name. """
+		return {self._points.get(row,'field_name'):Field._view(self._points,row) for row in self._rows}
+
+	@property
+	def fieldset_id(self):
+		""" Interned id of the set of fields of the asset, the same for all assets with the same fields. """
+		if self._fieldset_id is None:
+			self._fieldset_id = self._fieldsets.intern(self.get_fields())
+		return self._fieldset_id
+
+	def _find(self,field_name):
+		""" The row of a field of the asset, or None. """
+		return self._points.find(self._rows,'field_name',field_name)
 
 	def add_field(self,field_name,bms_info,bacnet_address,manually_mapped=False,is_missing="NO",placeholder=False):
 		"""
@@ -89,14 +272,19 @@ class Asset:
 
 		returns: N/A
 		"""
-		assert field_name not in self.fields, "Field {} already set.".format(field_name)
+		assert self._find(field_name) is None, "Field {} already set.".format(field_name)
 		if placeholder:
-			self.bms_info={'bms_type':"",'location':'', 'controlprogram':'', 'name':'Placeholder', 'path':'x', 'type':'x'}
-			self.bacnet_address={'deviceid':'', 'objectid':self.placeholderid, 'objectname':'x', 'objecttype':'x', 'units':''}
+			bms_info={'bms_type':"",'location':'', 'controlprogram':'', 'name':'Placeholder', 'path':'x', 'type':'x'}
+			bacnet_address={'deviceid':'', 'objectid':self.placeholderid, 'objectname':'x', 'objecttype':'x', 'units':''}
 			self.placeholderid += 1
-			self.fields[field_name] = Field(field_name,self.bms_info,self.bacnet_address,manually_mapped,is_missing,placeholder = True)
 		else:
-			self.fields[field_name] = Field(field_name,bms_info,bacnet_address,manually_mapped,is_missing)
+			_check_point(bms_info,bacnet_address)
+		self._add_point(_point_values(field_name,bms_info,bacnet_address,manually_mapped,is_missing))
+
+	def _add_point(self,values):
+		""" Add a field to the point store, without checks. """
+		self._rows.append(self._points.append(values))
+		self._fieldset_id = None
 
 	def update_field(self,field_name,bms_info,bacnet_address,manually_mapped=False,is_missing=False):
 		"""
@@ -114,9 +302,10 @@ class Asset:
 
 		returns: N/A
 		"""
-		assert field_name in self.fields, "Field not defined."
-		del self.fields[field_name]
-		self.fields[field_name] = Field(field_name,bms_info,bacnet_address,manually_mapped,is_missing)
+		assert self._find(field_name) is not None, "Field not defined."
+		_check_point(bms_info,bacnet_address)
+		self.remove_field(field_name)
+		self._add_point(_point_values(field_name,bms_info,bacnet_address,manually_mapped,is_missing))
 
 	def update_type(self,type_name):
 		"""
@@ -138,8 +327,10 @@ class Asset:
 
 		returns: N/A
 		"""
-		assert field_name in self.fields, "Field not defined; cannot remove."
-		del self.fields[field_name]
+		row = self._find(field_name)
+		assert row is not None, "Field not defined; cannot remove."
+		self._rows.remove(row)
+		self._fieldset_id = None
 
 	def get_general_type(self):
 		"""
@@ -155,7 +346,7 @@ class Asset:
 
 		returns: list of field name strings
 		"""
-		return [field for field in self.fields]
+		return [self._points.get(row,'field_name') for row in self._rows]
 
 	def get_field_details(self,field_name):
 		"""
@@ -166,8 +357,9 @@ class Asset:
 
 		returns: dictionary of BMS info of passed field
 		"""
-		assert field_name in self.fields, "Field not defined; cannot find."
-		return self.fields[field_name].get_field_details()
+		row = self._find(field_name)
+		assert row is not None, "Field not defined; cannot find."
+		return Field._view(self._points,row).get_field_details()
 
 	def get_all_field_details(self):
 		"""
@@ -176,8 +368,8 @@ class Asset:
 		returns: dictionary of BMS info for all fields
 		"""
 		field_details = {}
-		for field in self.fields:
-			field_details[field] = self.fields[field].get_field_details()
+		for field_name, field in self.fields.items():
+			field_details[field_name] = field.get_field_details()
 		return field_details
 
 	def get_asset_details(self):
@@ -231,10 +423,30 @@ class Asset:
 		details.update({'fields':self.get_all_field_details()})
 		return details
 
+def _point_values(field_name,bms_info,bacnet_address,manually_mapped,is_missing):
+	""" The values of a field, by _POINT_COLUMNS name. """
+	values = {'field_name':field_name,'manually_mapped':manually_mapped,'is_missing':is_missing}
+	for key in _BMS_INFO_KEYS:
+		values[key] = bms_info.get(key) if bms_info else None
+	for key in _BACNET_ADDRESS_KEYS:
+		values[key] = bacnet_address.get(key) if bacnet_address else None
+	return values
+
+def _check_point(bms_info,bacnet_address):
+	""" Check that the bms_info and bacnet_address of a field have the keys required. """
+	assert 'bms_type' in bms_info, "Argument 'bms_info' requires a 'bms_type' key."
+	missing = _BMS_INFO_REQUIREMENTS.get(bms_info['bms_type'],set()).difference(bms_info)
+	assert not missing, "Field '{}' not in 'bms_info' argument.".format(sorted(missing)[0])
+	missing = set(_BACNET_ADDRESS_KEYS).difference(bacnet_address)
+	assert not missing, "Field '{}' not in 'bacnet_address' argument.".format(sorted(missing)[0])
+
 class Field:
-	""" A field model for the loadsheet data. Requires BMS specific metadata and BACnet address info. """
+	""" A field model for the loadsheet data. Requires BMS specific metadata and BACnet address info.
+	A field is a view of a row of a point store (see Asset). """
 	#TODO: Add in BMS type functionality that spans the different classes
 
+	__slots__ = ('_points','_row')
+
 	def __init__(self,field_name,bms_info,bacnet_address,manually_mapped=False,is_missing="NO",placeholder=False):
 		"""
 		Initialize the model.
@@ -251,27 +463,38 @@ class Field:
 
 		returns: field object
 		"""
-		self.field_name=field_name
-		self.manually_mapped=manually_mapped
-		self.is_missing = is_missing
 		if not placeholder:
-			self.bms_info = bms_info
-			assert 'bms_type' in self.bms_info, "Argument 'bms_info' requires a 'bms_type' key."
-
-			if bms_info['bms_type'] == 'ALC':
-				required_fields = ['location','controlprogram','name','type','path']
-				for field in required_fields:
-					assert field in self.bms_info, "Field '{}' not in 'bms_info' argument.".format(field)
-
-			self.bacnet_address = bacnet_address
-
-			bacnet_requirements = ['deviceid','objecttype','objectid','objectname','units']
-			for field in bacnet_requirements:
-				assert field in bacnet_requirements, "Field '{}' not in 'bacnet_address' argument.".format(field)
-
-		else:
-			self.bms_info = bms_info
-			self.bacnet_address = bacnet_address
+			_check_point(bms_info,bacnet_address)
+		self._points = _Points()
+		self._row = self._points.append(_point_values(field_name,bms_info,bacnet_address,manually_mapped,is_missing))
+
+	@classmethod
+	def _view(cls,points,row):
+		""" The field of a row of a point store. """
+		field = cls.__new__(cls)
+		field._points = points
+		field._row = row
+		return field
+
+	@property
+	def field_name(self):
+		return self._points.get(self._row,'field_name')
+
+	@property
+	def manually_mapped(self):
+		return self._points.get(self._row,'manually_mapped')
+
+	@property
+	def is_missing(self):
+		return self._points.get(self._row,'is_missing')
+
+	@property
+	def bms_info(self):
+		return {key:self._points.get(self._row,key) for key in _BMS_INFO_KEYS}
+
+	@property
+	def bacnet_address(self):
+		return {key:self._points.get(self._row,key) for key in _BACNET_ADDRESS_KEYS}
 
 	def get_field_details(self):
 		"""
@@ -292,7 +515,26 @@ class Assets:
 		""" Initialize the class. """
 		self.assets = {}
 		self.determined_types = {}
-		self.ununsed_data = []
+		self._ununsed_data = []
+		# Unused rows loaded by load_from_table, as copies of the rows of the loadsheet tables taken when
+		# loaded; only converted to rows of data when ununsed_data is asked for
+		self._unused_tables = []
+		# Fields of all assets, and their fieldsets
+		self._points = _Points()
+		self.fieldsets = Fieldsets()
+
+	@property
+	def ununsed_data(self):
+		""" Rows of data that are not applied to assets (required is not YES). """
+		for table in self._unused_tables:
+			self._ununsed_data.extend(table.to_dict('records'))
+		self._unused_tables = []
+		return self._ununsed_data
+
+	@ununsed_data.setter
+	def ununsed_data(self,rows):
+		self._ununsed_data = rows
+		self._unused_tables = []
 
 	def add_asset(self,building,general_type,type_name,asset_name):
 		"""
@@ -305,7 +547,7 @@ class Assets:
 			- asset_name: string physical name
 		"""
 		assert asset_name not in self.assets, "Asset {} already exists.".format(asset_name)
-		asset = Asset(building,general_type,type_name,asset_name)
+		asset = Asset(building,general_type,type_name,asset_name,self._points,self.fieldsets)
 		self.assets[asset_name] = asset
 
 	def remove_asset(self,asset_name):
@@ -435,32 +677,7 @@ class Assets:
 			- data_row: row of data to add
 		"""
 
-		if data_row['assetname'] not in self.assets:
-			self.add_asset(
-						data_row['building'],
-						data_row['generaltype'],
-						data_row['typename'],
-						data_row['assetname']
-					)
-
-		bms_info = {
-				'bms_type':'ALC',
-				'location':data_row['location'],
-				'controlprogram':data_row['controlprogram'],
-				'name':data_row['name'],
-				'type':data_row['type'],
-				'path':data_row['path']
-			}
-
-		bacnet_address = {
-				'deviceid':data_row['deviceid'],
-				'objectid':data_row['objectid'],
-				'objecttype':data_row['objecttype'],
-				'objectname':data_row['objectname'],
-				'units':data_row['units']
-			}
-
-		self.add_field(data_row['assetname'],data_row['standardfieldname'],bms_info,bacnet_address,data_row['manuallymapped'],data_row['ismissing'])
+		self._load_rows([data_row])
 
 	def load_from_data(self,data):
 		"""
@@ -470,11 +687,108 @@ class Assets:
 			- data: dictionary of lists representing loadsheet data
 		"""
 
+		rows = []
 		for row in data:
 			if row['required'] == 'YES':
-				self.load_from_row(row)
+				rows.append(row)
 			else:
 				self.ununsed_data.append(row)
+		self._load_rows(rows)
+
+	def _load_rows(self,rows):
+		"""
+		Load required rows of data, as load_from_row does one at a time, with all their fields added to
+		the point store at once.
+
+		args:
+			- rows: list of rows of data to add
+		"""
+
+		existing = set(self.assets)
+		added = set()
+		for row in rows:
+			asset_name = row['assetname']
+			field_name = row['standardfieldname']
+			if asset_name not in self.assets:
+				self.add_asset(row['building'],row['generaltype'],row['typename'],asset_name)
+			assert (asset_name,field_name) not in added, "Field {} already set.".format(field_name)
+			assert asset_name not in existing or self.assets[asset_name]._find(field_name) is None, \
+				"Field {} already set.".format(field_name)
+			added.add((asset_name,field_name))
+
+		columns = {column:[row[key] for row in rows] for column, key in _POINT_DATA_KEYS.items()}
+		columns['bms_type'] = ['ALC'] * len(rows)
+		for row, point in zip(rows,self._points.extend(columns)):
+			asset = self.assets[row['assetname']]
+			asset._rows.append(point)
+			asset._fieldset_id = None
+
+	def load_from_table(self,table):
+		"""
+		Load from a loadsheet table, as load_from_data does from its rows: the required rows are added to
+		the point store in one pass per column, and the assets created once per assetname. The table is
+		read when loaded: later edits of it do not change the assets or the unused rows.
+
+		args:
+			- table: dataframe of loadsheet data, one column per standardized (lower case) header
+		"""
+
+		required = (table['required'] == 'YES').to_numpy()
+		if not required.all():
+			# Copied (take), so later edits of the loadsheet table do not change the unused rows
+			self._unused_tables.append(table.take(np.flatnonzero(~required)))
+		rows = table[required]
+
+		# Each (assetname, standardfieldname) pair once, also with the fields of existing assets
+		duplicated = rows.duplicated(['assetname','standardfieldname'],keep=False).to_numpy()
+		if self.assets:
+			for i, (asset_name, field_name) in enumerate(zip(rows['assetname'],rows['standardfieldname'])):
+				if asset_name in self.assets and self.assets[asset_name]._find(field_name) is not None:
+					duplicated[i] = True
+		assert not duplicated.any(), "Field {} already set.".format(rows['standardfieldname'].to_numpy()[duplicated.argmax()])
+
+		# Assets take the building, generaltype and typename of their first row
+		asset_codes, asset_names = pd.factorize(rows['assetname'].to_numpy(dtype=object),use_na_sentinel=False)
+		first = np.unique(asset_codes,return_index=True)[1]
+		for asset_name, building, general_type, type_name in zip(asset_names,
+				rows['building'].to_numpy(dtype=object)[first],
+				rows['generaltype'].to_numpy(dtype=object)[first],
+				rows['typename'].to_numpy(dtype=object)[first]):
+			if asset_name not in self.assets:
+				self.add_asset(building,general_type,type_name,asset_name)
+
+		columns = {column:rows[key].tolist() for column, key in _POINT_DATA_KEYS.items()}
+		columns['bms_type'] = ['ALC'] * len(rows)
+		points = np.asarray(self._points.extend(columns))
+		order = np.argsort(asset_codes,kind='stable')
+		bounds = np.cumsum(np.bincount(asset_codes,minlength=len(asset_names)))
+		for asset_name, asset_points in zip(asset_names,np.split(points[order],bounds[:-1])):
+			asset = self.assets[asset_name]
+			asset._rows.frombytes(asset_points.astype(np.intc).tobytes())
+			asset._fieldset_id = None
+
+	def update_from_data(self,data,asset_names,drop_unused=None):
+		"""
+		Rebuild some of the assets from new data, keeping all other assets (and their
+		matches) as they are. Used to apply a loadsheet change set without a full rebuild.
+
+		args:
+			- data: all required rows of the rebuilt assets, and the unused rows that replace
+					the ones dropped by drop_unused
+			- asset_names: names of the assets to rebuild; the ones without rows in data are removed
+			- drop_unused: function of an unused row, True if it is to be dropped, default None
+
+		returns: set of rebuilt asset names
+		"""
+		for asset_name in asset_names:
+			if asset_name in self.assets:
+				self.remove_asset(asset_name)
+
+		if drop_unused is not None:
+			self.ununsed_data = [row for row in self.ununsed_data if not drop_unused(row)]
+
+		self.load_from_data(data)
+		return {asset_name for asset_name in asset_names if asset_name in self.assets}
 
 	def dump_to_data(self):
 		""" Dump the assets object into the original data format. Append any unused rows of data that were not applied
@@ -483,72 +797,68 @@ class Assets:
 		returns: dictionary of lists representing loadsheet data
 		"""
 		# TODO: Create loadsheet config object set
-		data = self.dump_all_assets()
 		out_data = []
-		for asset in data:
-			for field in data[asset]['fields']:
-				assetName = data[asset]['asset_name']
-				building = data[asset]['building']
-				generalType = data[asset]['general_type']
-				typeName = data[asset]['type_name']
-				standardFieldName = field
-				deviceId = data[asset]['fields'][field]['bacnet_address']['deviceid']
-				objectId = data[asset]['fields'][field]['bacnet_address']['objectid']
-				objectName = data[asset]['fields'][field]['bacnet_address']['objectname']
-				objectType = data[asset]['fields'][field]['bacnet_address']['objecttype']
-				units = data[asset]['fields'][field]['bacnet_address']['units']
-				location = data[asset]['fields'][field]['bms_info']['location']
-				controlProgram = data[asset]['fields'][field]['bms_info']['controlprogram']
-				manually_mapped = data[asset]['fields'][field]['manually_mapped']
-				is_missing = data[asset]['fields'][field]['is_missing']
-				name = data[asset]['fields'][field]['bms_info']['name']
-				path = data[asset]['fields'][field]['bms_info']['path']
-				ttype = data[asset]['fields'][field]['bms_info']['type']
-				row = {
-					'location':location,
-					'controlprogram':controlProgram,
-					'name':name,
-					'type':ttype,
-					'path':path,
-					'deviceid':deviceId,
-					'objecttype':objectType,
-					'objectid':objectId,
-					'objectname':objectName,
-					'units':units,
+		for asset in self.assets.values():
+			rows = asset._rows
+			columns = [self._points.column(column,rows) for column in _POINT_DATA_KEYS]
+			for values in zip(*columns):
+				row = dict(zip(_POINT_DATA_KEYS.values(),values))
+				row.update({
 					'required':'YES',
-					'manuallymapped':manually_mapped,
-					'ismissing': is_missing,
-					'building':building,
-					'generaltype':generalType,
-					'typename':typeName,
-					'assetname':assetName,
-					'standardfieldname':standardFieldName
-				}
-				out_data.append(row)
+					'building':asset.building,
+					'generaltype':asset.general_type,
+					'typename':asset.type_name,
+					'assetname':asset.asset_name
+				})
+				out_data.append({key:row[key] for key in _DUMP_KEYS})
 		if len(self.ununsed_data)>0:
 			for row in self.ununsed_data:
 				out_data.append(row)
 		return out_data
 
+	def dump_to_table(self):
+		""" Dump the assets into a loadsheet table, with the same rows as dump_to_data: one row per field,
+		written column by column from the point store, followed by the unused rows. Unused rows loaded by
+		load_from_table are taken as they were loaded, without converting them to rows of data.
+
+		returns: dataframe of loadsheet data, one column per standardized (lower case) header
+		"""
+		assets = list(self.assets.values())
+		points = np.frombuffer(b''.join(asset._rows.tobytes() for asset in assets),dtype=np.intc)
+		counts = [len(asset._rows) for asset in assets]
+
+		columns = {key:self._points.take(column,points) for column, key in _POINT_DATA_KEYS.items()}
+		columns['required'] = np.full(len(points),'YES',dtype=object)
+		for key, attribute in [('building','building'),('generaltype','general_type'),
+				('typename','type_name'),('assetname','asset_name')]:
+			values = np.empty(len(assets),dtype=object)
+			values[:] = [getattr(asset,attribute) for asset in assets]
+			columns[key] = np.repeat(values,counts)
+
+		tables = [pd.DataFrame({key:columns[key] for key in _DUMP_KEYS})]
+		if self._ununsed_data:
+			tables.append(pd.DataFrame.from_records(self._ununsed_data))
+		tables += self._unused_tables
+		return pd.concat(tables,ignore_index=True).infer_objects()
+
 	def determine_types(self):
 		"""
 		Use the unique fields for each asset to create a list of unique types.
 
-		returns: list of unique types
+		returns: dictionary of unique types by fieldset id (see Fieldsets)
 		"""
 
 		unique_types = {}
 
-		for asset in self.assets:
-			fields = self.get_fields(asset)
-			general_type = self.get_general_type(asset)
-			field_code = _convert_to_base64(fields)
+		for asset_name, asset in self.assets.items():
+			fieldset_id = asset.fieldset_id
 
-			if field_code not in unique_types:
-				unique_types[field_code] = {'general_type':general_type,'fields':fields,'assets':[asset]}
+			if fieldset_id not in unique_types:
+				fields = sorted(self.fieldsets.get(fieldset_id))
+				unique_types[fieldset_id] = {'general_type':asset.get_general_type(),'fields':fields,'assets':[asset_name]}
 
 			else:
-				unique_types[field_code]['assets'].append(asset)
+				unique_types[fieldset_id]['assets'].append(asset_name)
 
 		return unique_types
 
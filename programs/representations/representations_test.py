@@ -13,169 +13,105 @@
 #limitations under the License.
 
 import unittest as ut
+import pickle
+import math
+import pandas
 import representations as reps
-import csv
+import ontology.ontology
+
+
+_BMS_INFO = {'bms_type':'ALC', 'location':'l', 'controlprogram':'cP', 'name':'n', 'path':'p', 'type':'t'}
+_BACNET_ADDRESS = {'deviceid':'dID', 'objectid':'oID', 'objectname':'oN', 'objecttype':'oT', 'units':'u'}
+_FIELD_DETAILS = {'bms_info':_BMS_INFO, 'bacnet_address':_BACNET_ADDRESS, 'manually_mapped':'', 'is_missing':'NO'}
+
+
+def _point(field_name, **values):
+	point = {'field_name':field_name, 'manually_mapped':'', 'is_missing':'NO'}
+	point.update(_BMS_INFO)
+	point.update(_BACNET_ADDRESS)
+	point.update(values)
+	return point
+
+
+def _columns(count, **values):
+	columns = {column:[value] * count for column, value in _point('fN').items()}
+	columns['field_name'] = ['f{}'.format(i) for i in range(count)]
+	columns.update(values)
+	return columns
+
+_DUMP_COLUMNS = ('location', 'controlprogram', 'name', 'type', 'path', 'deviceid', 'objecttype', 'objectid',
+	'objectname', 'units', 'required', 'manuallymapped', 'ismissing', 'building', 'generaltype', 'typename',
+	'assetname', 'standardfieldname')
+
+
+def _row(asset_name, field_name, required='YES', **values):
+	row = {'location':'l', 'controlprogram':asset_name, 'name':field_name, 'type':'BAV', 'path':'#p/' + field_name,
+		'deviceid':'DEV:1', 'objecttype':'AV', 'objectid':len(field_name), 'objectname':field_name, 'units':'no-units',
+		'required':required, 'manuallymapped':None, 'ismissing':'NO', 'building':'bldg1', 'generaltype':'AHU',
+		'typename':'', 'assetname':asset_name, 'standardfieldname':field_name}
+	row.update(values)
+	return row
+
+
+def _rows():
+	return [_row('AHU-1', 'fA'), _row('AHU-2', 'fA', typename='AHU_2'), _row('AHU-1', 'fB'),
+		_row('AHU-1', 'fX', 'NO'), _row('AHU-2', 'fB', building='bldg2'), _row('AHU-3', 'fC', 'NO'), _row('AHU-3', 'fA')]
 
 
 class TestRepresentationsMethods(ut.TestCase):
 	def setUp(self):
-		self.asset = reps.Asset("bldg1", "gT", "", "asset1", "asset_path1")
-
-		self.field = reps.Field("fN",
-								 {"bms_type":"ALC",
-								  "location":"l",
-								  "controlProgram":"cP",
-								  "name":"n",
-								  "path":"p",
-								  "type":"t"},
-								 {"deviceId":"dID",
-								  "objectId":"oID",
-								  "objectName":"oN",
-								  "objectType":"oT",
-								  "units":"u"},
-								 "",
-								 False)
+		self.asset = reps.Asset("bldg1", "gT", "", "asset1")
+		self.field = reps.Field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
 		self.assets = reps.Assets()
 
 	"""Asset Tests"""
 	def test_add_field(self):
 		#add field to asset through method
-		self.asset.add_field("fN",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
+		self.asset.add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
 
 		dump = self.asset.dump()
 
 		expected = {'building': 'bldg1',
 					'general_type': 'gT',
 					'type_name': '',
-					'asset_name':
-					'asset1',
-					'full_asset_name': 'asset_path1',
-					'fields': {
-						'fN': {
-							'bms_info':
-								{'bms_type': 'ALC',
-								 'location': 'l',
-								 'controlProgram': 'cP',
-								 'name': 'n', 'path': 'p',
-								 'type': 't'},
-							'bacnet_address':
-							 	{'deviceId': 'dID',
-								 'objectId': 'oID',
-								 'objectName': 'oN',
-								 'objectType': 'oT',
-								 'units': 'u'
-								},
-							'manually_mapped': ''
-							}
-						}
+					'asset_name': 'asset1',
+					'full_asset_name': 'bldg1:gT:asset1',
+					'fields': {'fN': _FIELD_DETAILS}
 					}
 
 		self.assertEqual(dump, expected)
 
+		with self.assertRaises(AssertionError):
+			self.asset.add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
+
 	def test_update_field(self):
-		self.asset.add_field("fN",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
-		self.asset.update_field("fN",
-							 {"bms_type":"BLC",
-							  "location":"ll",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "")
-		dump = self.asset.dump()
+		self.asset.add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
+		bms_info = dict(_BMS_INFO, location='ll')
+		self.asset.update_field("fN", bms_info, _BACNET_ADDRESS, "", "NO")
 
-		expected = {'building': 'bldg1',
-					'general_type': 'gT',
-					'type_name': '',
-					'asset_name':
-					'asset1',
-					'full_asset_name': 'asset_path1',
-					'fields': {
-						'fN': {
-							'bms_info':
-								{'bms_type': 'BLC',
-								 'location': 'll',
-								 'controlProgram': 'cP',
-								 'name': 'n', 'path': 'p',
-								 'type': 't'},
-							'bacnet_address':
-							 	{'deviceId': 'dID',
-								 'objectId': 'oID',
-								 'objectName': 'oN',
-								 'objectType': 'oT',
-								 'units': 'u'
-								},
-							'manually_mapped': ''
-							}
-						}
-					}
-		self.assertEqual(dump, expected)
+		self.assertEqual(dict(_FIELD_DETAILS, bms_info=bms_info), self.asset.get_field_details("fN"))
 
 		with self.assertRaises(AssertionError):
-			self.asset.update_field("fNN",
-								 {"bms_type":"BLC",
-								  "location":"ll",
-								  "controlProgram":"cP",
-								  "name":"n",
-								  "path":"p",
-								  "type":"t"},
-								 {"deviceId":"dID",
-								  "objectId":"oID",
-								  "objectName":"oN",
-								  "objectType":"oT",
-								  "units":"u"},
-								 "")
+			self.asset.update_field("fNN", bms_info, _BACNET_ADDRESS, "")
+
+	def test_update_field_order(self):
+		#an updated field moves to the end of the fields, as it is removed and added again
+		for field_name in ["fA", "fB", "fC"]:
+			self.asset.add_field(field_name, _BMS_INFO, _BACNET_ADDRESS, "")
+		fieldset_id = self.asset.fieldset_id
+		self.asset.update_field("fA", dict(_BMS_INFO, name='nn'), _BACNET_ADDRESS, "")
+
+		self.assertEqual(["fB", "fC", "fA"], self.asset.get_fields())
+		self.assertEqual(["fB", "fC", "fA"], list(self.asset.fields))
+		self.assertEqual('nn', self.asset.fields["fA"].bms_info['name'])
+		self.assertEqual(fieldset_id, self.asset.fieldset_id)
 
 	def test_update_type(self):
 		self.asset.update_type("new_type")
 		self.assertEqual("new_type", self.asset.type_name)
 
 	def test_remove_field(self):
-		self.asset.add_field("fN",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
+		self.asset.add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
 
 		with self.assertRaises(AssertionError):
 				self.asset.remove_field("fNN")
@@ -183,36 +119,120 @@ class TestRepresentationsMethods(ut.TestCase):
 		self.asset.remove_field("fN")
 
 		dump = self.asset.dump()
-		expected = {'building': 'bldg1', 'general_type': 'gT', 'type_name': '', 'asset_name': 'asset1', 'full_asset_name': 'asset_path1', 'fields': {}}
+		expected = {'building': 'bldg1', 'general_type': 'gT', 'type_name': '', 'asset_name': 'asset1', 'full_asset_name': 'bldg1:gT:asset1', 'fields': {}}
 
 		self.assertEqual(expected, dump)
 
+	def test_apply_match(self):
+		#a match sets the type name and adds placeholders for the missing required fields
+		self.asset.add_field("fA", _BMS_INFO, _BACNET_ADDRESS, "")
+		self.asset.apply_match()
+		self.assertEqual(["fA"], self.asset.get_fields())
+
+		match = ontology.ontology.Match()
+		match.set_ont_type_name("AHU_1")
+		match.set_ont_type_fields([("fA", True), ("fB", True), ("fC", False), ("fD", True)])
+		self.asset.add_match(match)
+		self.asset.apply_match()
+
+		self.assertEqual("AHU_1", self.asset.type_name)
+		self.assertEqual(["fA", "fB", "fD"], self.asset.get_fields())
+		self.assertEqual(_FIELD_DETAILS, self.asset.get_field_details("fA"))
+		placeholder = self.asset.get_field_details("fB")
+		self.assertEqual({'bms_type':'', 'location':'', 'controlprogram':'', 'name':'Placeholder', 'path':'x', 'type':'x'},
+			placeholder['bms_info'])
+		self.assertEqual({'deviceid':'', 'objectid':10000, 'objectname':'x', 'objecttype':'x', 'units':''},
+			placeholder['bacnet_address'])
+		self.assertEqual('YES', placeholder['is_missing'])
+		self.assertEqual(10001, self.asset.get_field_details("fD")['bacnet_address']['objectid'])
+
+		#applying it again adds nothing
+		self.asset.apply_match()
+		self.assertEqual(["fA", "fB", "fD"], self.asset.get_fields())
+
 	"""Field Tests"""
 	def test_get_field_details(self):
 		details = self.field.get_field_details()
-		expected = {"bms_info":{"bms_type":"ALC",
-					 "location":"l",
-					 "controlProgram":"cP",
-					 "name":"n",
-					 "path":"p",
-					 "type":"t"},
-					"bacnet_address":{"deviceId":"dID",
-					 "objectId":"oID",
-					 "objectName":"oN",
-					 "objectType":"oT",
-					 "units":"u"},
-					"manually_mapped":""}
+		self.assertEqual(_FIELD_DETAILS, details)
+		self.assertEqual("fN", self.field.field_name)
 
-		self.assertEqual(expected, details)
+		with self.assertRaises(AssertionError):
+			reps.Field("fN", {'bms_type':'ALC', 'location':'l'}, _BACNET_ADDRESS)
+
+	def test_field_view(self):
+		#the fields of an asset are views of its rows of the point store
+		self.asset.add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
+		field = self.asset.fields["fN"]
+		self.assertIs(self.asset._points, field._points)
+		self.assertEqual(_FIELD_DETAILS, field.get_field_details())
 
 	def test_add_placeholder_field(self):
-		placeholder_field = reps.Field("","","","",True)
+		placeholder_field = reps.Field("fN", "", "", "", "YES", True)
 		details = placeholder_field.get_field_details()
-		expected = {"bms_info":{'bms_type':"",'location':'', 'controlProgram':'', 'name':'Placeholder', 'path':'', 'type':''},
-					"bacnet_address":{'deviceId':'', 'objectId':'', 'objectName':'Placeholder', 'objectType':'', 'units':''},
-					"manually_mapped":""}
+		expected = {"bms_info":dict.fromkeys(_BMS_INFO),
+					"bacnet_address":dict.fromkeys(_BACNET_ADDRESS),
+					"manually_mapped":"", "is_missing":"YES"}
 		self.assertEqual(expected, details)
 
+	"""Point store tests"""
+	def test_points_encoding(self):
+		#values are coded once per distinct value, told apart by type, with one code for all NaNs
+		points = reps._Points()
+		values = [1, 1.0, 1, float('nan'), float('nan'), '1', None, True]
+		rows = points.extend(_columns(len(values), objectid=values))
+
+		self.assertEqual(range(0, 8), rows)
+		self.assertEqual(8, len(points))
+		stored = points.column('objectid', rows)
+		self.assertEqual([int, float, int, float, float, str, type(None), bool], [type(value) for value in stored])
+		self.assertTrue(math.isnan(stored[3]) and math.isnan(stored[4]))
+		self.assertEqual([0, 1, 0, 2, 2, 3, 4, 5], list(points._codes['objectid']))
+		self.assertEqual(1, len(points._values['location']))
+		#plain columns keep a value per point
+		self.assertEqual(8, len(points._values['path']))
+
+		self.assertEqual(1, points.find(rows, 'objectid', 1.0))
+		self.assertEqual(3, points.find(rows, 'objectid', float('nan')))
+		self.assertEqual(7, points.find(rows, 'objectid', True))
+		self.assertIsNone(points.find(rows, 'objectid', 2))
+		self.assertEqual([1.0, '1'], points.take('objectid', [1, 5]).tolist())
+
+		#values of a single type besides text are coded as they are
+		row = points.append(_point('fX', objectid='1'))
+		self.assertEqual(3, points._codes['objectid'][row])
+		points.extend(_columns(2, objectid=[2, 2]))
+		self.assertEqual([6, 6], list(points._codes['objectid'])[-2:])
+
+	def test_points_pickle(self):
+		#the value lookups are rebuilt when a point store is loaded
+		points = reps._Points()
+		for i, objectid in enumerate([1, 1.0, float('nan'), 'x']):
+			points.append(_point('f{}'.format(i), objectid=objectid))
+		loaded = pickle.loads(pickle.dumps(points))
+
+		self.assertNotIn('_lookup', points.__getstate__())
+		self.assertEqual(points._lookup, loaded._lookup)
+		self.assertEqual(points.column('field_name', range(4)), loaded.column('field_name', range(4)))
+		self.assertEqual(2, loaded.find(range(4), 'objectid', float('nan')))
+		self.assertEqual(1, loaded.find(range(4), 'objectid', 1.0))
+		row = loaded.append(_point('f4', objectid=1.0))
+		self.assertEqual(1, loaded._codes['objectid'][row])
+		self.assertEqual(4, len(loaded._values['objectid']))
+
+	def test_assets_pickle(self):
+		#assets keep sharing their point store and fieldsets when loaded
+		self.assets.add_asset("bldg1", "gT", "", "asset1")
+		self.assets.add_asset("bldg1", "gT", "", "asset2")
+		self.assets.add_field("asset1", "fN", _BMS_INFO, _BACNET_ADDRESS)
+		loaded = pickle.loads(pickle.dumps(self.assets))
+
+		self.assertEqual(self.assets.dump_to_data(), loaded.dump_to_data())
+		self.assertIs(loaded._points, loaded.assets['asset1']._points)
+		self.assertIs(loaded._points, loaded.assets['asset2']._points)
+		loaded.add_field("asset2", "fN", _BMS_INFO, _BACNET_ADDRESS)
+		self.assertEqual(dict(_FIELD_DETAILS, manually_mapped=False), loaded.assets['asset2'].get_field_details("fN"))
+		self.assertEqual(["fN"], loaded.get_fields("asset1"))
+
 	"""Assets tests"""
 	'''
 	update type, add field, remove field, get_general_type
@@ -221,119 +241,39 @@ class TestRepresentationsMethods(ut.TestCase):
 	'''
 	def test_add_asset(self):
 		#adding asset and checking dump
-		self.assets.add_asset("bldg1", "gT", "", "asset1", "asset_path1")
-		self.assets.assets['asset_path1'].add_field("fN",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
+		self.assets.add_asset("bldg1", "gT", "", "asset1")
+		self.assets.assets['asset1'].add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
 
 		dump = self.assets.dump_to_data()
-		expected  =[{'location': 'l', 'controlProgram': 'cP', 'name': 'n', 'type': 't',
-					'path': 'p', 'deviceId': 'dID', 'objectType': 'oT', 'objectId': 'oID',
-					'objectName': 'oN', 'units': 'u', 'required': 'YES', 'manuallyMapped': '','isMissing': 'NO'
-					'building': 'bldg1', 'generalType': 'gT', 'typeName': '',
-					'assetName': 'asset1', 'standardFieldName': 'fN'}]
+		expected  =[{'location': 'l', 'controlprogram': 'cP', 'name': 'n', 'type': 't',
+					'path': 'p', 'deviceid': 'dID', 'objecttype': 'oT', 'objectid': 'oID',
+					'objectname': 'oN', 'units': 'u', 'required': 'YES', 'manuallymapped': '', 'ismissing': 'NO',
+					'building': 'bldg1', 'generaltype': 'gT', 'typename': '',
+					'assetname': 'asset1', 'standardfieldname': 'fN'}]
 
 		self.assertEqual(expected, dump)
 
 		with self.assertRaises(AssertionError):
-			self.assets.add_asset("bldg1", "gT", "", "asset1", "asset_path1")
+			self.assets.add_asset("bldg1", "gT", "", "asset1")
 
 	def test_remove_asset(self):
-		self.assets.add_asset("bldg1", "gT", "", "asset1", "asset_path1")
-		self.assets.assets['asset_path1'].add_field("fN",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
+		self.assets.add_asset("bldg1", "gT", "", "asset1")
+		self.assets.assets['asset1'].add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
 
 		with self.assertRaises(AssertionError):
-			self.assets.remove_asset("asset_path2")
+			self.assets.remove_asset("asset2")
 
-		self.assets.remove_asset("asset_path1")
+		self.assets.remove_asset("asset1")
 		self.assertEqual([], self.assets.dump_to_data())
 
 	def test_get_all_asset_fields(self):
-		self.assets.add_asset("bldg1", "gT", "", "asset1", "asset_path1")
-		self.assets.assets['asset_path1'].add_field("fN",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
-		self.assets.assets['asset_path1'].add_field("fN2a",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
-
-
-		self.assets.add_asset("bldg2", "gT", "", "asset2", "asset_path2")
-		self.assets.assets['asset_path2'].add_field("fN",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
-		self.assets.assets['asset_path2'].add_field("fN2",
-							 {"bms_type":"ALC",
-							  "location":"l",
-							  "controlProgram":"cP",
-							  "name":"n",
-							  "path":"p",
-							  "type":"t"},
-							 {"deviceId":"dID",
-							  "objectId":"oID",
-							  "objectName":"oN",
-							  "objectType":"oT",
-							  "units":"u"},
-							 "",
-							 False)
+		self.assets.add_asset("bldg1", "gT", "", "asset1")
+		self.assets.assets['asset1'].add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
+		self.assets.assets['asset1'].add_field("fN2a", _BMS_INFO, _BACNET_ADDRESS, "")
 
+		self.assets.add_asset("bldg2", "gT", "", "asset2")
+		self.assets.assets['asset2'].add_field("fN", _BMS_INFO, _BACNET_ADDRESS, "")
+		self.assets.assets['asset2'].add_field("fN2", _BMS_INFO, _BACNET_ADDRESS, "")
 
 		fields = self.assets.get_all_asset_fields()
 		expected = {'fN2', 'fN2a', 'fN'}
@@ -341,10 +281,10 @@ class TestRepresentationsMethods(ut.TestCase):
 		self.assertEqual(expected, fields)
 
 	def test_get_general_types(self):
-		self.assets.add_asset("bldg1", "gT1", "", "asset1", "asset_path1")
-		self.assets.add_asset("bldg2", "gT2", "", "asset2", "asset_path2")
-		self.assets.add_asset("bldg3", "gT2", "", "asset3", "asset_path3")
-		self.assets.add_asset("bldg4", "gT3", "", "asset4", "asset_path4")
+		self.assets.add_asset("bldg1", "gT1", "", "asset1")
+		self.assets.add_asset("bldg2", "gT2", "", "asset2")
+		self.assets.add_asset("bldg3", "gT2", "", "asset3")
+		self.assets.add_asset("bldg4", "gT3", "", "asset4")
 
 		res = self.assets.get_general_types()
 		expected = {'gT1', 'gT2', 'gT3'}
@@ -352,5 +292,217 @@ class TestRepresentationsMethods(ut.TestCase):
 		self.assertEqual(expected, res)
 
 
+class TestLoadFromTable(ut.TestCase):
+	def assertSameAssets(self, expected, assets):
+		self.assertEqual(list(expected.assets), list(assets.assets))
+		for asset_name, asset in expected.assets.items():
+			self.assertEqual(asset.dump(), assets.assets[asset_name].dump())
+		self.assertEqual(expected.dump_to_data(), assets.dump_to_data())
+
+	def _load(self, rows, table=None):
+		from_data = reps.Assets()
+		from_data.load_from_data([dict(row) for row in rows])
+		from_table = reps.Assets()
+		from_table.load_from_table(pandas.DataFrame(rows) if table is None else table)
+		return from_data, from_table
+
+	def test_same_as_data(self):
+		#the assets, their fields and the dump are the same as loaded row by row
+		from_data, from_table = self._load(_rows())
+		self.assertSameAssets(from_data, from_table)
+		self.assertEqual(['fA', 'fB'], from_table.get_fields('AHU-1'))
+		#assets take the building and typename of their first row
+		self.assertEqual(('bldg1', 'AHU_2'), (from_table.assets['AHU-2'].building, from_table.assets['AHU-2'].type_name))
+		self.assertEqual(['fX', 'fC'], [row['standardfieldname'] for row in from_table.ununsed_data])
+
+	def test_existing_assets(self):
+		#loading more rows adds their fields to the assets already loaded
+		rows = _rows()
+		from_data, from_table = self._load(rows[:3])
+		more = [_row('AHU-1', 'fD'), _row('AHU-4', 'fA'), _row('AHU-2', 'fX', 'NO')]
+		from_data.load_from_data(more)
+		from_table.load_from_table(pandas.DataFrame(more))
+		self.assertSameAssets(from_data, from_table)
+		self.assertEqual(['fA', 'fB', 'fD'], from_table.get_fields('AHU-1'))
+
+	def test_duplicate_fields(self):
+		#a field is set once per asset, in the table and with the assets already loaded
+		rows = _rows() + [_row('AHU-1', 'fA', name='other')]
+		with self.assertRaises(AssertionError):
+			reps.Assets().load_from_data(rows)
+		with self.assertRaises(AssertionError):
+			reps.Assets().load_from_table(pandas.DataFrame(rows))
+
+		#rows that are not required are not fields
+		from_data, from_table = self._load(_rows() + [_row('AHU-1', 'fA', 'NO')])
+		self.assertSameAssets(from_data, from_table)
+
+		from_data, from_table = self._load(_rows())
+		with self.assertRaises(AssertionError):
+			from_data.load_from_data([_row('AHU-5', 'fA'), _row('AHU-2', 'fB')])
+		with self.assertRaises(AssertionError):
+			from_table.load_from_table(pandas.DataFrame([_row('AHU-5', 'fA'), _row('AHU-2', 'fB')]))
+
+	def test_no_required_rows(self):
+		#a table without required rows adds no assets, only unused rows
+		rows = [row for row in _rows() if row['required'] != 'YES']
+		from_data, from_table = self._load(rows)
+		self.assertEqual({}, from_table.assets)
+		self.assertSameAssets(from_data, from_table)
+		self.assertEqual(rows, from_table.dump_to_data())
+
+	def test_categorical_table(self):
+		#categorical columns, as read from a loadsheet file, load the same as text
+		rows = _rows()
+		table = pandas.DataFrame(rows)
+		for column in ['required', 'assetname', 'building', 'generaltype']:
+			table[column] = table[column].astype('category')
+		from_data, from_table = self._load(rows, table)
+		self.assertSameAssets(from_data, from_table)
+
+		#a required column without YES among its categories has no required rows
+		table['required'] = pandas.Categorical(['NO'] * len(rows))
+		assets = reps.Assets()
+		assets.load_from_table(table)
+		self.assertEqual({}, assets.assets)
+		self.assertEqual(len(rows), len(assets.ununsed_data))
+
+
+class TestDumpToTable(ut.TestCase):
+	def assertDumpsEqual(self, assets):
+		#compared before and after dump_to_data converts the unused rows of tables to rows of data
+		table = assets.dump_to_table()
+		expected = pandas.DataFrame(assets.dump_to_data())
+		pandas.testing.assert_frame_equal(expected, table)
+		pandas.testing.assert_frame_equal(expected, assets.dump_to_table())
+		return table
+
+	def test_same_as_data(self):
+		#the table has the rows of dump_to_data, in order: fields by asset, then unused rows
+		assets = reps.Assets()
+		assets.load_from_table(pandas.DataFrame(_rows()))
+		table = self.assertDumpsEqual(assets)
+		self.assertEqual(['AHU-1', 'AHU-1', 'AHU-2', 'AHU-2', 'AHU-3', 'AHU-1', 'AHU-3'], table['assetname'].tolist())
+		self.assertEqual(list(_DUMP_COLUMNS), list(table.columns))
+
+		assets.remove_field('AHU-1', 'fA')
+		assets.update_type('AHU-2', 'AHU_X')
+		self.assertEqual('AHU_X', self.assertDumpsEqual(assets)['typename'][1])
+
+	def test_mixed_unused_rows(self):
+		#unused rows of data and of tables are dumped in the order they were loaded
+		rows = _rows() + [_row('AHU-4', 'fY', 'NO'), _row('AHU-4', 'fA')]
+		assets = reps.Assets()
+		assets.load_from_data(rows[:4])
+		assets.load_from_table(pandas.DataFrame(rows[4:7]))
+		assets.load_from_table(pandas.DataFrame(rows[7:]))
+		self.assertEqual(1, len(assets._ununsed_data))
+		self.assertEqual(2, len(assets._unused_tables))
+		table = self.assertDumpsEqual(assets)
+		self.assertEqual(['fX', 'fC', 'fY'], table['standardfieldname'][-3:].tolist())
+
+		#rows loaded after the unused rows of tables were converted
+		assets.load_from_data([_row('AHU-5', 'fZ', 'NO')])
+		assets.load_from_table(pandas.DataFrame([_row('AHU-5', 'fW', 'NO')]))
+		table = self.assertDumpsEqual(assets)
+		self.assertEqual(['fX', 'fC', 'fY', 'fZ', 'fW'], table['standardfieldname'][-5:].tolist())
+
+	def test_categorical_table(self):
+		table = pandas.DataFrame(_rows())
+		for column in ['required', 'assetname', 'location']:
+			table[column] = table[column].astype('category')
+		assets = reps.Assets()
+		assets.load_from_table(table)
+		self.assertDumpsEqual(assets)
+
+	def test_source_table_edits(self):
+		#the assets and unused rows are those of the table as loaded, not as edited after
+		source = pandas.DataFrame(_rows())
+		assets = reps.Assets()
+		assets.load_from_table(source)
+		expected = assets.dump_to_table()
+
+		source.loc[0, 'name'] = 'edited'
+		source.loc[3, 'name'] = 'edited'
+		source.loc[5, 'required'] = 'YES'
+		source['extra'] = 'x'
+		pandas.testing.assert_frame_equal(expected, assets.dump_to_table())
+		self.assertEqual([('fX', 'NO'), ('fC', 'NO')],
+			[(row['name'], row['required']) for row in assets.ununsed_data])
+		pandas.testing.assert_frame_equal(expected, assets.dump_to_table())
+
+
+class TestFieldsets(ut.TestCase):
+	def setUp(self):
+		self.assets = reps.Assets()
+		self.assets.load_from_data(_rows())
+
+	def test_intern(self):
+		#each distinct set of fields gets the next id, whatever the order of its fields
+		fieldsets = reps.Fieldsets()
+		self.assertEqual(0, fieldsets.intern(['fA', 'fB']))
+		self.assertEqual(1, fieldsets.intern(['fA']))
+		self.assertEqual(0, fieldsets.intern(('fB', 'fA', 'fA')))
+		self.assertEqual(frozenset(['fA', 'fB']), fieldsets.get(0))
+		self.assertEqual(2, len(fieldsets))
+
+	def test_fieldset_id_changes(self):
+		#the id follows the fields of the asset as they are added, removed and updated
+		asset = self.assets.assets['AHU-1']
+		self.assertEqual(self.assets.assets['AHU-2'].fieldset_id, asset.fieldset_id)
+		fieldset_id = asset.fieldset_id
+
+		asset.add_field('fC', _BMS_INFO, _BACNET_ADDRESS)
+		self.assertNotEqual(fieldset_id, asset.fieldset_id)
+		self.assertEqual(frozenset(['fA', 'fB', 'fC']), self.assets.fieldsets.get(asset.fieldset_id))
+		asset.update_field('fC', _BMS_INFO, _BACNET_ADDRESS)
+		self.assertEqual(frozenset(['fA', 'fB', 'fC']), self.assets.fieldsets.get(asset.fieldset_id))
+		asset.remove_field('fC')
+		self.assertEqual(fieldset_id, asset.fieldset_id)
+
+		#loading rows into existing assets
+		self.assets.load_from_row(_row('AHU-1', 'fD'))
+		self.assertEqual(frozenset(['fA', 'fB', 'fD']), self.assets.fieldsets.get(asset.fieldset_id))
+		self.assets.load_from_table(pandas.DataFrame([_row('AHU-2', 'fD'), _row('AHU-3', 'fB')]))
+		self.assertEqual(asset.fieldset_id, self.assets.assets['AHU-2'].fieldset_id)
+		self.assertEqual(fieldset_id, self.assets.assets['AHU-3'].fieldset_id)
+
+		#placeholders added by a match
+		match = ontology.ontology.Match()
+		match.set_ont_type_fields([('fA', True), ('fE', True)])
+		asset.add_match(match)
+		asset.apply_match()
+		self.assertEqual(frozenset(['fA', 'fB', 'fD', 'fE']), self.assets.fieldsets.get(asset.fieldset_id))
+
+	def test_pickle(self):
+		#fieldset ids stay the same when the assets are saved and loaded, as in a session
+		ids = {asset_name: asset.fieldset_id for asset_name, asset in self.assets.assets.items()}
+		loaded = pickle.loads(pickle.dumps(self.assets))
+
+		self.assertEqual(ids, {asset_name: asset.fieldset_id for asset_name, asset in loaded.assets.items()})
+		self.assertIs(loaded.fieldsets, loaded.assets['AHU-1']._fieldsets)
+		loaded.add_asset('bldg1', 'AHU', '', 'AHU-4')
+		loaded.add_field('AHU-4', 'fB', _BMS_INFO, _BACNET_ADDRESS)
+		loaded.add_field('AHU-4', 'fA', _BMS_INFO, _BACNET_ADDRESS)
+		self.assertEqual(ids['AHU-1'], loaded.assets['AHU-4'].fieldset_id)
+		loaded.add_field('AHU-4', 'fC', _BMS_INFO, _BACNET_ADDRESS)
+		self.assertEqual(len(self.assets.fieldsets), loaded.assets['AHU-4'].fieldset_id)
+
+	def test_determine_types(self):
+		#assets are grouped by their sorted fields
+		self.assets.load_from_data([_row('AHU-4', 'fB'), _row('AHU-4', 'fA'), _row('AHU-5', 'fA', generaltype='FCU')])
+		expected = {}
+		for asset_name, asset in self.assets.assets.items():
+			fields = tuple(sorted(asset.get_fields()))
+			expected.setdefault(fields, {'general_type':asset.general_type, 'fields':list(fields), 'assets':[]})
+			expected[fields]['assets'].append(asset_name)
+
+		types = self.assets.determine_types()
+		self.assertEqual(sorted(expected.values(), key=str), sorted(types.values(), key=str))
+		self.assertEqual(['AHU-1', 'AHU-2', 'AHU-4'], types[self.assets.assets['AHU-1'].fieldset_id]['assets'])
+		#the fields of the assets keep their order
+		self.assertEqual(['fB', 'fA'], self.assets.get_fields('AHU-4'))
+
+
 if __name__ == '__main__':
     ut.main()
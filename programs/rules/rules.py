@@ -27,8 +27,123 @@ content of the message. A rule consists of several basic components:
 
 import logging
 import csv, json, re, datetime, os
+import hashlib
+import collections
 import math
 import string
+import bisect
+
+# Marker for a field that is absent from a row (distinct from None/NaN values).
+MISSING = object()
+
+
+### Prepared values.
+# Rules never test raw cell values: every value a pattern runs on is prepared
+# once (NaN/None -> '', str, lowercased for case-insensitive rulesets) and
+# patterns of case-insensitive rulesets are compiled lowercased, so matching
+# needs neither re.IGNORECASE nor per-rule conversions. Only ASCII values are
+# lowercased; anything else keeps its case and is matched with re.IGNORECASE.
+
+def PrepareValue(value,fold):
+	"""
+	Value of a field as the rule patterns see it.
+
+	args:
+		- value: raw field value
+		- fold: lowercase the value (for case-insensitive rulesets)
+
+	returns: prepared string
+	"""
+	if value is None or value != value:
+		#to catch NaN, we check if the value equals itself
+		return ''
+	value = str(value)
+	if fold and value.isascii():
+		return value.lower()
+	return value
+
+# inline flag groups such as (?-i:...) change how a pattern treats case
+_FLAG_GROUP = re.compile(r'\(\?[aiLmsux-]')
+
+def _FoldPattern(pattern):
+	"""
+	Lowercased pattern that matches lowercased ASCII text exactly like the
+	pattern does with re.IGNORECASE on the original text, or None when the
+	pattern cannot be folded safely (escapes that spell characters by code,
+	inline flags, character ranges spanning letters of both cases, ...).
+	"""
+	if not pattern.isascii() or _FLAG_GROUP.search(pattern):
+		return None
+	out = []
+	inClass = False
+	i = 0
+	while i < len(pattern):
+		c = pattern[i]
+		if c == '\\':
+			escaped = pattern[i+1:i+2]
+			if escaped.isdigit() or escaped in ('x','u','U','N'):
+				return None
+			if inClass and pattern[i+2:i+3] == '-' and pattern[i+3:i+4] not in ('',']'):
+				return None
+			#escapes keep their case (\D is not \d)
+			out.append(pattern[i:i+2])
+			i += 2
+			continue
+		if inClass:
+			if c == ']' and not classStart:
+				inClass = False
+			elif pattern[i+1:i+2] == '-' and pattern[i+2:i+3] not in ('',']'):
+				lo, hi = c, pattern[i+2]
+				if hi == '\\':
+					return None
+				span = [chr(x) for x in range(ord(lo),ord(hi)+1)]
+				if not (lo.isupper() and hi.isupper() or lo.islower() and hi.islower()
+						or not any(ch.isalpha() for ch in span)):
+					return None
+				out.append(pattern[i:i+3].lower())
+				i += 3
+				classStart = False
+				continue
+			classStart = classStart and c == '^'
+		elif c == '[':
+			inClass = True
+			classStart = True
+			out.append(c)
+			i += 1
+			continue
+		out.append(c.lower())
+		i += 1
+	try:
+		return re.compile(''.join(out))
+	except re.error:
+		return None
+
+def _Searcher(pattern,caseSensitive):
+	"""
+	Search functions of a rule or filter pattern over prepared values: the
+	first for ASCII values, the second for any other value.
+
+	returns: tuple of two functions of a prepared value returning a match object or None
+	"""
+	if caseSensitive:
+		search = re.compile(pattern).search
+		return (search,search)
+	ignoreCase = re.compile(pattern,re.IGNORECASE).search
+	folded = _FoldPattern(pattern)
+	return (ignoreCase if folded is None else folded.search, ignoreCase)
+
+class _FoldedMatch:
+	""" Match on a lowercased value whose groups read from the original text. """
+
+	def __init__(self,matches,original):
+		self.matches = matches
+		self.string = original
+
+	def group(self,index=0):
+		start, end = self.matches.span(index)
+		if start < 0:
+			return None
+		return self.string[start:end]
 
 
 class Rule:
@@ -48,6 +163,7 @@ class Rule:
 		"""
 		assert caseSensitive in (True,False), "Not a valid case sensitivity flag (only True or False)"
 		self.caseSensitive = caseSensitive
+		self.signature = self._to_signature(ruleJson,caseSensitive)
 		self.ruleName = ruleJson['ruleName']
 		#print(self.ruleName)
 		self.ruleField = self._to_std_header(ruleJson['ruleField'])
@@ -58,6 +174,7 @@ class Rule:
 				self.rulePattern = re.compile(ruleJson.get('rulePattern',''))
 			else:
 				self.rulePattern = re.compile(ruleJson.get('rulePattern',''),re.IGNORECASE)
+			self._ruleSearch = _Searcher(ruleJson.get('rulePattern',''),self.caseSensitive)
 
 		outs = {}
 		for k in ruleJson['outputs']:
@@ -76,6 +193,7 @@ class Rule:
 				self.filterPattern = [re.compile(self.filters[key][1]) for key in self.filterField]
 			else:
 				self.filterPattern = [re.compile(self.filters[key][1],re.IGNORECASE) for key in self.filterField]
+			self._filterSearch = [_Searcher(self.filters[key][1],self.caseSensitive) for key in self.filterField]
 
 			#lowercasing the column names to match the standard field headers
 			self.filterField = [self._to_std_header(key) for key in self.filterField]
@@ -84,9 +202,27 @@ class Rule:
 			self.filterField = []
 			self.filterType = []
 			self.filterPattern = []
+			self._filterSearch = []
 
 		# Create a log list for the application of the rule.
 		self.log = []
+		# Filter check order used by Evaluate, built on first use.
+		self._checkOrder = None
+
+	@staticmethod
+	def _to_signature(ruleJson,caseSensitive):
+		""" Stable content hash of a rule definition; two rules with the same
+		signature always produce the same outputs for the same row. """
+		payload = json.dumps([ruleJson,caseSensitive],sort_keys=True,default=str)
+		return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+	def GetReadFields(self):
+		""" Standardized names of the fields the rule reads (rule and filter fields). """
+		return [self.ruleField] + list(self.filterField)
+
+	def GetOutputFields(self):
+		""" Standardized names of the fields the rule writes. """
+		return list(self.outputs.keys())
 
 	def _to_std_header(self, header):
 		delete_dict = {sp_char: '' for sp_char in string.punctuation}
@@ -99,87 +235,95 @@ class Rule:
 		""" Reset the logging messages. """
 		self.log = []
 
-	def Apply(self,dataJson):
+	def Apply(self,dataJson,prepared=None):
 		""" 
 		Apply the whole chain of rule components to the passed data dictionary.
 
 		args:
 			- dataJson: loadsheet data in the dictionary of lists format
+			- prepared: dictionary of the row's read fields as prepared by
+						Rules.PrepareValue, kept up to date with the outputs
+						written; built from dataJson if not given
+
+		returns: True if the rule fired (its outputs were written), else False
 		"""
 		self.log.append(f'[INFO] Applying Rule "{self.ruleName}"')
 		self._ResetMsg()
-		self.ApplyFilter(dataJson)
+		if prepared is None:
+			prepared = {field: PrepareValue(dataJson[field],not self.caseSensitive)
+						for field in self.GetReadFields() if field in dataJson}
+		return self.ApplyFilter(dataJson,prepared)
 		#[print(msg) for msg in self.log] #Note: replacing print to command with printing everything to a log
 
-	def ApplyFilter(self,dataJson):
+	def ApplyFilter(self,dataJson,prepared):
 		""" Determine if the filter applies. If it does keep going.
 		Log the filter details (whether there is one to apply)
 
 		args:
 			- dataJson: the data we're running the filters over
+			- prepared: prepared values of the row's read fields
 		"""
 
-		for fF, fP, fT in zip(self.filterField,self.filterPattern,self.filterType):
+		for fF, fS, fT in zip(self.filterField,self._filterSearch,self.filterType):
 			# Check if the field is not in the JSON (warn out)
-			if fF not in dataJson:
+			if fF not in prepared:
 				ismatch = False
 				self.log.append(f'[WARN] Filter field ({fF}) not in message.')
-				return
+				return False
 			else:
-				if dataJson[fF] is None or dataJson[fF] != dataJson[fF]:
-					#to catch NaN, we check if dataJson[fF] equals itself
-					### None space change made by akoltko 20200716
-					dataJson[fF] = ''
-				ismatch = bool(fP.search(dataJson[fF]))
-				self.log.append(f'[INFO] Filter field ({fF}) with pattern  ({fP}) and type ({fT}): {ismatch}')
+				value = prepared[fF]
+				ismatch = fS[0 if value.isascii() else 1](value) is not None
+				self.log.append(f'[INFO] Filter field ({fF}) with type ({fT}): {ismatch}')
 			isinclude = fT =='include'
 
 			if ismatch != isinclude:
-				self.log.append(f'[INFO] Filter "{fP}" [{fT}] applied to "{dataJson[fF]}" ({fF}): NOT MATCHED.')
-				return
+				self.log.append(f'[INFO] Filter [{fT}] applied to "{prepared[fF]}" ({fF}): NOT MATCHED.')
+				return False
 			else:
-				self.log.append(f'[INFO] Filter "{fP}" [{fT}] applied to "{dataJson[fF]}" ({fF}): MATCHED.')
+				self.log.append(f'[INFO] Filter [{fT}] applied to "{prepared[fF]}" ({fF}): MATCHED.')
 		else:
-			self.ApplyRule(dataJson)
+			return self.ApplyRule(dataJson,prepared)
 
-	def ApplyRule(self,dataJson):
+	def ApplyRule(self,dataJson,prepared):
 		"""
 		Apply the rule to the data row. If matches, outputs.
 
 		args:
 			- dataJson: dictionary of lists of the row we're applying the rule to
+			- prepared: prepared values of the row's read fields
 		"""
 		#print('\tApplying Rule')
 		if type(self.rulePattern) is list:
 			if dataJson[self.ruleField] in self.rulePattern:
 				self.log.append(f'[INFO] Rule "{str(self.rulePattern)}" applied to "{self.ruleField}" ({dataJson[self.ruleField]}): MATCHED')
 				#self.ruleMsg = '"'+self.ruleName + '" applied to [' + self.ruleField + '] ("' + dataJson[self.ruleField] + '"")'
-				self.ApplyOutputs(dataJson)
+				return self.ApplyOutputs(dataJson,prepared=prepared)
 			else:
 				self.log.append(f'[INFO] Rule "{self.rulePattern}" applied to "{self.ruleField}" ({dataJson[self.ruleField]}): NOT MATCHED')
+				return False
 		else:
 			# If the rule field doesnt have a value, throw it away.
-			try:
-				if dataJson[self.ruleField] is None or dataJson[self.ruleField] != dataJson[self.ruleField]:
-					### None space change made by akoltko 20200716
-					dataJson[self.ruleField] = ''
-			except:
+			if self.ruleField not in prepared:
 				assert False, dataJson
-			matches = self.rulePattern.search(str(dataJson[self.ruleField]))
+			value = prepared[self.ruleField]
+			matches = self._ruleSearch[0 if value.isascii() else 1](value)
 
 			if matches:
-				self.log.append(f'[INFO] Rule "{self.rulePattern}" applied to "{self.ruleField}" ({dataJson[self.ruleField]}): MATCHED')
-				self.ApplyOutputs(dataJson,matches)
+				self.log.append(f'[INFO] Rule applied to "{self.ruleField}" ({prepared[self.ruleField]}): MATCHED')
+				return self.ApplyOutputs(dataJson,self._OriginalCase(matches,dataJson[self.ruleField]),prepared)
 			else:
-				self.log.append(f'[INFO] Rule "{self.rulePattern}" applied to "{self.ruleField}" ({dataJson[self.ruleField]}): NOT MATCHED')
+				self.log.append(f'[INFO] Rule applied to "{self.ruleField}" ({prepared[self.ruleField]}): NOT MATCHED')
+				return False
 
-	def ApplyOutputs(self,dataJson,matches=None):
+	def ApplyOutputs(self,dataJson,matches=None,prepared=None):
 		"""
 		Apply the outputs to the data row. If no matches are provided its assumed from a list match.
 
 		args:
 			- dataJson: the row of data we're applying the outputs to
 			- matches: what matches were made, for dynamic outputs, default None
+			- prepared: prepared values of the row's read fields, updated with
+						the outputs written, default None
 		"""
 		warnFlag = False
 		if matches == None:
@@ -190,7 +334,7 @@ class Rule:
 						currentVal = dataJson[key]
 						overVal = self.outputs[key]
 				else:
-					self.log.append(f'[INFO] Output "{dataJson[key]}" ({key}) set.')
+					self.log.append(f'[INFO] Output "{self.outputs[key]}" ({key}) set.')
 				dataJson[key] = self.outputs[key]
 				self.log.append(f'[INFO] Output "{dataJson[key]}" ({key}) set.')
 		else:
@@ -212,11 +356,90 @@ class Rule:
 				else:
 					dataJson[key] = self.outputs[key]
 					self.log.append(f'[INFO] Output "{dataJson[key]}" ({key}) set.')
+		if prepared is not None:
+			for key in self.outputs:
+				prepared[key] = PrepareValue(dataJson[key],not self.caseSensitive)
 		if warnFlag == False:
 			self.log.append('[INFO] Full rule applied.')
 
 		else:
 			self.log.append('[WARN] Full rule applied (Output Overwritten)' )
+		return True
+
+	def Evaluate(self,getValue,getRaw):
+		"""
+		Side-effect free counterpart of Apply. Works out whether the rule fires
+		and what it would write, without touching the row. The result does not
+		depend on check order, so the selective include filters are checked
+		first, then the rule pattern, then the exclude filters.
+
+		args:
+			- getValue: function of a standardized field name returning its
+						current prepared value (see Rules.PrepareValue), or
+						MISSING if the field is absent
+			- getRaw: same, returning the field's current unprepared value
+
+		returns: dictionary of the outputs the rule writes if it fires, else None
+		"""
+		if self._checkOrder is None:
+			checks = list(zip(self.filterField,self._filterSearch,self.filterType))
+			self._checkOrder = ([c[:2] for c in checks if c[2] == 'include'],
+								[c[:2] for c in checks if c[2] == 'exclude'])
+		includes, excludes = self._checkOrder
+
+		for fF, fS in includes:
+			fieldValue = getValue(fF)
+			if fieldValue is MISSING or fS[0 if fieldValue.isascii() else 1](fieldValue) is None:
+				return None
+		if type(self.rulePattern) is list:
+			value = getRaw(self.ruleField)
+			if value is not MISSING:
+				if value not in self.rulePattern:
+					return None
+				matches = True
+		else:
+			value = getValue(self.ruleField)
+			if value is not MISSING:
+				matches = self._ruleSearch[0 if value.isascii() else 1](value)
+				if matches is None:
+					return None
+		for fF, fS in excludes:
+			fieldValue = getValue(fF)
+			if fieldValue is MISSING or fS[0 if fieldValue.isascii() else 1](fieldValue) is not None:
+				return None
+		if value is MISSING:
+			#same failures as ApplyRule on a row without the rule field
+			if type(self.rulePattern) is list:
+				raise KeyError(self.ruleField)
+			assert False, self.ruleField
+
+		if matches is not True:
+			matches = self._OriginalCase(matches,getRaw(self.ruleField))
+		outs = {}
+		for key, out in self.outputs.items():
+			if matches is True or type(out) not in (int,list):
+				outs[key] = out
+			elif type(out) is int:
+				outs[key] = matches.group(out)
+			else:
+				outStr = ''
+				for elem in out:
+					if type(elem) is str:
+						outStr += elem
+					elif type(elem) is int:
+						outStr += matches.group(elem)
+				outs[key] = outStr
+		return outs
+
+	def _OriginalCase(self,matches,rawValue):
+		""" Capture groups of a match on a case-folded value must come from the
+		original text; the folded value has the same length, so spans carry over. """
+		if self.caseSensitive:
+			return matches
+		original = PrepareValue(rawValue,False)
+		if original == matches.string:
+			return matches
+		return _FoldedMatch(matches,original)
 
 	def _SaveLog(self):
 		name = "../Logs/rule_log_" + str(datetime.datetime.now()).replace(" ","_").replace(":", "-") + ".txt"
@@ -246,6 +469,9 @@ class Rules:
 			assert False, "No ruleset given"
 		self.ruleSet = 	[Rule(r, caseSensitive=self.caseSensitive) for r in rules['rules']]
 		self.ruleCount = len(self.ruleSet)								#TODO: Why is this here?
+		self.signatures = [rule.signature for rule in self.ruleSet]
+		self.dependencies = RuleDependencies(self.ruleSet)
+		self._readFields = sorted(self.GetReadFields())
 		self.msg = []
 		self._ResetMsg()
 
@@ -253,20 +479,177 @@ class Rules:
 		""" Clear the message log. """
 		self.msg.append('''================ RULE LOG ================''')
 
-	def ApplyRules(self,dataJson):
+	def GetReadFields(self):
+		""" Set of standardized fields read by any rule in the set. """
+		return {field for rule in self.ruleSet for field in rule.GetReadFields()}
+
+	def GetOutputFields(self):
+		""" Set of standardized fields written by any rule in the set. """
+		return {field for rule in self.ruleSet for field in rule.GetOutputFields()}
+
+	def GetInputFields(self):
+		""" Set of standardized fields read by the rules but never written by them. """
+		return self.GetReadFields() - self.GetOutputFields()
+
+	def PrepareValue(self,value):
+		""" Value of a field as this ruleset's patterns see it (see PrepareValue). """
+		return PrepareValue(value,not self.caseSensitive)
+
+	def PrepareColumns(self,columns):
+		"""
+		Prepares the input fields of many rows at once, so each referenced
+		column is cleaned, converted and case-folded once per run instead of
+		once per rule.
+
+		args:
+			- columns: mapping of standardized field name to the sequence of its
+					   raw values per row (MISSING where a row lacks the field)
+
+		returns: dictionary of input field to the list of its prepared values,
+				 for use with PreparedRow
+		"""
+		fold = not self.caseSensitive
+		return {field: [v if v is MISSING else PrepareValue(v,fold) for v in columns[field]]
+				for field in self.GetInputFields() if field in columns}
+
+	@staticmethod
+	def PreparedRow(buffers,i):
+		""" Prepared input values of row i from the buffers of PrepareColumns. """
+		return {field: values[i] for field, values in buffers.items() if values[i] is not MISSING}
+
+	def _PrepareRow(self,dataJson,prepared=None):
+		""" Prepared values of all the fields the rules read, reusing the given ones. """
+		row = dict(prepared) if prepared else {}
+		fold = not self.caseSensitive
+		for field in self._readFields:
+			if field not in row and field in dataJson:
+				row[field] = PrepareValue(dataJson[field],fold)
+		return row
+
+	def ApplyRules(self,dataJson,earlyExit=False,prepared=None):
 		"""
 		Apply all rules from the file to a given JSON object.
 
 		args:
 			- dataJson: the data to apply rules to
+			- earlyExit: resolve each output field from the last rule that writes
+						 it backwards instead of running every rule forwards, default False.
+						 Gives the same output values; see _ApplyRulesEarlyExit.
+			- prepared: prepared values of the row's input fields, e.g. from
+						PreparedRow, default None (prepared from dataJson)
+
+		returns: list of the indices (into ruleSet) of the rules that fired, in order.
+				 In early-exit mode only rules that had to be evaluated are listed.
 		"""
+		prepared = self._PrepareRow(dataJson,prepared)
+		if earlyExit:
+			try:
+				return self._ApplyRulesEarlyExit(dataJson,prepared)
+			except RecursionError:
+				#pathologically deep rule chains; the row is untouched so run it forwards
+				pass
 		#self._ResetMsg()
-		for rule in self.ruleSet:
-			rule.Apply(dataJson)
+		fired = []
+		for i, rule in enumerate(self.ruleSet):
+			if rule.Apply(dataJson,prepared):
+				fired.append(i)
 			#Logging temporarily removed, was filling memory. 20200804 akoltko
 			#self.msg.append('[INFO] Rule: {}'.format(rule.ruleName))
 			#self.msg.append('[INFO] Data input: {}'.format(str(dataJson)))
 			#self.msg += rule.log
+		return fired
+
+	def _ApplyRulesEarlyExit(self,dataJson,prepared):
+		"""
+		Reverse, demand-driven evaluation of the ruleset. A forward pass leaves
+		each output field holding the value written by the last rule that fired
+		on it, and whether a rule fires depends only on the values of its read
+		fields at its position in the set. So rules are visited from the last one
+		backwards, skipping those whose outputs are all already final, and the
+		walk stops as soon as every output field is final. A read field's value
+		at position i is resolved the same way over the writers before i
+		(memoized), falling back to the row's own value.
+
+		The row is only written once everything is resolved.
+
+		args:
+			- dataJson: the data to apply rules to
+			- prepared: prepared values of all the fields the rules read
+
+		returns: sorted list of the indices of evaluated rules that fired
+		"""
+		ruleSet = self.ruleSet
+		deps = self.dependencies
+		writers = deps.writers
+		fold = not self.caseSensitive
+		bisectLeft = bisect.bisect_left
+		results = {}		#rule index -> outputs dict, or None if it does not fire
+		preparedOuts = {}	#rule index -> prepared outputs, for rules that fire
+		#field -> per number of its writers considered, the last one that fires (-1 if none)
+		lastFired = {field: [None]*(len(fieldWriters)+1) for field, fieldWriters in writers.items()}
+
+		def evaluate(i):
+			if i in results:
+				return results[i]
+			outs = results[i] = ruleSet[i].Evaluate(
+				lambda field: valueBefore(field,i),lambda field: rawBefore(field,i))
+			if outs is not None:
+				preparedOuts[i] = {key: PrepareValue(value,fold) for key, value in outs.items()}
+			return outs
+
+		def resolve(field,count):
+			fieldWriters = writers[field]
+			memo = lastFired[field]
+			found = -1
+			pos = count
+			while pos > 0:
+				if memo[pos] is not None:
+					found = memo[pos]
+					break
+				if evaluate(fieldWriters[pos-1]) is not None:
+					found = fieldWriters[pos-1]
+					break
+				pos -= 1
+			for walked in range(pos,count+1):
+				memo[walked] = found
+			return found
+
+		def valueBefore(field,i):
+			fieldWriters = writers.get(field)
+			if fieldWriters is not None and fieldWriters[0] < i:
+				count = bisectLeft(fieldWriters,i)
+				found = lastFired[field][count]
+				if found is None:
+					found = resolve(field,count)
+				if found >= 0:
+					return preparedOuts[found][field]
+			return prepared.get(field,MISSING)
+
+		def rawBefore(field,i):
+			fieldWriters = writers.get(field)
+			if fieldWriters is not None and fieldWriters[0] < i:
+				found = resolve(field,bisectLeft(fieldWriters,i))
+				if found >= 0:
+					return results[found][field]
+			return dataJson.get(field,MISSING)
+
+		final = {}
+		remaining = len(writers)
+		outputFields = deps.outputFields
+		for i in range(len(ruleSet)-1,-1,-1):
+			outputs = outputFields[i]
+			if final.keys() >= outputs:
+				continue
+			outs = evaluate(i)
+			if outs is not None:
+				for field in outputs:
+					if field not in final:
+						final[field] = outs[field]
+						remaining -= 1
+				if not remaining:
+					break
+		dataJson.update(final)
+		return sorted(i for i, outs in results.items() if outs is not None)
 
 	#severities are INFO, WARN, or ERROR
 	#ERROR>WARN>INFO
@@ -298,6 +681,214 @@ class Rules:
 				[lf.write(m) for m in self.msg if "ERROR" in m]
 
 
+class RuleDependencies:
+	""" Output-key dependency graph of a ruleset: which rules write which fields,
+	and which earlier rules each rule's inputs can come from. """
+
+	def __init__(self,ruleSet):
+		"""
+		args:
+			- ruleSet: list of Rule objects, in application order
+		"""
+		self.writers = {}		#field -> ascending indices of the rules writing it
+		self.readers = {}		#field -> ascending indices of the rules reading it
+		self.dependsOn = []		#rule index -> set of earlier rule indices whose outputs it reads
+		self.chainedFields = set()	#fields read by a rule after an earlier rule may have written them
+		self.outputFields = [frozenset(rule.GetOutputFields()) for rule in ruleSet]
+
+		for i, rule in enumerate(ruleSet):
+			deps = set()
+			for field in set(rule.GetReadFields()):
+				self.readers.setdefault(field,[]).append(i)
+				if field in self.writers:
+					self.chainedFields.add(field)
+					deps.update(self.writers[field])
+			self.dependsOn.append(deps)
+			for field in rule.GetOutputFields():
+				self.writers.setdefault(field,[]).append(i)
+
+	def GetRulesAffecting(self,field):
+		"""
+		All rules that can change the final value of a field: its writers plus,
+		transitively, the rules those writers depend on.
+
+		returns: sorted list of rule indices
+		"""
+		pending = list(self.writers.get(field,[]))
+		affecting = set(pending)
+		while pending:
+			for dep in self.dependsOn[pending.pop()]:
+				if dep not in affecting:
+					affecting.add(dep)
+					pending.append(dep)
+		return sorted(affecting)
+
+	def GetFieldsAffectedBy(self,index):
+		"""
+		Output fields whose final value a rule can change, directly or through
+		later rules that read its outputs.
+
+		returns: set of standardized field names
+		"""
+		return {field for field in self.writers if index in self.GetRulesAffecting(field)}
+
+
+### Ruleset compiler.
+# Compiled rulesets, keyed by (source file hash, case sensitivity). Lets repeated
+# normalize calls in a session reuse the compiled patterns instead of rebuilding them.
+# Only the most recently used ones are kept, so edited rule files do not pile up.
+_COMPILED_RULES = collections.OrderedDict()
+_MAX_COMPILED_RULES = 8
+
+def _FileHash(path):
+	""" SHA-256 of a file's contents. """
+	digest = hashlib.sha256()
+	with open(path,'rb') as f:
+		for block in iter(lambda: f.read(1 << 20), b''):
+			digest.update(block)
+	return digest.hexdigest()
+
+def ReadRuleSource(path):
+	"""
+	Read a ruleset from its authoring source.
+
+	args:
+		- path: a rules JSON file, or the Rule Generator workbook (.xlsx). In the
+				workbook, every cell holding a generated rule ('{"ruleName": ...},')
+				is read, sheet by sheet and row by row. Formula results are used, so
+				the workbook must have been saved by Excel.
+
+	returns: dictionary with a 'rules' list
+	"""
+	if os.path.splitext(path)[1].lower() != '.xlsx':
+		with open(path,'r') as f:
+			return json.load(f)
+
+	import openpyxl
+	rules = []
+	wb = openpyxl.load_workbook(path,read_only=True,data_only=True)
+	try:
+		for ws in wb.worksheets:
+			for row in ws.iter_rows(values_only=True):
+				for cell in row:
+					if isinstance(cell,str) and cell.lstrip().startswith('{"ruleName"'):
+						rules.append(json.loads(cell.strip().rstrip(',')))
+	finally:
+		wb.close()
+	assert rules, f"No generated rules found in '{path}' (was it last saved by Excel?)"
+	return {'rules':rules}
+
+def ValidateRules(rulesJson):
+	"""
+	Check a ruleset against the rule schema without building it.
+
+	args:
+		- rulesJson: dictionary with a 'rules' list
+
+	returns: list of error messages, empty if the ruleset is valid
+	"""
+	errors = []
+	if not isinstance(rulesJson,dict) or not isinstance(rulesJson.get('rules'),list):
+		return ["Ruleset must be an object with a 'rules' list."]
+
+	for i, rule in enumerate(rulesJson['rules']):
+		name = f"Rule {i} ({rule.get('ruleName','<unnamed>')})" if isinstance(rule,dict) else f"Rule {i}"
+		if not isinstance(rule,dict):
+			errors.append(f"{name}: not an object.")
+			continue
+		missing = [k for k in ('ruleName','ruleField','rulePattern','outputs') if k not in rule]
+		if missing:
+			errors.append(f"{name}: missing {missing}.")
+			continue
+
+		pattern = rule['rulePattern']
+		groups = 0
+		if not isinstance(pattern,list):
+			try:
+				groups = re.compile(pattern).groups
+			except (re.error,TypeError) as e:
+				errors.append(f"{name}: invalid rulePattern ({e}).")
+				continue
+
+		if not isinstance(rule['outputs'],dict) or not rule['outputs']:
+			errors.append(f"{name}: outputs must be a non-empty object.")
+			continue
+		for key, out in rule['outputs'].items():
+			refs = [out] if isinstance(out,int) else [e for e in out if isinstance(e,int)] if isinstance(out,list) else []
+			if refs and isinstance(pattern,list):
+				errors.append(f"{name}: output '{key}' references a group but rulePattern is a list.")
+				continue
+			for ref in refs:
+				if ref < 0 or ref > groups:
+					errors.append(f"{name}: output '{key}' references group {ref}; pattern has {groups}.")
+
+		for field, spec in rule.get('filters',{}).items():
+			if not isinstance(spec,list) or len(spec) != 2:
+				errors.append(f"{name}: filter '{field}' must be [type, pattern].")
+				continue
+			if spec[0] not in ('include','exclude'):
+				errors.append(f"{name}: filter '{field}' has invalid type '{spec[0]}'.")
+			try:
+				re.compile(spec[1])
+			except (re.error,TypeError) as e:
+				errors.append(f"{name}: filter '{field}' has invalid pattern ({e}).")
+
+	return errors
+
+def CompileRules(path,caseSensitive=True):
+	"""
+	Build a validated Rules object from a rules JSON file or the Rule Generator
+	workbook. The compiled ruleset is cached per file content hash, so repeated
+	calls with an unchanged file are free (for the _MAX_COMPILED_RULES most
+	recently used rulesets).
+
+	args:
+		- path: path to the rules JSON file or the workbook
+		- caseSensitive: flag for using regex as caseSensitive or not, default True
+
+	returns: Rules object
+	"""
+	key = (_FileHash(path),caseSensitive)
+	if key in _COMPILED_RULES:
+		_COMPILED_RULES.move_to_end(key)
+		return _COMPILED_RULES[key]
+	rulesJson = ReadRuleSource(path)
+	errors = ValidateRules(rulesJson)
+	assert not errors, "Invalid ruleset '{}':\n{}".format(path,'\n'.join(errors))
+	compiled = _COMPILED_RULES[key] = Rules(rulesJson=rulesJson,caseSensitive=caseSensitive)
+	while len(_COMPILED_RULES) > _MAX_COMPILED_RULES:
+		_COMPILED_RULES.popitem(last=False)
+	return compiled
+
+def WriteCompiledRules(path,output_path):
+	"""
+	Compile a ruleset source and write it as a runtime rules JSON file: the
+	rules are validated, field names are standardized and the source hash is
+	recorded.
+
+	args:
+		- path: path to the rules JSON file or the workbook
+		- output_path: path of the JSON file to write
+
+	returns: number of rules written
+	"""
+	rules = CompileRules(path)
+	compiled = []
+	for rule, source in zip(rules.ruleSet,ReadRuleSource(path)['rules']):
+		out = {
+			'ruleName':rule.ruleName,
+			'ruleField':rule.ruleField,
+			'rulePattern':source['rulePattern'],
+			'outputs':rule.outputs
+			}
+		if rule.filterField:
+			out['filters'] = {f:[t,p.pattern] for f, t, p in zip(rule.filterField,rule.filterType,rule.filterPattern)}
+		compiled.append(out)
+
+	with open(output_path,'w') as f:
+		json.dump({'source':os.path.basename(path),'sourceHash':_FileHash(path),'rules':compiled},f,indent=1)
+	return len(compiled)
+
 
 if __name__ == '__main__':
 	# Example code block.
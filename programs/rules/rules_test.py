@@ -0,0 +1,185 @@
+#Copyright 2020 DB Engineering
+
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+import unittest
+import unittest.mock
+import json
+import os
+import tempfile
+import copy
+import csv
+import rules
+
+
+_RULES = {'rules':[
+	{'ruleName':'ahu', 'ruleField':'controlProgram', 'rulePattern':'(AHU)-(\\d)',
+	 'outputs':{'generalType':'AHU', 'assetName':['AHU-', 2]}},
+	{'ruleName':'sat', 'ruleField':'objectName', 'rulePattern':'^sat_',
+	 'outputs':{'required':'YES', 'standardFieldName':'supply_air_temperature_sensor'},
+	 'filters':{'generalType':['include','AHU']}}
+	]}
+
+class TestRuleCompiler(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.tmpdir.name, 'rules.json')
+		with open(self.path, 'w') as f:
+			json.dump(_RULES, f)
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def test_validate(self):
+		#a valid ruleset has no errors; bad filter types and group references are reported
+		self.assertEqual([], rules.ValidateRules(_RULES))
+
+		bad = {'rules':[
+			{'ruleName':'a', 'ruleField':'name', 'rulePattern':'(a)', 'outputs':{'assetName':2}},
+			{'ruleName':'b', 'ruleField':'name', 'rulePattern':'b', 'outputs':{'required':'NO'},
+			 'filters':{'generalType':['includes','VAV']}},
+			{'ruleName':'c', 'ruleField':'name', 'rulePattern':['c'], 'outputs':{'assetName':1}},
+			{'ruleName':'d', 'ruleField':'name', 'outputs':{'required':'NO'}}
+			]}
+		self.assertEqual(4, len(rules.ValidateRules(bad)))
+
+	def test_compile_is_cached(self):
+		#the same file content compiles once per process
+		first = rules.CompileRules(self.path)
+		self.assertIs(first, rules.CompileRules(self.path))
+		self.assertIsNot(first, rules.CompileRules(self.path, caseSensitive=False))
+
+		row = {'controlprogram':'AHU-2', 'objectname':'sat_1', 'generaltype':''}
+		first.ApplyRules(row)
+		self.assertEqual('AHU-2', row['assetname'])
+		self.assertEqual('YES', row['required'])
+
+	def test_compile_cache_is_bounded(self):
+		#only the most recently used rulesets stay compiled, so edited files do not pile up
+		def edit(name):
+			ruleset = copy.deepcopy(_RULES)
+			ruleset['rules'][0]['ruleName'] = name
+			with open(self.path, 'w') as f:
+				json.dump(ruleset, f)
+			return rules.CompileRules(self.path)
+
+		with unittest.mock.patch.object(rules, '_MAX_COMPILED_RULES', 2), \
+				unittest.mock.patch.object(rules, '_COMPILED_RULES', rules.collections.OrderedDict()):
+			first, second = edit('ahu_1'), edit('ahu_2')
+			self.assertIs(first, edit('ahu_1'))
+			edit('ahu_3')
+			self.assertEqual(2, len(rules._COMPILED_RULES))
+			self.assertIs(first, edit('ahu_1'))
+			self.assertIsNot(second, edit('ahu_2'))
+
+	def test_write_compiled(self):
+		#the written artifact is a runtime ruleset with standardized fields
+		out = os.path.join(self.tmpdir.name, 'compiled.json')
+		self.assertEqual(2, rules.WriteCompiledRules(self.path, out))
+		with open(out) as f:
+			compiled = json.load(f)
+		self.assertEqual([], rules.ValidateRules(compiled))
+		self.assertEqual('controlprogram', compiled['rules'][0]['ruleField'])
+		self.assertEqual({'generaltype':['include','AHU']}, compiled['rules'][1]['filters'])
+
+
+_CHAINED = {'rules':[
+	{'ruleName':'ahu', 'ruleField':'controlProgram', 'rulePattern':'AHU-(\\d)',
+	 'outputs':{'generalType':'AHU', 'assetName':['AHU-', 1], 'required':'NO'}},
+	{'ruleName':'sat', 'ruleField':'objectName', 'rulePattern':'^sat',
+	 'outputs':{'required':'YES', 'standardFieldName':'supply_air_temperature_sensor'},
+	 'filters':{'generalType':['include','AHU'], 'required':['exclude','NO']}},
+	{'ruleName':'sat used', 'ruleField':'objectName', 'rulePattern':'_used',
+	 'outputs':{'required':'USED'},
+	 'filters':{'generalType':['include','AHU']}},
+	{'ruleName':'sat sp', 'ruleField':'objectName', 'rulePattern':'sp$',
+	 'outputs':{'standardFieldName':'supply_air_temperature_setpoint'},
+	 'filters':{'required':['include','USED']}},
+	{'ruleName':'units', 'ruleField':'units', 'rulePattern':['degF'],
+	 'outputs':{'units':'degrees-fahrenheit'}}
+	]}
+
+class TestPreparedValues(unittest.TestCase):
+	def test_case_insensitive(self):
+		#patterns run on lowercased values; capture groups keep the original case
+		ruleset = rules.Rules(rulesJson=_RULES, caseSensitive=False)
+		row = {'controlprogram':'ahu-3 North', 'objectname':'SAT_1', 'generaltype':float('nan')}
+		ruleset.ApplyRules(row)
+		self.assertEqual('AHU-3', row['assetname'])
+		self.assertEqual('supply_air_temperature_sensor', row['standardfieldname'])
+
+		#reading a NaN field does not rewrite the row
+		row = {'controlprogram':'VAV-3', 'objectname':'SAT_1', 'generaltype':float('nan')}
+		ruleset.ApplyRules(row)
+		self.assertNotEqual(row['generaltype'], row['generaltype'])
+
+	def test_fold_pattern(self):
+		#folding is only used where it matches exactly like re.IGNORECASE
+		self.assertEqual('[a-z]+_\\D', rules._FoldPattern('[A-Z]+_\\D').pattern)
+		for pattern in ['[A-z]', '(?-i:AB)', '\\x41', 'Zone\u00e9']:
+			self.assertIsNone(rules._FoldPattern(pattern), pattern)
+		columns = {'objectname':['SAT', float('nan'), 'Zoné'], 'controlprogram':['AHU-1', None, 'X']}
+		buffers = rules.Rules(rulesJson=_RULES, caseSensitive=False).PrepareColumns(columns)
+		self.assertEqual({'objectname':['sat', '', 'Zoné'], 'controlprogram':['ahu-1', '', 'x']}, buffers)
+
+_BMS_EXPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'..','..','resources','bms_exports','alc','US-MTV-1395.csv')
+_RULES_REV4 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'..','..','resources','rules','google_rules_rev4.json')
+
+class TestEarlyExit(unittest.TestCase):
+	def assertModesAgree(self, ruleset, rows):
+		outputs = ruleset.GetOutputFields()
+		for row in rows:
+			forward, reverse = copy.deepcopy(row), copy.deepcopy(row)
+			ruleset.ApplyRules(forward)
+			ruleset.ApplyRules(reverse, earlyExit=True)
+			self.assertEqual({f:forward.get(f) for f in outputs},
+							 {f:reverse.get(f) for f in outputs}, row)
+
+	def test_dependencies(self):
+		deps = rules.Rules(rulesJson=_CHAINED).dependencies
+		self.assertEqual([0,1,2], deps.writers['required'])
+		self.assertEqual({'generaltype','required'}, deps.chainedFields)
+		self.assertEqual({0,1,2}, deps.dependsOn[3])
+		self.assertEqual([0,1,2,3], deps.GetRulesAffecting('standardfieldname'))
+		self.assertEqual({'units'}, deps.GetFieldsAffectedBy(4))
+
+	def test_chained_rules(self):
+		#outputs read by later rules resolve to the value at that rule's position
+		rows = []
+		for name in ['sat', 'sat_used', 'sat_sp', 'sat_used_sp', 'rat']:
+			for program in ['AHU-1', 'VAV-1']:
+				rows.append({'controlprogram':program, 'objectname':name, 'units':'degF',
+							 'generaltype':'', 'required':'', 'standardfieldname':''})
+		self.assertModesAgree(rules.Rules(rulesJson=_CHAINED), rows)
+
+		row = dict(rows[6])
+		self.assertEqual([0,2,3,4], rules.Rules(rulesJson=_CHAINED).ApplyRules(row, earlyExit=True))
+		self.assertEqual('supply_air_temperature_setpoint', row['standardfieldname'])
+
+	def test_bundled_ruleset(self):
+		ruleset = rules.Rules(_RULES_REV4)
+		with open(_BMS_EXPORT, encoding='utf-8') as f:
+			reader = csv.DictReader(f)
+			rows = [{k.replace(' ','').lower():v for k, v in row.items()}
+					for _, row in zip(range(300), reader) if ':' in row['Object ID']]
+		for row in rows:
+			row['objecttype'] = ''
+			for field in ('generaltype','required','standardfieldname','units','assetname'):
+				row.setdefault(field,'')
+		self.assertModesAgree(ruleset, rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,413 @@
+#Copyright 2020 DB Engineering
+
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+"""
+Table readers for loadsheet and BMS files.
+
+read_table reads .xlsx and .csv files into a DataFrame the same way
+pd.read_excel / pd.read_csv do (first sheet, header on the first row,
+pandas' default NA strings), but .xlsx files are streamed row by row instead
+of being loaded as a full openpyxl workbook. Excel engines are pluggable:
+calamine is used when python-calamine is installed, otherwise openpyxl in
+read_only mode.
+
+read_csv_chunks reads large CSV exports (BMS point lists) in chunks with the
+pyarrow CSV reader when pyarrow is installed, applying row filters to each
+block as it is read so rows that are dropped are never converted.
+
+Loadsheets handed from one workflow step to the next can also be kept in a
+columnar binary file (Parquet, or Arrow IPC / Feather): write_binary and
+read_binary round-trip a DataFrame with its dtypes plus a small dict of
+string metadata stored in the file schema.
+"""
+
+import json
+import os
+import string
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+try:
+    # optional: only needed for binary (parquet / arrow) files
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pa_csv = None
+    feather = None
+    pq = None
+
+
+# Columns that only ever hold text. Reading them as object keeps empty
+# columns from becoming float64 and skips type inference.
+LOADSHEET_DTYPES = {
+        'location': object,
+        'controlProgram': object,
+        'name': object,
+        'type': object,
+        'path': object,
+        'deviceId': object,
+        'objectType': object,
+        'objectName': object,
+        'units': object,
+        'required': object,
+        'manuallyMapped': object,
+        'isMissing': object,
+        'building': object,
+        'generalType': object,
+        'typeName': object,
+        'assetName': object,
+        'fullAssetPath': object,
+        'standardFieldName': object
+}
+
+# BMS exports are all text, object ids included ("AV:3")
+BMS_DTYPES = {
+        'Location': str,
+        'Control Program': str,
+        'Name': str,
+        'Type': str,
+        'Device ID': str,
+        'Object ID': str,
+        'Object Name': str,
+        'Path': str,
+        'I/O Type': str
+}
+
+# pandas' default na_values for read_excel / read_csv
+_NA_VALUES = frozenset([
+        '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+        '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+        'n/a', 'nan', 'null'
+])
+
+
+def _std(header: Any) -> str:
+    """ Header without punctuation, spaces or case, to match column names loosely. """
+    delete_dict = {sp_char: '' for sp_char in string.punctuation}
+    delete_dict[' '] = ''
+    return str(header).translate(str.maketrans(delete_dict)).lower()
+
+def _selector(columns: Optional[List[str]]) -> Optional[Callable[[str], bool]]:
+    """ usecols callable keeping the requested columns (matched loosely) that exist. """
+    if columns is None:
+        return None
+    wanted = {_std(c) for c in columns}
+    return lambda header: _std(header) in wanted
+
+def _dtype_for(header: str, dtypes: Dict[str, Any]) -> Any:
+    """ dtype hint of a column, matched loosely. """
+    for name, dtype in dtypes.items():
+        if _std(name) == _std(header):
+            return dtype
+    return None
+
+def _to_series(values: List[Any], dtype: Any) -> pd.Series:
+    """ Column from raw cell values: empty cells and NA strings become NaN. """
+    values = [np.nan if v is None or (type(v) is str and v in _NA_VALUES) else v
+              for v in values]
+    if dtype is str:
+        values = [v if v != v else str(v) for v in values]
+        return pd.Series(values, dtype=object)
+    if dtype is not None:
+        return pd.Series(values, dtype=dtype)
+    series = pd.Series(values)
+    if series.dtype == object:
+        # numbers stored as text are read as numbers, as the pandas parsers do
+        try:
+            series = pd.to_numeric(series)
+        except (ValueError, TypeError):
+            pass
+    return series
+
+def _read_xlsx_openpyxl(
+        filepath: str,
+        columns: Optional[List[str]],
+        dtypes: Dict[str, Any]
+        ) -> pd.DataFrame:
+    """ Streams the first sheet with openpyxl's read_only mode. """
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        data = [row for row in rows]
+    finally:
+        wb.close()
+
+    # like pandas: drop trailing empty rows and unnamed trailing empty columns
+    while data and all(v is None for v in data[-1]):
+        data.pop()
+    width = max([len(header)] + [len(row) for row in data])
+    while width > 0 and (width > len(header) or header[width-1] is None) \
+            and all(len(row) < width or row[width-1] is None for row in data):
+        width -= 1
+    header = [f'Unnamed: {i}' if i >= len(header) or header[i] is None else header[i]
+              for i in range(width)]
+
+    keep = _selector(columns)
+    frame = {}
+    for i, name in enumerate(header):
+        if keep is not None and not keep(name):
+            continue
+        values = [row[i] if i < len(row) else None for row in data]
+        frame[name] = _to_series(values, _dtype_for(name, dtypes))
+    return pd.DataFrame(frame, index=pd.RangeIndex(len(data)))
+
+def _read_xlsx_calamine(
+        filepath: str,
+        columns: Optional[List[str]],
+        dtypes: Dict[str, Any]
+        ) -> pd.DataFrame:
+    """ Reads the first sheet with the calamine (Rust) engine. """
+    df = pd.read_excel(filepath, header=0, engine='calamine', usecols=_selector(columns))
+    for name in df.columns:
+        dtype = _dtype_for(name, dtypes)
+        if dtype is not None:
+            df[name] = _to_series(df[name].tolist(), dtype)
+    return df
+
+# engine name -> (reader, available); tried in this order
+_XLSX_ENGINES = {
+        'calamine': (_read_xlsx_calamine, python_calamine is not None),
+        'openpyxl': (_read_xlsx_openpyxl, True)
+}
+
+def available_engines() -> List[str]:
+    """ Names of the installed .xlsx engines, preferred first. """
+    return [name for name, (_, available) in _XLSX_ENGINES.items() if available]
+
+# bytes of CSV text pyarrow converts at a time
+_CSV_BLOCK_SIZE = 1 << 22
+
+
+def _to_frame(table: 'pa.Table') -> pd.DataFrame:
+    """ DataFrame of an arrow table, with NaN (as pandas readers give) rather
+    than None in text columns that have empty cells. """
+    df = table.to_pandas()
+    for name in table.column_names:
+        if table.column(name).null_count and df[name].dtype == object:
+            df[name] = df[name].fillna(np.nan)
+    return df
+
+
+def _csv_frames_arrow(
+        filepath: str,
+        hints: Dict[str, Any],
+        contains: Dict[str, str],
+        chunksize: Optional[int]
+        ) -> Iterator[pd.DataFrame]:
+    """ read_csv_chunks with the pyarrow CSV reader: text hints become string
+    columns of the schema, filters run on each block before conversion. """
+    reader = pa_csv.open_csv(
+        filepath,
+        read_options=pa_csv.ReadOptions(block_size=_CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name, dtype in hints.items()
+                          if dtype in (str, object)},
+            null_values=list(_NA_VALUES),
+            strings_can_be_null=True))
+    pending, pending_rows = [], 0
+    for batch in reader:
+        for name, text in contains.items():
+            batch = batch.filter(pc.match_substring(batch.column(name), text))
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if chunksize is not None and pending_rows >= chunksize:
+            yield _to_frame(pa.Table.from_batches(pending))
+            pending, pending_rows = [], 0
+    if pending_rows or chunksize is None:
+        yield _to_frame(pa.Table.from_batches(pending, schema=reader.schema))
+
+
+def _csv_frames_pandas(
+        filepath: str,
+        hints: Dict[str, Any],
+        contains: Dict[str, str],
+        chunksize: Optional[int]
+        ) -> Iterator[pd.DataFrame]:
+    """ read_csv_chunks with pandas, for installs without pyarrow. """
+    chunks = pd.read_csv(filepath, header=0, encoding='utf-8', chunksize=chunksize,
+                         dtype={name: dtype for name, dtype in hints.items() if dtype is not None})
+    for df in [chunks] if chunksize is None else chunks:
+        for name, text in contains.items():
+            df = df[df[name].str.contains(text, regex=False, na=False)]
+        yield df.reset_index(drop=True)
+
+
+def read_csv_chunks(
+        filepath: str,
+        dtypes: Optional[Dict[str, Any]] = None,
+        contains: Optional[Dict[str, str]] = None,
+        chunksize: Optional[int] = None
+        ) -> Iterator[pd.DataFrame]:
+    """
+    Reads a .csv table (header on the first row) in chunks, keeping only the
+    rows that pass the filters. Uses the pyarrow CSV reader when installed.
+    args:
+        filepath - path to the file
+        dtypes - column name to dtype hints; str/object columns are read as
+                 text. Default None
+        contains - column name to substring: only rows whose value in the
+                   column contains the substring are kept (empty cells are
+                   dropped). Default None
+        chunksize - rows per chunk (approximate with pyarrow, which reads
+                    whole blocks), default None yields the whole table once
+    returns:
+        iterator of dataframes
+    """
+    header = pd.read_csv(filepath, header=0, encoding='utf-8', nrows=0).columns
+    hints = {name: _dtype_for(name, dtypes or {}) for name in header}
+    read_frames = _csv_frames_pandas if pa is None else _csv_frames_arrow
+    return read_frames(filepath, hints, contains or {}, chunksize)
+
+
+BINARY_FILE_TYPES = ('.parquet', '.feather', '.arrow')
+
+# schema metadata key holding the caller's metadata dict (as JSON)
+_METADATA_KEY = b'loadsheet'
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("pyarrow is required for .parquet/.feather/.arrow files.")
+
+
+def _arrow_column(series: pd.Series) -> pd.Series:
+    """
+    Returns a column arrow can store. Object columns holding a mix of text
+    and numbers (which arrow cannot type) are stored as text, as they would
+    read back from Excel.
+    """
+    if series.dtype != object:
+        return series
+    try:
+        pa.array(series, from_pandas=True)
+        return series
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return series.map(lambda v: v if pd.isna(v) else str(v))
+
+
+def write_binary(
+        df: pd.DataFrame,
+        filepath: str,
+        metadata: Optional[Dict[str, Any]] = None
+        ) -> None:
+    """
+    Writes a table to a .parquet or .feather/.arrow (Arrow IPC) file
+    args:
+        df - table to write; the index is not kept
+        filepath - output path, the file type is taken from the extension
+        metadata - JSON serializable dict stored with the table, default None
+    returns:
+        None
+    """
+    _require_pyarrow()
+    file_type = os.path.splitext(filepath)[1]
+    if file_type not in BINARY_FILE_TYPES:
+        raise ValueError(f"File type '{file_type}' not supported. Use {', '.join(BINARY_FILE_TYPES)}.")
+    df = pd.DataFrame({name: _arrow_column(df[name]) for name in df.columns}, columns=df.columns)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata is not None:
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), _METADATA_KEY: json.dumps(metadata)})
+    if file_type == '.parquet':
+        pq.write_table(table, filepath)
+    else:
+        feather.write_feather(table, filepath, compression='lz4')
+
+
+def read_binary(
+        filepath: str,
+        columns: Optional[List[str]] = None
+        ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Reads a table written by write_binary
+    args:
+        filepath - path to the .parquet or .feather/.arrow file
+        columns - names of the columns to read (matched ignoring case,
+                  spaces and punctuation), default None reads all columns
+    returns:
+        dataframe of the table and the metadata dict stored with it
+        (empty if there is none)
+    """
+    _require_pyarrow()
+    file_type = os.path.splitext(filepath)[1]
+    if file_type == '.parquet':
+        schema = pq.read_schema(filepath)
+        selector = _selector(columns)
+        table = pq.read_table(filepath, columns=[
+            name for name in schema.names if selector is None or selector(name)])
+    elif file_type in BINARY_FILE_TYPES:
+        table = feather.read_table(filepath, memory_map=True)
+        schema = table.schema
+        selector = _selector(columns)
+        if selector is not None:
+            table = table.select([name for name in schema.names if selector(name)])
+    else:
+        raise ValueError(f"File type '{file_type}' not supported. Use {', '.join(BINARY_FILE_TYPES)}.")
+    metadata = (schema.metadata or {}).get(_METADATA_KEY)
+    return table.to_pandas(), json.loads(metadata) if metadata else {}
+
+
+def read_table(
+        filepath: str,
+        columns: Optional[List[str]] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        engine: Optional[str] = None
+        ) -> pd.DataFrame:
+    """
+    Reads a .xlsx or .csv table with its header on the first row, or a
+    binary table written by write_binary
+    args:
+        filepath - path to the file
+        columns - names of the columns to read (matched ignoring case,
+                  spaces and punctuation); columns not in the file are
+                  skipped. Default None reads all columns
+        dtypes - column name to dtype hints; str converts the values to
+                 text. Default None. Binary files keep their stored dtypes
+        engine - .xlsx engine name (see available_engines), default the
+                 first available one
+    returns:
+        dataframe of the table
+    """
+    dtypes = dtypes or {}
+    file_type = os.path.splitext(filepath)[1]
+    if file_type == '.csv':
+        header = pd.read_csv(filepath, header=0, encoding='utf-8', nrows=0).columns
+        hints = {name: _dtype_for(name, dtypes) for name in header}
+        return pd.read_csv(filepath, header=0, encoding='utf-8', usecols=_selector(columns),
+                           dtype={name: dtype for name, dtype in hints.items() if dtype is not None})
+    if file_type in BINARY_FILE_TYPES:
+        return read_binary(filepath, columns)[0]
+    if file_type != '.xlsx':
+        raise ValueError(f"File type '{file_type}' not supported. Use .xlsx or .csv.")
+
+    if engine is None:
+        engine = available_engines()[0]
+    if engine not in _XLSX_ENGINES or not _XLSX_ENGINES[engine][1]:
+        raise ValueError(f"Excel engine '{engine}' is not available; "
+                         f"installed engines: {', '.join(available_engines())}.")
+    return _XLSX_ENGINES[engine][0](filepath, columns, dtypes)
@@ -0,0 +1,67 @@
+#Copyright 2020 DB Engineering
+
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+import unittest
+import os
+import tempfile
+import pandas
+import table_reader
+
+
+_SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'..','..','loadsheet','Loadsheet_ALC_Final_Jr.xlsx')
+
+class TestReadTable(unittest.TestCase):
+	def test_matches_read_excel(self):
+		#without hints the streamed sheet is what pandas reads
+		expected = pandas.read_excel(_SAMPLE)
+		for engine in table_reader.available_engines():
+			pandas.testing.assert_frame_equal(expected, table_reader.read_table(_SAMPLE, engine=engine))
+
+	def test_columns_and_hints(self):
+		#columns match loosely; text hints keep empty columns as object
+		df = table_reader.read_table(_SAMPLE, columns=['asset name', 'typeName', 'missing'],
+			dtypes=table_reader.LOADSHEET_DTYPES)
+		self.assertEqual(['typeName', 'assetName'], df.columns.tolist())
+		self.assertEqual(object, df['typeName'].dtype)
+		self.assertTrue(df['typeName'].isna().all())
+
+	def test_csv_text(self):
+		with tempfile.TemporaryDirectory() as tmpdir:
+			path = os.path.join(tmpdir, 'bms.csv')
+			with open(path, 'w') as f:
+				f.write('Name,Object ID,Device ID\n01,AV:3,\n')
+			df = table_reader.read_table(path, dtypes=table_reader.BMS_DTYPES)
+		self.assertEqual('01', df.loc[0, 'Name'])
+		self.assertTrue(pandas.isna(df.loc[0, 'Device ID']))
+
+	def test_csv_chunks_filter(self):
+		#filtered rows are dropped while reading, empty cells stay NaN
+		with tempfile.TemporaryDirectory() as tmpdir:
+			path = os.path.join(tmpdir, 'bms.csv')
+			with open(path, 'w') as f:
+				f.write('Name,Object ID,Device ID\n01,AV:3,\nx,,\ny,N/A,3\nz,BV:1,DEV:2\n')
+			chunks = list(table_reader.read_csv_chunks(path, dtypes=table_reader.BMS_DTYPES,
+				contains={'Object ID':':'}))
+		self.assertEqual(1, len(chunks))
+		self.assertEqual(['01', 'z'], chunks[0]['Name'].tolist())
+		self.assertTrue(pandas.isna(chunks[0].loc[0, 'Device ID']))
+
+	def test_unknown_engine(self):
+		with self.assertRaises(ValueError):
+			table_reader.read_table(_SAMPLE, engine='xlrd')
+
+
+if __name__ == '__main__':
+    unittest.main()